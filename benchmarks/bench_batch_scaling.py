@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""checkopt.py 批量模式 (--jobs) 的并行扩展性测试"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import checkopt  # noqa: E402
+from synth import write_gaussian_campaign  # noqa: E402
+
+
+def time_scan(files, jobs, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = checkopt.scan_output_files(files, jobs=jobs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=2000, help="合成文件数量")
+    parser.add_argument("--steps", type=int, default=30, help="每个文件的优化步数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个进程数重复次数, 取最快")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        nargs="+",
+        default=None,
+        help="要测试的进程数 (默认: 1, 2, 4, ... 直到 CPU 数)",
+    )
+    args = parser.parse_args()
+
+    cpu = os.cpu_count() or 1
+    jobs_list = args.jobs
+    if not jobs_list:
+        jobs_list = [1]
+        while jobs_list[-1] * 2 <= cpu:
+            jobs_list.append(jobs_list[-1] * 2)
+        if jobs_list[-1] != cpu:
+            jobs_list.append(cpu)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        files = write_gaussian_campaign(workdir, args.files, steps=args.steps)
+        total_mb = sum(os.path.getsize(f) for f in files) / 1e6
+        print(f"{len(files)} 个文件, 共 {total_mb:.1f} MB, CPU 数: {cpu}")
+
+        baseline_time, baseline = time_scan(files, 1, args.repeat)
+        print(f"{'jobs':>5} {'time/s':>9} {'files/s':>9} {'speedup':>8} {'eff/core':>9}")
+        for jobs in jobs_list:
+            if jobs == 1:
+                elapsed, result = baseline_time, baseline
+            else:
+                elapsed, result = time_scan(files, jobs, args.repeat)
+            if result != baseline:
+                print(f"错误: jobs={jobs} 的结果与串行结果不一致")
+                sys.exit(1)
+            speedup = baseline_time / elapsed
+            print(
+                f"{jobs:5d} {elapsed:9.3f} {len(files) / elapsed:9.0f} "
+                f"{speedup:8.2f} {speedup / jobs:9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+常驻解析服务 (qctools.daemon) 与本地解析的对比
+
+在合成的 Gaussian 优化任务目录上比较 checkopt.py 批量模式取得结果的耗时:
+  local-cold    不使用缓存, 每个文件都读取
+  local-cache   磁盘缓存已建立, 新进程读入缓存文件后逐个 stat
+  daemon        服务端在本进程的线程中运行 (run_in_process), 通过 Unix socket 查询
+三者的结果必须一致。最后向一个仍在运行的任务追加一个优化步, 测量服务端根据 inotify
+事件更新结果所需的时间。
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import checkopt  # noqa: E402
+from qctools.cache import ParseCache  # noqa: E402
+from qctools.daemon import run_in_process  # noqa: E402
+from qctools.engine import use_remote  # noqa: E402
+from synth import gaussian_opt_log, write_gaussian_campaign  # noqa: E402
+
+
+def normalized(scanned):
+    """与缓存相同, 比较 JSON 序列化后的结果"""
+    return json.loads(json.dumps(scanned))
+
+
+def best_of(repeat, func):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=2000, help="合成文件数量")
+    parser.add_argument("--steps", type=int, default=30, help="每个文件的优化步数")
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式重复次数, 取最快")
+    parser.add_argument("--settle", type=float, default=0.1, help="服务端合并事件的等待时间 (秒)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        root = os.path.join(workdir, "calc")
+        files = write_gaussian_campaign(root, args.files, steps=args.steps)
+        total_mb = sum(os.path.getsize(f) for f in files) / 1e6
+        print(f"{len(files)} 个文件, 共 {total_mb:.1f} MB")
+
+        cold, expected = best_of(args.repeat, lambda: checkopt.scan_output_files(files))
+        expected = normalized(expected)
+
+        cache_file = os.path.join(workdir, "results.json")
+        fill = ParseCache(cache_file)
+        checkopt.scan_output_files(files, cache=fill)
+        fill.save()
+        warm, scanned = best_of(
+            args.repeat, lambda: checkopt.scan_output_files(files, cache=ParseCache(cache_file))
+        )
+        if normalized(scanned) != expected:
+            print("错误: 使用磁盘缓存的结果与直接解析不一致")
+            sys.exit(1)
+
+        start = time.perf_counter()
+        with run_in_process(root, settle=args.settle) as (service, client):
+            startup = time.perf_counter() - start
+            use_remote(client)
+            try:
+                query, scanned = best_of(args.repeat, lambda: checkopt.scan_output_files(files))
+                if client.failed or normalized(scanned) != expected:
+                    print("错误: 服务端的结果与直接解析不一致")
+                    sys.exit(1)
+
+                # 第一个文件 (job00000) 仍在运行: 追加一步后等待服务端更新
+                target = files[0]
+                longer = gaussian_opt_log(args.steps + 1, finished=False, seed=0)
+                with open(target, "r") as handle:
+                    written = len(handle.read())
+                parsed = service.counts["parsed"]
+                start = time.perf_counter()
+                with open(target, "a") as handle:
+                    handle.write(longer[written:])
+                while service.counts["parsed"] == parsed and time.perf_counter() - start < 10:
+                    time.sleep(0.001)
+                latency = time.perf_counter() - start
+                rows = client.extract([target], ["opt"])
+                last_step = rows[0][3]["opt"][-1][0] if rows and rows[0][3]["opt"] else None
+            finally:
+                use_remote(None)
+
+    print(f"{'mode':>12} {'time/s':>9} {'files/s':>10}")
+    for name, elapsed in (("local-cold", cold), ("local-cache", warm), ("daemon", query)):
+        print(f"{name:>12} {elapsed:9.4f} {len(files) / elapsed:10.0f}")
+    print(f"服务端启动 (含初始解析): {startup:.3f} s")
+    print(f"追加一步后服务端更新结果: {latency * 1000:.1f} ms (合并等待 {args.settle * 1000:.0f} ms), 最后一步: {last_step}")
+
+
+if __name__ == "__main__":
+    main()
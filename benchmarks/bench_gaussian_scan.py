@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""parse_gaussian_steps(keep_all=True): 逐行滑动窗口与 mmap 扫描的吞吐量对比"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from qctools import opt  # noqa: E402
+from synth import gaussian_opt_log  # noqa: E402
+
+
+def write_log(path, target_mb, filler_lines):
+    """重复写入合成优化日志直到达到 target_mb"""
+    chunk = gaussian_opt_log(200, filler_lines=filler_lines, finished=False)
+    target = int(target_mb * 1e6)
+    written = 0
+    with open(path, "w") as handle:
+        while written < target:
+            handle.write(chunk)
+            written += len(chunk)
+    return os.path.getsize(path)
+
+
+def best_time(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=float, default=200, help="合成日志大小 (MB)")
+    parser.add_argument("--filler", type=int, default=40, help="每个优化步之间的填充行数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数, 取最快")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "opt.log")
+        size = write_log(path, args.size_mb, args.filler)
+        mb = size / 1e6
+
+        line_time, line_rows = best_time(
+            lambda: opt.parse_gaussian_steps(path, keep_all=True, state={}), args.repeat
+        )
+        mmap_time, mmap_rows = best_time(
+            lambda: opt.scan_gaussian_steps_mmap(path), args.repeat
+        )
+        if line_rows != mmap_rows:
+            print("错误: 两种解析方式的结果不一致")
+            sys.exit(1)
+
+        print(f"文件大小: {mb:.1f} MB, 优化步数: {len(mmap_rows)}")
+        print(f"{'method':<14} {'time/s':>9} {'MB/s':>9}")
+        print(f"{'line window':<14} {line_time:9.3f} {mb / line_time:9.1f}")
+        print(f"{'mmap regex':<14} {mmap_time:9.3f} {mb / mmap_time:9.1f}")
+        print(f"加速比: {line_time / mmap_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+"""
+各解析函数在不同大小的合成输出上的吞吐量 (MB/s)、峰值内存 (RSS) 和耗时
+
+每次测量在新的 Python 进程中进行, 峰值 RSS 不受之前测量的影响。
+--save 把结果写入基线 JSON, 之后用 --compare 对比同一台机器上的新结果,
+吞吐量下降超过 --tolerance 的项目视为变慢, 退出码为 1。
+
+    python benchmarks/bench_parsers.py --sizes 1MB 100MB --save benchmarks/baselines/parsers.json
+    python benchmarks/bench_parsers.py --sizes 1MB 100MB --compare benchmarks/baselines/parsers.json
+    python benchmarks/bench_parsers.py --sizes 5GB --cases gaussian_last_tail --workdir /scratch/bench
+    python benchmarks/bench_parsers.py --sizes 100MB --compress gz --warm
+
+--compress 测量压缩后的文件 (MB/s 按解压后的大小计算); 压缩文件的索引默认每次测量
+都从空缓存开始, --warm 则先运行一次建立索引, 测量的是之后再次读取的速度。
+"""
+
+import argparse
+import gzip
+import json
+import lzma
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from synth import write_sized_log  # noqa: E402
+
+# 名称: (合成文件类型, 调用方式说明); 具体调用见 run_case
+CASES = {
+    "gaussian_steps_all": ("gaussian_opt", "parse_gaussian_steps(keep_all=True)"),
+    "gaussian_steps_stream": ("gaussian_opt", "parse_gaussian_steps(keep_all=True, state={})"),
+    "gaussian_steps_last": ("gaussian_opt", "parse_gaussian_steps(keep_all=False)"),
+    "gaussian_last_tail": ("gaussian_opt", "parse_gaussian_last_step_from_tail"),
+    "cp2k_steps_all": ("cp2k_opt", "parse_cp2k_steps(keep_all=True)"),
+    "cp2k_steps_last": ("cp2k_opt", "parse_cp2k_steps(keep_all=False)"),
+    "orca_steps_all": ("orca_opt", "parse_orca_steps(keep_all=True)"),
+    "orca_steps_last": ("orca_opt", "parse_orca_steps(keep_all=False)"),
+    "scf_steps": ("gaussian_scf", "parse_scf_steps"),
+    "scf_steps_optfreq": ("gaussian_optfreq", "parse_scf_steps"),
+    "irc_points": ("gaussian_irc", "ParseGIRC"),
+}
+
+SIZE_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)\s*([KMG]?)B?$", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "K": 10**3, "M": 10**6, "G": 10**9}
+
+
+def parse_size(text):
+    """'1MB', '500M', '5GB' -> 字节数 (十进制单位)"""
+    match = SIZE_PATTERN.match(text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"无法识别的大小: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def size_label(size):
+    for unit, factor in (("GB", 10**9), ("MB", 10**6), ("KB", 10**3)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return f"{size}B"
+
+
+def run_case(name, path):
+    """在当前进程中执行一次测量, 返回 (耗时, 结果行数)"""
+    from qctools import irc, opt, scf
+
+    calls = {
+        "gaussian_steps_all": lambda: opt.parse_gaussian_steps(path, keep_all=True),
+        "gaussian_steps_stream": lambda: opt.parse_gaussian_steps(path, keep_all=True, state={}),
+        "gaussian_steps_last": lambda: opt.parse_gaussian_steps(path, keep_all=False),
+        "gaussian_last_tail": lambda: opt.parse_gaussian_last_step_from_tail(path),
+        "cp2k_steps_all": lambda: opt.parse_cp2k_steps(path, keep_all=True),
+        "cp2k_steps_last": lambda: opt.parse_cp2k_steps(path, keep_all=False),
+        "orca_steps_all": lambda: opt.parse_orca_steps(path, keep_all=True),
+        "orca_steps_last": lambda: opt.parse_orca_steps(path, keep_all=False),
+        "scf_steps": lambda: scf.parse_scf_steps(path)[0],
+        "scf_steps_optfreq": lambda: scf.parse_scf_steps(path)[0],
+        "irc_points": lambda: [irc.ParseGIRC(path)],
+    }
+    start = time.perf_counter()
+    rows = calls[name]()
+    return time.perf_counter() - start, len(rows)
+
+
+def measure_in_child(name, path, index_dir=None):
+    """
+    在新进程中运行 run_case, 返回 {"wall", "rows", "peak_rss_mb", "start_rss_mb"}
+    index_dir: 压缩文件索引所在的缓存目录 (None 表示使用新建的空目录)
+    """
+    with tempfile.TemporaryDirectory() as empty_dir:
+        env = dict(os.environ, CHOUSCRIPTS_CACHE_DIR=index_dir or empty_dir)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", name, path],
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=env,
+        ).stdout
+    return json.loads(output)
+
+
+def child_main(name, path):
+    # Linux 上 ru_maxrss 的单位是 KB
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    wall, rows = run_case(name, path)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    json.dump(
+        {
+            "wall": wall,
+            "rows": rows,
+            "peak_rss_mb": peak_rss / 1024,
+            "start_rss_mb": start_rss / 1024,
+        },
+        sys.stdout,
+    )
+
+
+COMPRESSORS = {"gz": gzip.open, "xz": lzma.open}
+
+
+def prepare_log(workdir, kind, size, compress=None):
+    """
+    生成 (或复用 workdir 中已有的) 合成文件, 返回 (要测量的文件, 解压后的大小)
+    compress: "gz" / "xz" 时同时生成压缩文件并返回压缩文件
+    """
+    path = os.path.join(workdir, f"{kind}_{size_label(size)}.log")
+    if not os.path.exists(path) or os.path.getsize(path) < size:
+        write_sized_log(path, kind, size)
+        if compress and os.path.exists(f"{path}.{compress}"):
+            os.remove(f"{path}.{compress}")
+    plain_size = os.path.getsize(path)
+    if not compress:
+        return path, plain_size
+    target = f"{path}.{compress}"
+    if not os.path.exists(target):
+        with open(path, "rb") as source, COMPRESSORS[compress](target, "wb") as sink:
+            shutil.copyfileobj(source, sink, 1 << 20)
+    return target, plain_size
+
+
+def run_benchmarks(args, workdir):
+    results = {}
+    print(
+        f"{'case':<22} {'size':>6} {'wall/s':>9} {'MB/s':>9} "
+        f"{'peak RSS/MB':>12} {'+RSS/MB':>8} {'rows':>8}"
+    )
+    for size in args.sizes:
+        for name in args.cases:
+            kind = CASES[name][0]
+            path, plain_size = prepare_log(workdir, kind, size, args.compress)
+            file_mb = plain_size / 1e6
+            index_dir = None
+            if args.warm:
+                index_dir = os.path.join(workdir, "index")
+                measure_in_child(name, path, index_dir)
+            runs = [measure_in_child(name, path, index_dir) for _ in range(args.repeat)]
+            best = min(runs, key=lambda run: run["wall"])
+            record = {
+                "file_mb": file_mb,
+                "wall": best["wall"],
+                "mb_per_s": file_mb / best["wall"] if best["wall"] > 0 else None,
+                "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+                "rss_growth_mb": max(run["peak_rss_mb"] - run["start_rss_mb"] for run in runs),
+                "rows": best["rows"],
+            }
+            key = f"{name}@{size_label(size)}"
+            if args.compress:
+                key += f".{args.compress}" + ("+index" if args.warm else "")
+            results[key] = record
+            mb_per_s = f"{record['mb_per_s']:9.1f}" if record["mb_per_s"] else f"{'inf':>9}"
+            print(
+                f"{name:<22} {size_label(size):>6} {record['wall']:9.4f} {mb_per_s} "
+                f"{record['peak_rss_mb']:12.1f} {record['rss_growth_mb']:8.1f} {record['rows']:8d}",
+                flush=True,
+            )
+    return results
+
+
+def compare_baseline(results, baseline_path, tolerance):
+    """与基线逐项对比吞吐量, 返回变慢的项目列表"""
+    with open(baseline_path, "r") as handle:
+        baseline = json.load(handle)
+    if baseline.get("machine") != platform.node():
+        print(f"注意: 基线来自另一台机器 ({baseline.get('machine')}), 对比结果仅供参考")
+
+    slower = []
+    print(f"\n{'case':<30} {'base MB/s':>10} {'now MB/s':>10} {'ratio':>7}")
+    for key, record in results.items():
+        old = baseline.get("results", {}).get(key)
+        if not old or not old.get("mb_per_s") or not record["mb_per_s"]:
+            continue
+        ratio = record["mb_per_s"] / old["mb_per_s"]
+        flag = ""
+        if ratio < 1 - tolerance:
+            flag = "  变慢"
+            slower.append(key)
+        print(f"{key:<30} {old['mb_per_s']:10.1f} {record['mb_per_s']:10.1f} {ratio:7.2f}{flag}")
+    return slower
+
+
+def save_baseline(results, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    baseline = {}
+    if os.path.exists(path):
+        # 保留基线中本次没有测量的项目
+        with open(path, "r") as handle:
+            baseline = json.load(handle)
+    baseline.update(
+        {
+            "machine": platform.node(),
+            "python": platform.python_version(),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+    )
+    baseline.setdefault("results", {}).update(results)
+    with open(path, "w") as handle:
+        json.dump(baseline, handle, indent=2, sort_keys=True)
+        handle.write("\n")
+    print(f"\n基线已保存: {path}")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child_main(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes",
+        type=parse_size,
+        nargs="+",
+        default=[parse_size(s) for s in ("1MB", "10MB", "100MB")],
+        help="合成文件大小, 例如 1MB 100MB 5GB (默认: 1MB 10MB 100MB)",
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        choices=sorted(CASES),
+        default=list(CASES),
+        help="要测量的项目 (默认: 全部)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数, 耗时取最快")
+    parser.add_argument(
+        "--workdir",
+        help="保存合成文件的目录, 再次运行时直接复用 (默认: 临时目录, 结束后删除)",
+    )
+    parser.add_argument(
+        "--compress", choices=sorted(COMPRESSORS), help="测量压缩后的合成文件 (.gz / .xz)"
+    )
+    parser.add_argument(
+        "--warm", action="store_true", help="与 --compress 一起使用: 测量建立索引之后的读取速度"
+    )
+    parser.add_argument("--save", metavar="JSON", help="把结果写入 (或合并到) 基线文件")
+    parser.add_argument("--compare", metavar="JSON", help="与基线文件对比吞吐量")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="吞吐量低于基线的比例超过此值视为变慢 (默认: 0.2)",
+    )
+    args = parser.parse_args()
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        results = run_benchmarks(args, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            results = run_benchmarks(args, workdir)
+
+    slower = compare_baseline(results, args.compare, args.tolerance) if args.compare else []
+    if args.save:
+        save_baseline(results, args.save)
+    if slower:
+        print(f"\n{len(slower)} 个项目比基线慢 {args.tolerance:.0%} 以上")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
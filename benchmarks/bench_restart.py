@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+mkrestart.py 批量生成续算文件的耗时
+
+在合成的 Gaussian 优化任务上 (每一步都有 Standard orientation 表), 用一个进程为全部文件
+写出 .gjf, 与逐步完整读取文件得到的最后一个结构比较; PATH 中有 Multiwfn 时,
+再对前 --multiwfn 个文件按 MultiConverter.sh 的方式每个文件启动一次 Multiwfn 作对比。
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import mkrestart  # noqa: E402
+from qctools.geom import ELEMENTS  # noqa: E402
+from synth import write_gaussian_campaign  # noqa: E402
+
+
+def forward_last_geometry(filename):
+    """逐行读取全文, 记下最后一个完整的 Standard orientation 表"""
+    last, atoms = None, None
+    with open(filename) as handle:
+        for line in handle:
+            if line.strip() == "Standard orientation:":
+                atoms, skip = [], 4
+            elif atoms is not None:
+                if skip:
+                    skip -= 1
+                elif line.lstrip().startswith("---"):
+                    last, atoms = atoms, None
+                else:
+                    tokens = line.split()
+                    atoms.append([ELEMENTS[int(tokens[1])]] + [float(v) for v in tokens[-3:]])
+    return last
+
+
+def read_gjf_atoms(path):
+    """续算文件中电荷/多重度行之后的原子"""
+    with open(path) as handle:
+        lines = handle.read().split("\n")
+    start = next(i for i, line in enumerate(lines) if line == "0 1") + 1
+    atoms = []
+    for line in lines[start:]:
+        if not line.strip():
+            break
+        symbol, *xyz = line.split()
+        atoms.append([symbol] + [float(v) for v in xyz])
+    return atoms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000, help="合成文件数量")
+    parser.add_argument("--steps", type=int, default=30, help="每个文件的优化步数")
+    parser.add_argument("--atoms", type=int, default=60, help="每个结构的原子数")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 4], help="要测试的并行进程数")
+    parser.add_argument("--multiwfn", type=int, default=20, help="用 Multiwfn 对比的文件数 (需要 PATH 中有 Multiwfn)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        files = write_gaussian_campaign(workdir, args.files, steps=args.steps, atoms=args.atoms)
+        total_mb = sum(os.path.getsize(f) for f in files) / 1e6
+        print(f"{len(files)} 个文件, 共 {total_mb:.1f} MB, 每个结构 {args.atoms} 个原子")
+
+        start = time.perf_counter()
+        expected = [forward_last_geometry(f) for f in files]
+        forward = time.perf_counter() - start
+
+        print(f"{'mode':>16} {'time/s':>9} {'files/s':>9}")
+        print(f"{'forward-read':>16} {forward:9.3f} {len(files) / forward:9.0f}")
+        for jobs in args.jobs:
+            options = SimpleNamespace(
+                jobs=jobs, prefetch=0, unfinished=False, format="gjf", route=None,
+                suffix=f"_j{jobs}", output_dir=None, force=True,
+            )
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                try:
+                    start = time.perf_counter()
+                    written, _ = mkrestart.write_restart_files(files, options)
+                    elapsed = time.perf_counter() - start
+                finally:
+                    sys.stdout = stdout
+            for filename, atoms in zip(files, expected):
+                got = read_gjf_atoms(mkrestart.restart_path(filename, "gjf", options.suffix))
+                if written != len(files) or [
+                    [s] + [round(v, 6) for v in xyz] for s, *xyz in got
+                ] != atoms:
+                    print(f"错误: {filename} 的结构与完整读取的结果不一致")
+                    sys.exit(1)
+            print(f"{'mkrestart -j ' + str(jobs):>16} {elapsed:9.3f} {len(files) / elapsed:9.0f}")
+
+        if shutil.which("Multiwfn") and args.multiwfn > 0:
+            subset = files[: args.multiwfn]
+            start = time.perf_counter()
+            for filename in subset:
+                subprocess.run(
+                    ["Multiwfn", filename],
+                    input=f"100\n2\n10\n{filename}.mwfn.gjf\n0\nq\n",
+                    text=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            elapsed = time.perf_counter() - start
+            print(f"{'Multiwfn/file':>16} {elapsed:9.3f} {len(subset) / elapsed:9.0f}  (前 {len(subset)} 个文件)")
+        else:
+            print("PATH 中没有 Multiwfn, 跳过对比")
+
+
+if __name__ == "__main__":
+    main()
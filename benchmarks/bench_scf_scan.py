@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+"""
+parse_scf_steps: 逐行尝试全部正则与按关键字跳到候选行的字节块扫描的耗时对比
+
+合成的 opt+freq 日志中, 绝大多数行与 SCF 无关。两种实现的结果必须完全相同。
+
+    python benchmarks/bench_scf_scan.py --size 2GB --workdir /scratch/bench
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from bench_parsers import parse_size, size_label  # noqa: E402
+from qctools import scf  # noqa: E402
+from qctools.common import convert_d_to_float, update_last_or_append  # noqa: E402
+from qctools.incremental import iter_complete_lines  # noqa: E402
+from qctools.scf import (  # noqa: E402
+    CYCLE_PATTERN,
+    DELTA_E_PATTERN,
+    ENERGY_PATTERN,
+    LAST_SCF,
+    MAXDP_PATTERN,
+    RMSDP_PATTERN,
+    SCF_DONE_PATTERN,
+    THRESHOLD_PATTERNS,
+    new_scf_state,
+    scf_result,
+)
+from synth import write_sized_log  # noqa: E402
+
+
+def legacy_feed_scf_lines(state, lines):
+    """改写前的实现: 每一行都依次尝试三个阈值正则、SCF Done 和 Cycle 正则"""
+    keep_all = state["keep_all"]
+    thresholds = state["thresholds"]
+    detailed_rows = state["detailed_rows"]
+    fallback_rows = state["fallback_rows"]
+    pending = state["pending"]
+    pending_remaining = state["pending_remaining"]
+    for line in lines:
+        for key, pattern in THRESHOLD_PATTERNS.items():
+            match = pattern.search(line)
+            if match:
+                value = convert_d_to_float(match.group(1))
+                if value is not None:
+                    thresholds[key] = value
+
+        done_match = SCF_DONE_PATTERN.search(line)
+        if done_match:
+            energy = convert_d_to_float(done_match.group(1))
+            if energy is not None:
+                update_last_or_append(
+                    fallback_rows,
+                    [int(done_match.group(2)), None, None, None, energy],
+                    keep_all is True,
+                )
+
+        if pending is not None:
+            stripped = line.strip()
+            if pending["energy"] is None and stripped.startswith("E="):
+                energy_match = ENERGY_PATTERN.search(stripped)
+                if energy_match:
+                    pending["energy"] = convert_d_to_float(energy_match.group(1))
+
+            if pending["rmsdp"] is None and stripped.startswith("RMSDP="):
+                rmsdp_match = RMSDP_PATTERN.search(stripped)
+                maxdp_match = MAXDP_PATTERN.search(stripped)
+                delta_e_match = DELTA_E_PATTERN.search(stripped)
+                if rmsdp_match and maxdp_match:
+                    pending["rmsdp"] = convert_d_to_float(rmsdp_match.group(1))
+                    pending["maxdp"] = convert_d_to_float(maxdp_match.group(1))
+                    pending["delta_e"] = (
+                        convert_d_to_float(delta_e_match.group(1))
+                        if delta_e_match
+                        else None
+                    )
+
+            if (
+                pending["energy"] is not None
+                and pending["rmsdp"] is not None
+                and pending["maxdp"] is not None
+            ):
+                if (
+                    keep_all == LAST_SCF
+                    and detailed_rows
+                    and pending["cycle"] <= detailed_rows[-1][0]
+                ):
+                    # 新的一次 SCF
+                    detailed_rows.clear()
+                update_last_or_append(
+                    detailed_rows,
+                    [
+                        pending["cycle"],
+                        pending["delta_e"],
+                        pending["rmsdp"],
+                        pending["maxdp"],
+                        pending["energy"],
+                    ],
+                    keep_all,
+                )
+                pending = None
+            else:
+                pending_remaining -= 1
+                if pending_remaining <= 0:
+                    pending = None
+
+        cycle_match = CYCLE_PATTERN.search(line)
+        if cycle_match:
+            pending = {
+                "cycle": int(cycle_match.group(1)),
+                "energy": None,
+                "rmsdp": None,
+                "maxdp": None,
+                "delta_e": None,
+            }
+            pending_remaining = 15
+    state["pending"] = pending
+    state["pending_remaining"] = pending_remaining
+
+
+def legacy_parse_scf_steps(filename, keep_all=True):
+    state = new_scf_state(keep_all)
+    with open(filename, "rb") as handle:
+        legacy_feed_scf_lines(state, iter_complete_lines(handle, state))
+    return scf_result(state)
+
+
+def best_time(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(args, workdir):
+    path = os.path.join(workdir, f"gaussian_optfreq_{size_label(args.size)}.log")
+    if not os.path.exists(path) or os.path.getsize(path) < args.size:
+        write_sized_log(path, "gaussian_optfreq", args.size)
+    mb = os.path.getsize(path) / 1e6
+
+    print(f"文件大小: {mb:.1f} MB")
+    print(f"{'keep_all':<10} {'legacy/s':>9} {'scan/s':>9} {'MB/s':>9} {'speedup':>8}")
+    for keep_all in (True, False, LAST_SCF):
+        old_time, old_result = best_time(
+            lambda: legacy_parse_scf_steps(path, keep_all), args.repeat
+        )
+        new_time, new_result = best_time(
+            lambda: scf.parse_scf_steps(path, keep_all), args.repeat
+        )
+        if old_result != new_result:
+            print(f"错误: keep_all={keep_all} 时两种实现的结果不一致")
+            sys.exit(1)
+        print(
+            f"{str(keep_all):<10} {old_time:9.3f} {new_time:9.3f} "
+            f"{mb / new_time:9.1f} {old_time / new_time:7.1f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--size", type=parse_size, default=parse_size("200MB"), help="合成日志大小 (默认: 200MB)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数, 取最快")
+    parser.add_argument(
+        "--workdir",
+        help="保存合成文件的目录, 再次运行时直接复用 (默认: 临时目录, 结束后删除)",
+    )
+    args = parser.parse_args()
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        run(args, args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            run(args, workdir)
+
+
+if __name__ == "__main__":
+    main()
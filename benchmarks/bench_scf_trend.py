@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+analyse_batch: 逐个任务计算 (_analyse_python) 与 NumPy 数组运算 (_analyse_numpy) 的一致性和耗时
+
+合成的 SCF 记录包括正在收敛、已收敛、收敛过慢、停滞、振荡, 以及数据点不足、
+判据缺失或为 0 的任务。两种实现对每个任务给出的 ScfTrend 必须完全相同。需要 NumPy。
+
+    python benchmarks/bench_scf_trend.py --count 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from qctools import scftrend  # noqa: E402
+from qctools.scf import new_scf_state, threshold_criterion  # noqa: E402
+
+THRESHOLDS = new_scf_state(True)["thresholds"]
+
+
+def _row(cycle, delta_e, rmsdp, maxdp, energy=-100.0):
+    return [
+        cycle,
+        threshold_criterion(delta_e, THRESHOLDS["de"]),
+        threshold_criterion(rmsdp, THRESHOLDS["rmsdp"]),
+        threshold_criterion(maxdp, THRESHOLDS["maxdp"]),
+        energy,
+    ]
+
+
+def _trace(rng, cycles, start, rate, noise, alternate=False):
+    """log10 判据从 start 开始每个 Cycle 变化 rate 个数量级, 叠加 noise 的随机扰动"""
+    rows = []
+    first = rng.randint(1, 40)
+    sign = -1
+    for i in range(cycles):
+        level = start + rate * i + rng.uniform(-noise, noise)
+        if alternate:
+            level += 0.5 if i % 2 else -0.5
+            sign = -sign
+        elif rng.random() < 0.1:
+            sign = -sign
+        rmsdp = 10.0 ** level
+        rows.append(_row(first + i, sign * 10.0 ** (level + 1), rmsdp, rmsdp * rng.uniform(5, 20)))
+    return rows
+
+
+def synthetic_traces(count, seed=0):
+    """count 个任务的 [Cycle, DE, RMSDP, MaxDP, E] 记录, 各类情况按固定比例随机生成"""
+    rng = random.Random(seed)
+    traces = []
+    for _ in range(count):
+        kind = rng.choice(
+            ["converging", "converged", "slow", "stalled", "oscillating", "short", "gaps"]
+        )
+        cycles = rng.randint(1, 40)
+        if kind == "converging":
+            traces.append(_trace(rng, cycles, -2, rng.uniform(-1.5, -0.2), 0.2))
+        elif kind == "converged":
+            traces.append(_trace(rng, max(cycles, 6), -7, rng.uniform(-1.0, -0.3), 0.1))
+        elif kind == "slow":
+            traces.append(_trace(rng, cycles, -2, rng.uniform(-0.09, -0.05), 0.01))
+        elif kind == "stalled":
+            traces.append(_trace(rng, cycles, -3, rng.uniform(-0.04, 0.04), 0.05))
+        elif kind == "oscillating":
+            traces.append(_trace(rng, cycles, -3, rng.uniform(-0.02, 0.02), 0.05, True))
+        elif kind == "short":
+            traces.append(_trace(rng, rng.randint(0, scftrend.MIN_POINTS), -2, -0.5, 0.1))
+        else:
+            # 缺失的判据、为 0 的判据, 以及只有 SCF Done 的记录
+            rows = _trace(rng, cycles, -2, rng.uniform(-1.0, 0.1), 0.3)
+            for row in rows:
+                roll = rng.random()
+                if roll < 0.15:
+                    row[rng.randint(1, 3)] = None
+                elif roll < 0.25:
+                    row[1] = threshold_criterion(0.0, THRESHOLDS["de"])
+            if rng.random() < 0.2:
+                rows = [[row[0], None, None, None, row[4]] for row in rows]
+            traces.append(rows)
+    return traces
+
+
+def best_time(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _same(a, b):
+    """ScfTrend 逐项相同, 类型也相同 (例如剩余 Cycle 数都是 int); 斜率已在 _verdict 中舍入"""
+    return a == b and [type(x) for x in a] == [type(x) for x in b]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--count", type=int, default=20000, help="合成任务数 (默认: 20000)")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数, 取最快")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args()
+
+    if scftrend.np is None:
+        print("错误: 需要安装 NumPy 才能比较两种实现")
+        sys.exit(1)
+
+    traces = synthetic_traces(args.count, args.seed)
+    window, max_cycles = scftrend.WINDOW, scftrend.DEFAULT_MAX_CYCLES
+    python_time, expected = best_time(
+        lambda: [scftrend._analyse_python(rows, window, max_cycles) for rows in traces],
+        args.repeat,
+    )
+    numpy_time, actual = best_time(
+        lambda: scftrend._analyse_numpy(traces, window, max_cycles), args.repeat
+    )
+
+    mismatches = [i for i, (a, b) in enumerate(zip(expected, actual)) if not _same(a, b)]
+    for i in mismatches[:5]:
+        print(f"任务 {i}: python={expected[i]} numpy={actual[i]}")
+    if mismatches or len(expected) != len(actual):
+        print(f"错误: {len(mismatches)} 个任务两种实现的结果不一致")
+        sys.exit(1)
+
+    verdicts = {}
+    for trend in expected:
+        verdicts[trend.verdict] = verdicts.get(trend.verdict, 0) + 1
+    print("判断结果: " + ", ".join(f"{name} {verdicts[name]}" for name in sorted(verdicts)))
+    print(f"{'任务数':<8} {'python/s':>9} {'numpy/s':>9} {'speedup':>8}")
+    print(
+        f"{len(traces):<8} {python_time:9.3f} {numpy_time:9.3f} "
+        f"{python_time / numpy_time:7.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
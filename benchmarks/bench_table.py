@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""表格渲染: 逐行 center_string + print 与单缓冲 render_table 的耗时对比"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from qctools.common import Colored, Colors, Criterion, color_by_status, get_visible_len  # noqa: E402
+from qctools.opt import OPT_HEADERS, format_opt_row  # noqa: E402
+from qctools.table import (  # noqa: E402
+    BL, BM, BR, ML, MM, MR, TL, TM, TR,
+    align_decimal, draw_table, make_border, make_row,
+)
+
+SUMMARY_HEADERS = ["File", "Type", "Status", "Steps", "Max Force", "Energy"]
+
+
+def summary_rows(count):
+    rng = random.Random(0)
+    rows = []
+    for i in range(count):
+        status = rng.choice(["NORMAL", "ERROR", "RUNNING"])
+        force = Criterion(rng.uniform(0, 1e-3), 4.5e-4, rng.random() < 0.5, 6)
+        rows.append([
+            f"job_{i:06d}/opt.log",
+            Colored("GAUSSIAN", Colors.CYAN),
+            color_by_status(status, status),
+            str(rng.randint(1, 300)),
+            format_opt_row([1, force, None, None, None])[1],
+            rng.uniform(-3000, -10),
+        ])
+    return rows
+
+
+def history_rows(count):
+    rng = random.Random(1)
+    rows = []
+    for step in range(1, count + 1):
+        crit = [Criterion(rng.uniform(0, 2e-3), 1e-3, rng.random() < 0.5, 6) for _ in range(4)]
+        rows.append(format_opt_row([step] + crit))
+    return rows
+
+
+def legacy_draw_table(headers, rows, float_columns=None, precision=10):
+    """改写前的实现: 每个单元格用正则计算两次宽度, 每行单独 print"""
+    float_columns = set(float_columns or [])
+    col_widths = [len(h) for h in headers]
+    max_int_width = {i: 0 for i in float_columns}
+    for row in rows:
+        for i, cell in enumerate(row):
+            if i in float_columns and isinstance(cell, float):
+                int_part = f"{cell:.{precision}f}".split(".")[0]
+                max_int_width[i] = max(max_int_width[i], len(int_part))
+                col_widths[i] = max(col_widths[i], max_int_width[i] + 1 + precision)
+            else:
+                col_widths[i] = max(col_widths[i], get_visible_len(str(cell)))
+    print(make_border(TL, TM, TR, col_widths))
+    print(make_row(headers, col_widths))
+    print(make_border(ML, MM, MR, col_widths))
+    for row in rows:
+        cells = []
+        for i, cell in enumerate(row):
+            if i in float_columns and isinstance(cell, float):
+                cells.append(align_decimal(cell, col_widths[i], max_int_width[i], precision))
+            else:
+                cells.append(str(cell))
+        print(make_row(cells, col_widths))
+    print(make_border(BL, BM, BR, col_widths))
+
+
+def best_time(func, repeat):
+    best, text = None, None
+    for _ in range(repeat):
+        buffer = io.StringIO()
+        start = time.perf_counter()
+        with redirect_stdout(buffer):
+            func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        text = buffer.getvalue()
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--summary-rows", type=int, default=20000, help="汇总表的行数")
+    parser.add_argument("--history-rows", type=int, default=5000, help="优化历史表的行数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数, 取最快")
+    args = parser.parse_args()
+
+    cases = [
+        ("summary", SUMMARY_HEADERS, summary_rows(args.summary_rows), {5}),
+        ("history", OPT_HEADERS, history_rows(args.history_rows), None),
+    ]
+    print(f"{'table':<10} {'rows':>7} {'legacy/s':>9} {'buffer/s':>9} {'speedup':>8}")
+    for name, headers, rows, float_columns in cases:
+        old_time, old_text = best_time(
+            lambda: legacy_draw_table(headers, rows, float_columns), args.repeat
+        )
+        new_time, new_text = best_time(
+            lambda: draw_table(headers, rows, float_columns), args.repeat
+        )
+        if old_text != new_text:
+            print(f"错误: {name} 表格两种实现的输出不一致")
+            sys.exit(1)
+        print(
+            f"{name:<10} {len(rows):7d} {old_time:9.3f} {new_time:9.3f} "
+            f"{old_time / new_time:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+模拟高延迟文件系统 (NFS/Lustre) 的本地 shim, 供基准测试使用
+
+在 with slow_io(latency): 期间, 以只读方式打开文件 (内置 open / io.FileIO) 和之后的每次 read
+都先等待 latency 秒, 相当于每个请求一次网络往返; seek 和 fstat 不等待 (客户端缓存了文件属性)。
+等待用 time.sleep, 与真实的网络等待一样释放 GIL, 可以被其他线程重叠。
+写入方式打开的文件和 mmap 不受影响。
+"""
+
+import builtins
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_real_open = builtins.open
+_real_file_io = io.FileIO
+
+# 本次 slow_io 期间的请求数
+counts = {"opens": 0, "reads": 0}
+_lock = threading.Lock()
+_latency = 0.0
+
+
+def _wait(kind):
+    with _lock:
+        counts[kind] += 1
+    time.sleep(_latency)
+
+
+class SlowFileIO(_real_file_io):
+    def __init__(self, file, mode="r", closefd=True, opener=None):
+        super().__init__(file, mode, closefd, opener)
+        if not self.writable():
+            _wait("opens")
+
+    def readinto(self, buffer):
+        _wait("reads")
+        return super().readinto(buffer)
+
+    def read(self, size=-1):
+        _wait("reads")
+        return super().read(size)
+
+    def readall(self):
+        _wait("reads")
+        return super().readall()
+
+
+def slow_open(
+    file, mode="r", buffering=-1, encoding=None, errors=None, newline=None, closefd=True, opener=None
+):
+    if any(ch in mode for ch in "wax+") or not isinstance(file, (str, bytes, os.PathLike)):
+        return _real_open(file, mode, buffering, encoding, errors, newline, closefd, opener)
+    raw = SlowFileIO(file, "r", closefd, opener)
+    if buffering == 0:
+        return raw
+    buffered = io.BufferedReader(raw, io.DEFAULT_BUFFER_SIZE if buffering in (-1, 1) else buffering)
+    if "b" in mode:
+        return buffered
+    return io.TextIOWrapper(buffered, encoding=encoding, errors=errors, newline=newline)
+
+
+@contextmanager
+def slow_io(latency):
+    """在 with 块中为每次打开和读取文件加上 latency 秒的延迟"""
+    global _latency
+    _latency = latency
+    for key in counts:
+        counts[key] = 0
+    builtins.open, io.FileIO = slow_open, SlowFileIO
+    try:
+        yield counts
+    finally:
+        builtins.open, io.FileIO = _real_open, _real_file_io
@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+"""生成用于基准测试的合成输出文件"""
+
+import os
+import random
+
+GAUSSIAN_HEADER = """ Entering Gaussian System, Link 0=g16
+ Initial command:
+ /opt/g16/l1.exe "/scratch/Gau-12345.inp" -scrdir="/scratch/"
+ Copyright (c) 1988-2019, Gaussian, Inc.  All Rights Reserved.
+
+ Cite this work as:
+ Gaussian 16, Revision C.01,
+ ******************************************
+ %nprocshared=16
+ %mem=32GB
+ ----------------------------------------------------------------------
+ #p opt freq b3lyp/def2svp
+ ----------------------------------------------------------------------
+"""
+
+GAUSSIAN_CHARGE = """ Symbolic Z-matrix:
+ Charge =  0 Multiplicity = 1
+"""
+
+GAUSSIAN_ORIENTATION = """                         Standard orientation:
+ ---------------------------------------------------------------------
+ Center     Atomic      Atomic             Coordinates (Angstroms)
+ Number     Number       Type             X           Y           Z
+ ---------------------------------------------------------------------
+{rows} ---------------------------------------------------------------------
+"""
+
+GAUSSIAN_OPT_STEP = """
+ Berny optimization.
+ Search for a local minimum.
+ Step number {step:3d} out of a maximum of  {max_steps:3d}
+ All quantities printed in internal units (Hartrees-Bohrs-Radians).
+{filler}         Item               Value     Threshold  Converged?
+ Maximum Force            {f1:.6f}     0.000450     {c1}
+ RMS     Force            {f2:.6f}     0.000300     {c2}
+ Maximum Displacement     {d1:.6f}     0.001800     {c3}
+ RMS     Displacement     {d2:.6f}     0.001200     {c4}
+ Predicted change in Energy=-1.234567D-06
+ GradGradGradGradGradGradGradGradGradGradGradGradGradGradGradGradGradGrad
+"""
+
+GAUSSIAN_NORMAL_END = " Normal termination of Gaussian 16 at Mon Jan  1 00:00:00 2024.\n"
+
+
+def _yes_no(value, threshold):
+    return "YES" if value < threshold else "NO"
+
+
+def _filler(rng, lines):
+    return "".join(
+        f" {rng.randint(1, 99):5d} {rng.uniform(-5, 5):14.8f} {rng.uniform(-5, 5):14.8f} {rng.uniform(-5, 5):14.8f}\n"
+        for _ in range(lines)
+    )
+
+
+def _orientation(rng, atoms):
+    rows = "".join(
+        f" {center:6d} {rng.choice((1, 6, 7, 8)):10d} {0:11d} "
+        f"{rng.uniform(-5, 5):15.6f} {rng.uniform(-5, 5):11.6f} {rng.uniform(-5, 5):11.6f}\n"
+        for center in range(1, atoms + 1)
+    )
+    return GAUSSIAN_ORIENTATION.format(rows=rows)
+
+
+def gaussian_opt_log(steps, filler_lines=40, finished=True, seed=0, atoms=0):
+    """
+    返回包含 steps 个优化步骤的 Gaussian 输出文本
+    atoms > 0 时每一步前输出含 atoms 个原子的 Standard orientation 表 (以及文件头中的电荷)
+    """
+    rng = random.Random(seed)
+    parts = [GAUSSIAN_HEADER]
+    if atoms:
+        parts.append(GAUSSIAN_CHARGE)
+    for step in range(1, steps + 1):
+        if atoms:
+            parts.append(_orientation(rng, atoms))
+        scale = 10 ** (-2 - 3 * step / max(steps, 1))
+        f1, f2 = scale * rng.uniform(1, 5), scale * rng.uniform(0.5, 2)
+        d1, d2 = scale * rng.uniform(5, 20), scale * rng.uniform(2, 8)
+        parts.append(
+            GAUSSIAN_OPT_STEP.format(
+                step=step,
+                max_steps=max(steps, 100),
+                filler=_filler(rng, filler_lines),
+                f1=f1,
+                f2=f2,
+                d1=d1,
+                d2=d2,
+                c1=_yes_no(f1, 0.00045),
+                c2=_yes_no(f2, 0.0003),
+                c3=_yes_no(d1, 0.0018),
+                c4=_yes_no(d2, 0.0012),
+            )
+        )
+    if finished:
+        parts.append(GAUSSIAN_NORMAL_END)
+    return "".join(parts)
+
+
+def write_gaussian_campaign(directory, count, steps=30, filler_lines=40, atoms=0):
+    """在 directory 下写入 count 个 Gaussian 优化输出, 返回文件列表"""
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for idx in range(count):
+        path = os.path.join(directory, f"job{idx:05d}.log")
+        with open(path, "w") as handle:
+            handle.write(
+                gaussian_opt_log(
+                    steps,
+                    filler_lines=filler_lines,
+                    finished=idx % 3 != 0,
+                    seed=idx,
+                    atoms=atoms,
+                )
+            )
+        files.append(path)
+    return files
+
+
+# --- 指定大小的输出文件 (1 MB ~ 数 GB), 供 bench_parsers.py 使用 ---
+
+GAUSSIAN_SCF_THRESHOLDS = """ Requested convergence on RMS density matrix=1.00D-08 within 128 cycles.
+ Requested convergence on MAX density matrix=1.00D-06.
+ Requested convergence on             energy=1.00D-06.
+ No special actions if energy rises.
+"""
+
+GAUSSIAN_SCF_CYCLE = """ Cycle {cycle:3d}  Pass 1  IDiag  1:
+ E= {energy:.12f}     Delta-E=       {delta:.9f} Rises=F Damp=F
+ DIIS: error= {rmsdp} at cycle {cycle:3d} NSaved= {cycle:3d}.
+ NSaved= {cycle:2d} IEnMin= {cycle:2d} EnMin= {energy:.12f}     IErMin= {cycle:2d} ErrMin= {rmsdp}
+ Coeff-Com:  0.112D+01-0.125D+00
+ Gap=     0.205 Goal=   None    Shift=    0.000
+ RMSDP={rmsdp} MaxDP={maxdp} DE={de} OVMax= {maxdp}
+"""
+
+GAUSSIAN_SCF_DONE = " SCF Done:  E(RB3LYP) =  {energy:.12f}     A.U. after {cycles:3d} cycles\n"
+
+GAUSSIAN_IRC_POINT = """ IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC-IRC
+ Pt {point:2d} Step number   1 out of a maximum of  20
+ Modified Bofill update using the last       2 points.
+{filler} Point Number: {point:3d} in {direction} direction.
+  CHANGE IN THE REACTION COORDINATE =    0.09999
+  NET REACTION COORDINATE UP TO THIS POINT =    {coord:.5f}
+ Energy = {energy:.9f}
+  # OF POINTS ALONG THE PATH = {point:3d}
+  # OF STEPS =   1
+ Calculating another point on the path.
+"""
+
+ORCA_HEADER = """
+                                 *****************
+                                 * O   R   C   A *
+                                 *****************
+
+                  #######################################################
+                  #                        -***-                        #
+                  #          Department of theory and spectroscopy      #
+                  #######################################################
+
+                         Program Version 5.0.4 -  RELEASE  -
+
+                                *****************************
+                                * Geometry Optimization Run *
+                                *****************************
+"""
+
+ORCA_OPT_CYCLE = """
+                *************************************************************
+                *                GEOMETRY OPTIMIZATION CYCLE {step:3d}            *
+                *************************************************************
+----------------------
+SCF ITERATIONS
+----------------------
+ITER       Energy         Delta-E        Max-DP      RMS-DP      [F,P]     Damp
+{filler}
+                         .--------------------.
+          ----------------------|Geometry convergence|-------------------------
+          Item                value                   Tolerance       Converged
+          ---------------------------------------------------------------------
+          Energy change      -0.0000123456            0.0000050000      NO
+          RMS gradient        {g2:.10f}            0.0001000000      {c2}
+          MAX gradient        {g1:.10f}            0.0003000000      {c1}
+          RMS step            {s2:.10f}            0.0020000000      {c4}
+          MAX step            {s1:.10f}            0.0040000000      {c3}
+          ........................................................
+          Max(Bonds)      0.0004    Max(Angles)    0.03
+          ---------------------------------------------------------------------
+"""
+
+ORCA_NORMAL_END = "\n                             ****ORCA TERMINATED NORMALLY****\nTOTAL RUN TIME: 0 days 0 hours 1 minutes 2 seconds 345 msec\n"
+
+CP2K_HEADER = """ DBCSR| CPU Multiplication driver                                           XSMM
+ **** **** ******  **  PROGRAM STARTED AT               2024-01-01 00:00:00.000
+ ***** ** ***  *** **   PROGRAM STARTED ON                              node001
+ CP2K| version string:                                          CP2K version 2023.1
+ CP2K| source code revision number:                                  git:1234567
+ GLOBAL| Run type                                                        GEO_OPT
+"""
+
+CP2K_OPT_STEP = """
+  Step     Update method      Time    Convergence         Total energy    Change
+  ------------------------------------------------------------------------------
+{filler}
+ --------  Informations at step = {step:5d} ------------
+  Optimization Method        =                 BFGS
+  Total Energy               =     -1234.567890123456
+ OPT| Step number                                                       {step:8d}
+ OPT| Maximum step size                                              {s1:10.7f}
+ OPT| Convergence limit for maximum step size                         0.0030000
+ OPT| Maximum step size is converged                                          {c3:>3}
+ OPT| RMS step size                                                  {s2:10.7f}
+ OPT| Convergence limit for RMS step size                             0.0015000
+ OPT| RMS step size is converged                                              {c4:>3}
+ OPT| Maximum gradient                                               {g1:10.7f}
+ OPT| Convergence limit for maximum gradient                          0.0004500
+ OPT| Maximum gradient is converged                                           {c1:>3}
+ OPT| RMS gradient                                                   {g2:10.7f}
+ OPT| Convergence limit for RMS gradient                              0.0003000
+ OPT| RMS gradient is converged                                               {c2:>3}
+ ---------------------------------------------------
+"""
+
+CP2K_NORMAL_END = """
+ **** **** ******  **  PROGRAM ENDED AT                 2024-01-01 01:00:00.000
+"""
+
+# 预先生成的填充块个数, 写大文件时循环使用, 避免逐行调用随机数
+FILLER_VARIANTS = 16
+
+
+def _orca_filler(rng, lines):
+    return "\n".join(
+        f"  {i:2d}  {rng.uniform(-2000, -100):16.10f}  {rng.uniform(-1e-3, 1e-3):13.10f}  "
+        f"{rng.uniform(0, 1e-2):.8f}  {rng.uniform(0, 1e-3):.8f}  {rng.uniform(0, 1):.4f}  0.7000"
+        for i in range(1, lines + 1)
+    )
+
+
+def _cp2k_filler(rng, lines):
+    return "\n".join(
+        f"  {i:5d} OT DIIS     0.15E+00    0.5     {rng.uniform(0, 1e-2):.8f}  "
+        f"{rng.uniform(-2000, -100):20.10f}  {rng.uniform(-1e-3, 1e-3):10.2E}"
+        for i in range(1, lines + 1)
+    )
+
+
+def _fortran_d(value):
+    """Gaussian 以 D 作为指数符号, 例如 1.23D-05"""
+    return f"{value:.2E}".replace("E", "D")
+
+
+def _converging(rng, step, cycle_len=60):
+    """收敛判据随步数减小, 每 cycle_len 步重新开始 (大文件中重复出现收敛过程)"""
+    scale = 10 ** (-2 - 3 * (step % cycle_len) / cycle_len)
+    return (
+        scale * rng.uniform(1, 5),
+        scale * rng.uniform(0.5, 2),
+        scale * rng.uniform(5, 20),
+        scale * rng.uniform(2, 8),
+    )
+
+
+def _gaussian_opt_block(step, rng, fillers):
+    f1, f2, d1, d2 = _converging(rng, step)
+    return GAUSSIAN_OPT_STEP.format(
+        step=step % 1000,
+        max_steps=999,
+        filler=fillers[step % len(fillers)],
+        f1=f1,
+        f2=f2,
+        d1=d1,
+        d2=d2,
+        c1=_yes_no(f1, 0.00045),
+        c2=_yes_no(f2, 0.0003),
+        c3=_yes_no(d1, 0.0018),
+        c4=_yes_no(d2, 0.0012),
+    )
+
+
+def _gaussian_scf_block(step, rng, fillers, cycles=16):
+    """一个几何步: 收敛阈值、cycles 个 SCF Cycle、SCF Done 和收敛表"""
+    parts = [GAUSSIAN_SCF_THRESHOLDS]
+    energy = -1234.5 - rng.uniform(0, 1e-2)
+    for cycle in range(1, cycles + 1):
+        scale = 10 ** (-2 - 7 * cycle / cycles)
+        parts.append(
+            GAUSSIAN_SCF_CYCLE.format(
+                cycle=cycle,
+                energy=energy - scale,
+                delta=-scale,
+                de=_fortran_d(-scale),
+                rmsdp=_fortran_d(scale * rng.uniform(0.1, 1)),
+                maxdp=_fortran_d(scale * rng.uniform(1, 10)),
+            )
+        )
+    parts.append(GAUSSIAN_SCF_DONE.format(energy=energy, cycles=cycles))
+    parts.append(_gaussian_opt_block(step, rng, fillers))
+    return "".join(parts)
+
+
+def _gaussian_irc_block(step, rng, fillers):
+    half = step % 2
+    return GAUSSIAN_IRC_POINT.format(
+        point=step // 2 % 100 + 1,
+        direction="REVERSE" if half else "FORWARD",
+        filler=fillers[step % len(fillers)],
+        coord=0.1 * (step // 2 % 100 + 1),
+        energy=-1234.5 - 1e-4 * (step % 200),
+    )
+
+
+def _orca_opt_block(step, rng, fillers):
+    g1, g2, s1, s2 = _converging(rng, step)
+    return ORCA_OPT_CYCLE.format(
+        step=step,
+        filler=fillers[step % len(fillers)],
+        g1=g1,
+        g2=g2,
+        s1=s1,
+        s2=s2,
+        c1=_yes_no(g1, 0.0003),
+        c2=_yes_no(g2, 0.0001),
+        c3=_yes_no(s1, 0.004),
+        c4=_yes_no(s2, 0.002),
+    )
+
+
+def _cp2k_opt_block(step, rng, fillers):
+    g1, g2, s1, s2 = _converging(rng, step)
+    return CP2K_OPT_STEP.format(
+        step=step,
+        filler=fillers[step % len(fillers)],
+        g1=g1,
+        g2=g2,
+        s1=s1,
+        s2=s2,
+        c1=_yes_no(g1, 0.00045),
+        c2=_yes_no(g2, 0.0003),
+        c3=_yes_no(s1, 0.003),
+        c4=_yes_no(s2, 0.0015),
+    )
+
+
+GAUSSIAN_FREQ = """
+ Harmonic frequencies (cm**-1), IR intensities (KM/Mole), Raman scattering
+ activities (A**4/AMU), depolarization ratios for plane and unpolarized
+ incident light, reduced masses (AMU), force constants (mDyne/A),
+ and normal coordinates:
+                      1                      2                      3
+                      A                      A                      A
+ Frequencies --     52.1234                78.5678               112.9012
+ Red. masses --      3.4567                 2.3456                 4.5678
+ Frc consts  --      0.0055                 0.0083                 0.0342
+ IR Inten    --      0.1234                 1.2345                 0.5678
+ Zero-point correction=                           0.234567 (Hartree/Particle)
+ Sum of electronic and thermal Free Energies=          -1234.456789
+"""
+
+
+# 名称: (文件头, 每步的文本, 正常结束的文本, 填充块生成函数, 每块填充行数)
+SIZED_LOGS = {
+    "gaussian_opt": (GAUSSIAN_HEADER, _gaussian_opt_block, GAUSSIAN_NORMAL_END, _filler, 40),
+    "gaussian_scf": (GAUSSIAN_HEADER, _gaussian_scf_block, GAUSSIAN_NORMAL_END, _filler, 20),
+    # #p opt freq: 每个几何步有大段与 SCF 无关的输出 (坐标、距离矩阵、布居分析等)
+    "gaussian_optfreq": (
+        GAUSSIAN_HEADER, _gaussian_scf_block, GAUSSIAN_FREQ + GAUSSIAN_NORMAL_END, _filler, 1000
+    ),
+    "gaussian_irc": (GAUSSIAN_HEADER, _gaussian_irc_block, GAUSSIAN_NORMAL_END, _filler, 30),
+    "orca_opt": (ORCA_HEADER, _orca_opt_block, ORCA_NORMAL_END, _orca_filler, 15),
+    "cp2k_opt": (CP2K_HEADER, _cp2k_opt_block, CP2K_NORMAL_END, _cp2k_filler, 20),
+}
+
+
+def write_sized_log(path, kind, target_bytes, finished=True, seed=0):
+    """
+    写入约 target_bytes 字节的 kind 类型输出 (见 SIZED_LOGS), 返回实际大小
+    按步骤追加, 超过目标大小后停止, 因此实际大小略大于 target_bytes
+    """
+    header, block, footer, make_filler, filler_lines = SIZED_LOGS[kind]
+    rng = random.Random(seed)
+    fillers = [make_filler(rng, filler_lines) for _ in range(FILLER_VARIANTS)]
+    written = 0
+    step = 0
+    with open(path, "w") as handle:
+        handle.write(header)
+        written += len(header)
+        pending = []
+        pending_size = 0
+        while written + pending_size < target_bytes:
+            step += 1
+            text = block(step, rng, fillers)
+            pending.append(text)
+            pending_size += len(text)
+            if pending_size >= 1 << 20:
+                handle.write("".join(pending))
+                written += pending_size
+                pending, pending_size = [], 0
+        handle.write("".join(pending))
+        if finished:
+            handle.write(footer)
+    return os.path.getsize(path)
@@ -1,467 +1,117 @@
 #!/usr/bin/env python
 
 import sys
-import re
-import glob
 import os
-
-
-# --- 颜色定义 ---
-class Colors:
-    GREEN = "\033[92m"
-    RED = "\033[91m"
-    YELLOW = "\033[93m"
-    CYAN = "\033[96m"
-    ENDC = "\033[0m"
-
-
-# --- 核心解析功能 ---
-
-
-def get_visible_len(s):
-    """获取去除ANSI颜色代码后的字符串长度"""
-    return len(re.sub(r"\033\[[0-9;]*m", "", str(s)))
-
-
-def center_string(content, inner_width):
-    """带颜色字符串的居中对齐"""
-    content_str = str(content)
-    visible_len = get_visible_len(content_str)
-    padding = max(0, inner_width - visible_len)
-    r_padding = padding // 2
-    l_padding = padding - r_padding
-    return " " * l_padding + content_str + " " * r_padding
-
-
-def detect_file_type(filename, lines_to_check=100):
-    """
-    检查文件类型
-    返回: 'GAUSSIAN', 'CP2K', 'ORCA' or None
-    """
-    try:
-        with open(filename, "r", errors="ignore") as f:
-            for _ in range(lines_to_check):
-                line = f.readline()
-                if not line:
-                    break
-                if "Gaussian, Inc." in line or "Cite this work as:" in line:
-                    return "GAUSSIAN"
-                if "* O   R   C   A *" in line or "Program Version" in line:
-                    # 简单的二次确认，防止误判
-                    return "ORCA"
-                if "CP2K|" in line or "PROGRAM STARTED AT" in line:
-                    if "CP2K" in line or "CP2K" in f.read(
-                        1000
-                    ):  # Double check shortly after
-                        return "CP2K"
-    except Exception:
-        return None
-    return None
-
-
-def check_termination_status(filename, file_type):
-    """检查任务是正常结束、报错还是正在运行"""
+import argparse
+from collections import deque
+from itertools import chain
+
+from qctools import compress, daemon, profiling
+from qctools.cache import ParseCache
+from qctools.common import Colored, Colors, as_criterion, color_by_status
+from qctools.detect import (
+    TAIL_CHECK_BYTES,
+    check_termination_status,
+    detect_file_type,
+    program_labels,
+    termination_status_from_text,
+)
+from qctools.discover import (
+    DEFAULT_PATTERNS,
+    collect_output_files,
+    has_magic,
+    iter_output_files,
+    split_archive_args,
+)
+from qctools.engine import (
+    extract_archives,
+    extract_files,
+    iter_archive_batches,
+    iter_extract_batches,
+)
+from qctools.incremental import iter_complete_lines
+from qctools.opt import OPT_HEADERS, STEP_PARSERS, format_opt_row, parse_opt_steps
+from qctools.output import OUTPUT_FORMATS, RecordWriter, exit_on_broken_pipe
+from qctools.prefetch import add_prefetch_arguments, check_prefetch_arguments
+from qctools.stepindex import INDEX_SUFFIX, indexed_opt_steps
+from qctools.table import (
+    BL,
+    BM,
+    BR,
+    ML,
+    MM,
+    MR,
+    TL,
+    TM,
+    TR,
+    StreamTable,
+    draw_table,
+    make_border,
+    make_row,
+)
+from qctools.watch import make_watcher
+
+
+# --- 三种显示模式 ---
+
+
+def parse_step_range(text):
+    """--step 的参数: 'N', 'A:B', 'A:' (到最后一步) 或 ':B' -> (first, last)"""
+    first, sep, last = text.partition(":")
     try:
-        # 使用二进制模式 "rb" 打开，以支持 seek 倒序读取
-        with open(filename, "rb") as f:
-            f.seek(0, os.SEEK_END)
-            file_size = f.tell()
-            # 读取文件末尾的 20KB 内容 (足够覆盖结尾信息)
-            seek_offset = min(file_size, 20000)
-            f.seek(-seek_offset, os.SEEK_END)
-            # 解码为字符串，忽略解码错误
-            content = f.read().decode("utf-8", errors="ignore")
-    except Exception:
-        return "ERROR"
-
-    # 如果文件内容太少（刚开始运行）
-    if not content.strip():
-        return "RUNNING"
-
-    if file_type == "GAUSSIAN":
-        if "Normal termination" in content:
-            return "NORMAL"
-        if "Error termination" in content:
-            return "ERROR"
-
-    elif file_type == "CP2K":
-        if "PROGRAM ENDED AT" in content:
-            return "NORMAL"
-        if "ABNORMAL TERMINATION" in content or "An error has occurred" in content:
-            return "ERROR"
-
-    elif file_type == "ORCA":
-        if "ORCA TERMINATED NORMALLY" in content:
-            return "NORMAL"
-        # ORCA 报错通常不会有特定的统一结尾标志，如果没正常结束且文件不更新，
-        # 往往是报错，但在脚本里很难严格区分 Error 和 Running，
-        # 这里假设只要没看到 normal termination 且不是明显报错就是 running/error
-        if "ORCA finished by error termination" in content:
-            return "ERROR"
-
-    return "RUNNING"
-
-
-def update_last_or_append(rows, row, keep_all):
-    if keep_all:
-        rows.append(row)
-    elif rows:
-        rows[0] = row
+        first = int(first) if first else 1
+        last = (int(last) if last else sys.maxsize) if sep else first
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法识别的步骤范围: {text} (应为 N 或 A:B)")
+    if first < 1 or last < first:
+        raise argparse.ArgumentTypeError(f"步骤从 1 开始编号, 且 A 不能大于 B: {text}")
+    return first, last
+
+
+def show_step_range(filename, file_type, steps=None, last=None):
+    """通过偏移量索引只解析 steps=(first, last) 或最后 last 步"""
+    if last is not None:
+        steps = (-last, sys.maxsize)
+    opt_data, total = indexed_opt_steps(filename, file_type, *steps)
+    if opt_data:
+        print(f"第 {opt_data[0][0]} - {opt_data[-1][0]} 步 (共 {total} 步)")
+        draw_table(OPT_HEADERS, [format_opt_row(row) for row in opt_data])
+    elif total:
+        print(f"没有第 {steps[0]} 步之后的数据 (共 {total} 步)。")
     else:
-        rows.append(row)
-
-
-def parse_gaussian_block(lines, step):
-    parts = [
-        lines[0].split(),  # Max Force
-        lines[1].split(),  # RMS Force
-        lines[2].split(),  # Max Disp
-        lines[3].split(),  # RMS Disp
-    ]
-
-    data_cells = []
-    for p in parts:
-        value = p[2]
-        status = p[4]
-        if status == "YES":
-            fmt_value = f"{Colors.GREEN}{value}{Colors.ENDC}"
-        else:
-            fmt_value = f"{Colors.RED}{value}{Colors.ENDC}"
-        data_cells.append(fmt_value)
-    return [step] + data_cells
-
-
-def parse_gaussian_last_step_from_tail(filename, initial_size=262144):
-    try:
-        with open(filename, "rb") as f:
-            f.seek(0, os.SEEK_END)
-            file_size = f.tell()
-            size = min(initial_size, file_size)
-            while size <= file_size:
-                f.seek(file_size - size, os.SEEK_SET)
-                content = f.read(size).decode("utf-8", errors="ignore")
-
-                candidates = []
-                for match in re.finditer(r"^\s*Maximum Force", content, flags=re.M):
-                    force_pos = match.start()
-                    block = content[force_pos:].splitlines()[:4]
-                    if (
-                        len(block) == 4
-                        and block[0].strip().startswith("Maximum Force")
-                        and block[1].strip().startswith("RMS")
-                        and "Force" in block[1]
-                    ):
-                        prior = content[:force_pos]
-                        step_matches = list(
-                            re.finditer(
-                                r"Step number\s+(\d+)\s+out of a maximum of\s+(\d+)",
-                                prior,
-                            )
-                        )
-                        if step_matches:
-                            step = int(step_matches[-1].group(1))
-                            max_steps = int(step_matches[-1].group(2))
-                        else:
-                            step = content[:force_pos].count("Maximum Force") + 1
-                            max_steps = None
-                        candidates.append((max_steps, force_pos, parse_gaussian_block(block, step)))
-
-                preferred = [
-                    row
-                    for max_steps, _, row in candidates
-                    if max_steps is None or max_steps > 2
-                ]
-                if preferred:
-                    return [preferred[-1]]
-                if candidates and size == file_size:
-                    return [candidates[-1][2]]
-
-                if size == file_size:
-                    break
-                size = min(size * 2, file_size)
-    except Exception:
-        return []
-    return []
-
-
-def parse_gaussian_steps(filename, keep_all=True):
-    """解析 Gaussian 优化步骤"""
-    if not keep_all:
-        tail_result = parse_gaussian_last_step_from_tail(filename)
-        if tail_result:
-            return tail_result
-
-    results = []
-    try:
-        with open(filename, "r", errors="ignore") as f:
-            window = []
-            step_counter = 0
-            for line in f:
-                window.append(line)
-                if len(window) < 4:
-                    continue
-                if len(window) > 4:
-                    window.pop(0)
-
-                l1 = window[0].strip()
-                if not (l1.startswith("Maximum Force") and ("YES" in l1 or "NO" in l1)):
-                    continue
-
-                try:
-                    l2 = window[1].strip()
-                    if not (l2.startswith("RMS") and "Force" in l2):
-                        continue
-
-                    step_counter += 1
-                    update_last_or_append(
-                        results,
-                        parse_gaussian_block(window, step_counter),
-                        keep_all,
-                    )
-                except (IndexError, ValueError):
-                    continue
-    except Exception:
-        return []
-    return results
-
-
-def parse_cp2k_steps(filename):
-    """解析 CP2K 优化步骤 (GEO_OPT)"""
-    results = []
-    try:
-        with open(filename, "r", errors="ignore") as f:
-            content = f.read()
-    except Exception:
-        return []
-
-    step_pattern = re.compile(r"OPT\|\s+Step number\s+(\d+)")
-
-    def get_val_and_status(block, label_val, label_conv):
-        val_match = re.search(
-            rf"OPT\|\s+{re.escape(label_val)}\s+([-+]?\d*\.\d+)", block
-        )
-        conv_match = re.search(rf"OPT\|\s+{re.escape(label_conv)}\s+(YES|NO)", block)
-
-        if val_match and conv_match:
-            val = val_match.group(1)
-            status = conv_match.group(1)
-            try:
-                val_float = float(val)
-                val_str = f"{val_float:.6f}"
-            except:
-                val_str = val
-
-            if status == "YES":
-                return f"{Colors.GREEN}{val_str}{Colors.ENDC}"
-            else:
-                return f"{Colors.RED}{val_str}{Colors.ENDC}"
-        return f"{Colors.YELLOW}N/A{Colors.ENDC}"
-
-    parts = step_pattern.split(content)
-    if len(parts) < 2:
-        return []
-
-    for k in range(1, len(parts), 2):
-        step_num = parts[k]
-        block = parts[k + 1]
-
-        max_grad = get_val_and_status(
-            block, "Maximum gradient", "Maximum gradient is converged"
-        )
-        rms_grad = get_val_and_status(
-            block, "RMS gradient", "RMS gradient is converged"
-        )
-        max_step = get_val_and_status(
-            block, "Maximum step size", "Maximum step size is converged"
-        )
-        rms_step = get_val_and_status(
-            block, "RMS step size", "RMS step size is converged"
-        )
-
-        if "N/A" in max_grad and "N/A" in max_step:
-            continue
-
-        results.append([step_num, max_grad, rms_grad, max_step, rms_step])
-
-    return results
-
-
-def parse_orca_steps(filename):
-    """解析 ORCA 优化步骤"""
-    results = []
-    try:
-        with open(filename, "r", errors="ignore") as f:
-            lines = f.readlines()
-    except Exception:
-        return []
-
-    step_counter = 0
-
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-
-        # --- 修正开始 ---
-        # 匹配类似 "* GEOMETRY OPTIMIZATION CYCLE   1      *" 的行
-        if "GEOMETRY OPTIMIZATION CYCLE" in line:
-            match = re.search(r"GEOMETRY OPTIMIZATION CYCLE\s+(\d+)", line)
-            if match:
-                step_counter = int(match.group(1))
-        # --- 修正结束 ---
-
-        # 抓取收敛表
-        if "Geometry convergence" in line:
-            # 向下寻找表格内容
-            # 表格结构通常如下：
-            # ----------------------|Geometry convergence|-------------------------
-            # Item                value                   Tolerance       Converged
-            # ---------------------------------------------------------------------
-            # RMS gradient        0.0001155240            0.0001000000      NO
-            # MAX gradient        0.0003965150            0.0003000000      NO
-            # RMS step            0.0002714441            0.0020000000      YES
-            # MAX step            0.0007522183            0.0040000000      YES
-
-            # 提取暂存
-            extracted_data = {}
-
-            # 向下看最多 20 行寻找数据
-            for k in range(1, 20):
-                if i + k >= len(lines):
-                    break
-                sub_line = lines[i + k].strip()
-
-                # 遇到分隔符或结束标志停止
-                if "Max(Bonds)" in sub_line or "The step convergence" in sub_line:
-                    break
-
-                parts = sub_line.split()
-                if len(parts) < 4:
-                    continue
-
-                # 提取 Value 和 Converged (YES/NO)
-                # 假设格式: Label Value Tolerance Converged
-                label_key = None
-                if sub_line.startswith("RMS gradient"):
-                    label_key = "RMS_G"
-                elif sub_line.startswith("MAX gradient"):
-                    label_key = "MAX_G"
-                elif sub_line.startswith("RMS step"):
-                    label_key = "RMS_S"
-                elif sub_line.startswith("MAX step"):
-                    label_key = "MAX_S"
-
-                if label_key:
-                    # parts 类似 ['RMS', 'gradient', '0.0001', '0.0001', 'NO']
-                    # ORCA 的分割比较稳定，最后一位是 YES/NO
-                    status = parts[-1]
-                    # 值通常是倒数第三个 (Tolerance 是倒数第二个)
-                    val = parts[-3]
-
-                    if status == "YES":
-                        fmt_val = f"{Colors.GREEN}{val}{Colors.ENDC}"
-                    else:
-                        fmt_val = f"{Colors.RED}{val}{Colors.ENDC}"
-                    extracted_data[label_key] = fmt_val
-
-            # 组装数据，确保顺序：Max Grad, RMS Grad, Max Step, RMS Step
-            if len(extracted_data) >= 4:
-                row = [
-                    step_counter,
-                    extracted_data.get("MAX_G", "N/A"),
-                    extracted_data.get("RMS_G", "N/A"),
-                    extracted_data.get("MAX_S", "N/A"),
-                    extracted_data.get("RMS_S", "N/A"),
-                ]
-                results.append(row)
-
-        i += 1
-
-    return results
-
-
-def parse_opt_steps(filename, file_type, keep_all=True):
-    if file_type == "GAUSSIAN":
-        return parse_gaussian_steps(filename, keep_all=keep_all)
-    elif file_type == "CP2K":
-        return parse_cp2k_steps(filename)
-    elif file_type == "ORCA":
-        return parse_orca_steps(filename)
-    return []
-
-
-# --- 表格绘制功能 ---
-
-
-def draw_table(headers, rows):
-    """通用的表格绘制函数"""
-    if not rows:
-        return
-
-    # 计算列宽
-    col_widths = [len(h) for h in headers]
-    for row in rows:
-        for i, cell in enumerate(row):
-            if i < len(col_widths):
-                col_widths[i] = max(col_widths[i], get_visible_len(cell))
-
-    # 边框字符
-    V, H = "│", "─"
-    TL, TR, BL, BR = "┌", "┐", "└", "┘"
-    ML, MR, TM, BM, MM = "├", "┤", "┬", "┴", "┼"
-
-    def make_border(left, mid, right, widths):
-        segments = [H * (w + 2) for w in widths]
-        return left + mid.join(segments) + right
-
-    # 打印表头
-    print(make_border(TL, TM, TR, col_widths))
-    header_str = V
-    for i, h in enumerate(headers):
-        header_str += f" {center_string(h, col_widths[i])} {V}"
-    print(header_str)
-
-    # 打印数据
-    print(make_border(ML, MM, MR, col_widths))
-    for idx, row in enumerate(rows):
-        row_str = V
-        for i, cell in enumerate(row):
-            row_str += f" {center_string(cell, col_widths[i])} {V}"
-        print(row_str)
-
-    print(make_border(BL, BM, BR, col_widths))
-
-
-# --- 两种显示模式 ---
+        print("未找到优化步骤数据。")
 
 
-def show_single_file_detail(filename):
-    """模式1：显示单个文件的详细优化历史"""
+def show_single_file_detail(filename, steps=None, last=None):
+    """模式1：显示单个文件的详细优化历史; steps / last 时只显示其中一段"""
     file_type = detect_file_type(filename)
 
     if not file_type:
         print(
-            f"{Colors.RED}跳过: 无法识别文件类型 (非 Gaussian/CP2K/ORCA){Colors.ENDC}: {filename}"
+            f"{Colors.RED}跳过: 无法识别文件类型 (非 {program_labels()}){Colors.ENDC}: {filename}"
         )
         return
 
     print(f"--- 分析文件: {filename} [{Colors.CYAN}{file_type}{Colors.ENDC}] ---")
 
-    opt_data = parse_opt_steps(filename, file_type)
+    if steps is not None or last is not None:
+        show_step_range(filename, file_type, steps, last)
+        print_job_status(check_termination_status(filename, file_type))
+        return
+
     status = check_termination_status(filename, file_type)
+    opt_data = parse_opt_steps(filename, file_type, final=status != "RUNNING")
 
     if opt_data:
         # 统一表头显示
-        headers = [
-            "Step",
-            "Max Grad/Force",
-            "RMS Grad/Force",
-            "Max Step/Disp",
-            "RMS Step/Disp",
-        ]
-        draw_table(headers, opt_data)
+        draw_table(OPT_HEADERS, [format_opt_row(row) for row in opt_data])
     else:
         print("未找到优化步骤数据。")
 
+    print_job_status(status)
+
+
+def print_job_status(status):
     print(f"\n--- 任务状态 ---")
     if status == "ERROR":
         print(f"状态: {Colors.RED}FAIL / ABNORMAL{Colors.ENDC}")
@@ -472,116 +122,451 @@ def show_single_file_detail(filename):
         print("      (任务已正常结束)")
 
 
-def show_batch_summary(file_list):
-    """模式2：显示多个文件的汇总列表"""
+# --follow 模式在内存中保留的末尾行数, 用于判断结束状态
+TAIL_CHECK_LINES = 2000
 
-    valid_files = []
-    for f in sorted(file_list):
-        ftype = detect_file_type(f)
-        if ftype:
-            valid_files.append((f, ftype))
 
-    if not valid_files:
-        print("未找到有效的输出文件 (Gaussian/CP2K/ORCA)。")
-        return
+def _tee_lines(lines, sink):
+    """逐行透传, 同时把每一行追加到 sink"""
+    for line in lines:
+        sink.append(line)
+        yield line
 
-    print(f"--- 正在检查 {len(valid_files)} 个文件 ---")
 
-    table_rows = []
-    complete_count = 0
+def follow_file(filename, interval=2.0):
+    """
+    模式3：类似 tail -f, 持续显示新写入的优化步骤
+    文件只从头读取一次, 之后每次只读取新追加的内容;
+    结束状态由内存中保留的末尾若干行判断, 不再回读文件
+    """
+    watcher = make_watcher(filename, interval)
+    try:
+        file_type = detect_file_type(filename)
+        while not file_type and os.path.getsize(filename) < 4096:
+            # 任务刚开始, 程序头部还没写完
+            watcher.wait(interval)
+            file_type = detect_file_type(filename)
+        if not file_type:
+            print(
+                f"{Colors.RED}跳过: 无法识别文件类型 (非 {program_labels()}){Colors.ENDC}: {filename}"
+            )
+            return
+
+        print(f"--- 跟踪文件: {filename} [{Colors.CYAN}{file_type}{Colors.ENDC}] (Ctrl-C 退出) ---")
+        new_state, feed, collect = STEP_PARSERS[file_type]
+        widths = [max(len(h), 6) for h in OPT_HEADERS]
+        print(make_border(TL, TM, TR, widths))
+        print(make_row(OPT_HEADERS, widths))
+        print(make_border(ML, MM, MR, widths), flush=True)
+
+        state = new_state(True)
+        tail = deque(maxlen=TAIL_CHECK_LINES)
+        printed = 0
+        status = "RUNNING"
+        handle = open(filename, "rb")
+        try:
+            while True:
+                st = os.stat(filename)
+                if st.st_ino != os.fstat(handle.fileno()).st_ino or st.st_size < state["offset"]:
+                    # 文件被截断或被新任务替换, 从头开始
+                    handle.close()
+                    handle = open(filename, "rb")
+                    state = new_state(True)
+                    tail.clear()
+                    printed = 0
+                    print(make_border(ML, MM, MR, widths), flush=True)
+
+                if st.st_size > state["offset"]:
+                    offset = state["offset"]
+                    feed(state, _tee_lines(iter_complete_lines(handle, state), tail))
+                    if state["offset"] != offset:
+                        rows = state["rows"]
+                        for row in rows[printed:]:
+                            print(make_row(format_opt_row(row), widths), flush=True)
+                        printed = len(rows)
+                        content = "\n".join(tail)[-TAIL_CHECK_BYTES:]
+                        status = termination_status_from_text(content, file_type)
+                        if status != "RUNNING":
+                            break
+                watcher.wait(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            handle.close()
+
+        # ORCA/CP2K/xtb/Q-Chem 文件末尾尚未结束的步骤
+        for row in collect(state)[printed:]:
+            print(make_row(format_opt_row(row), widths))
+        print(make_border(BL, BM, BR, widths))
+        print_job_status(status)
+    finally:
+        watcher.close()
+
+
+def scan_output_files(file_list, jobs=1, cache=None, archives=(), prefetch=0):
+    """
+    逐个 (jobs=1) 或用进程池并行扫描文件, 返回按文件名排序的 [(filename, ftype, opt_data, status)],
+    之后是 archives 中各 tar 归档的成员; 无法识别类型的文件被丢弃;
+    cache 和 prefetch 的用法见 qctools.engine.extract_files
+    """
+    scanned = extract_files(file_list, ["opt"], cache=cache, jobs=jobs, prefetch=prefetch)
+    scanned += extract_archives(archives, ["opt"], cache=cache)
+    return [(filename, ftype, results["opt"], status) for filename, ftype, status, results in scanned]
+
+
+OPT_SUMMARY_HEADERS = [
+    "File",
+    "Type",
+    "Step",
+    "Max F/G",  # Force / Gradient
+    "RMS F/G",
+    "Max D/S",  # Disp / Step
+    "RMS D/S",
+    "Status",
+]
+
+
+def summary_row(filename, ftype, opt_data, status):
+    """汇总表中的一行: 文件名和状态按结束状态上色, 数据取最后一步"""
+    step_str = "N/A"
+    vals = [Colored("No Data", Colors.RED)] * 4
+    status_str = ""
+
+    # 设置文件名颜色
+    fname_colored = color_by_status(filename, status)
+    if status == "ERROR":
+        status_str = color_by_status("FAIL", status)
+    elif status == "RUNNING":
+        status_str = color_by_status("RUN", status)
+        vals = [Colored("...", Colors.YELLOW)] * 4
+    elif status == "NORMAL":
+        status_str = color_by_status("DONE", status)
+        vals = ["N/A"] * 4
 
-    headers = [
-        "File",
-        "Type",
-        "Step",
-        "Max F/G",  # Force / Gradient
-        "RMS F/G",
-        "Max D/S",  # Disp / Step
-        "RMS D/S",
-        "Status",
-    ]
-
-    for filename, ftype in valid_files:
-        opt_data = parse_opt_steps(filename, ftype, keep_all=False)
-        status = check_termination_status(filename, ftype)
-
-        step_str = "N/A"
-        vals = [f"{Colors.RED}No Data{Colors.ENDC}"] * 4
-        fname_colored = filename
-        status_str = ""
-        type_str = ftype
-
-        # 设置文件名颜色
-        if status == "ERROR":
-            status_str = f"{Colors.RED}FAIL{Colors.ENDC}"
-            fname_colored = f"{Colors.RED}{filename}{Colors.ENDC}"
-        elif status == "RUNNING":
-            status_str = f"{Colors.YELLOW}RUN{Colors.ENDC}"
-            fname_colored = f"{Colors.YELLOW}{filename}{Colors.ENDC}"
-            vals = [f"{Colors.YELLOW}...{Colors.ENDC}"] * 4
-        elif status == "NORMAL":
-            status_str = f"{Colors.GREEN}DONE{Colors.ENDC}"
-            fname_colored = f"{Colors.GREEN}{filename}{Colors.ENDC}"
-            vals = ["N/A"] * 4
-            complete_count += 1
-
-        # 获取最后一步数据
-        if opt_data:
-            last = opt_data[-1]
-            step_str = str(last[0])
-            vals = last[1:]
-
-        row = [fname_colored, type_str, step_str] + vals + [status_str]
-        table_rows.append(row)
-
-    draw_table(headers, table_rows)
+    # 获取最后一步数据
+    if opt_data:
+        last = opt_data[-1]
+        step_str = str(last[0])
+        vals = format_opt_row(last)[1:]
+
+    return [fname_colored, ftype, step_str] + vals + [status_str]
+
+
+OPT_RECORD_FIELDS = [
+    "file",
+    "type",
+    "status",
+    "step",
+    "max_force",
+    "max_force_converged",
+    "rms_force",
+    "rms_force_converged",
+    "max_disp",
+    "max_disp_converged",
+    "rms_disp",
+    "rms_disp_converged",
+]
+
+
+def summary_record(filename, ftype, opt_data, status):
+    """
+    机器可读输出中的一条记录; CP2K/ORCA/xtb/Q-Chem 的梯度和步长分别记在 force 和 disp 字段中,
+    程序没有的判据为 null
+    """
+    record = dict.fromkeys(OPT_RECORD_FIELDS)
+    record.update(file=filename, type=ftype, status=status)
+    if opt_data:
+        last = opt_data[-1]
+        record["step"] = last[0]
+        for key, item in zip(["max_force", "rms_force", "max_disp", "rms_disp"], last[1:]):
+            item = as_criterion(item)
+            if item is not None:
+                record[key], record[f"{key}_converged"] = item.value, item.converged
+    return record
+
+
+def write_summary_records(file_iter, fmt, jobs=1, cache=None, archives=(), prefetch=0):
+    """--format jsonl/csv/tsv: 每解析完一个 (或一批并行/预读的) 文件就输出其记录"""
+    batches = chain(
+        iter_extract_batches(
+            file_iter,
+            ["opt"],
+            cache=cache,
+            jobs=jobs,
+            batch_size=1 if jobs == 1 and not prefetch else None,
+            prefetch=prefetch,
+        ),
+        iter_archive_batches(archives, ["opt"], cache=cache),
+    )
+    try:
+        writer = RecordWriter(fmt, OPT_RECORD_FIELDS)
+        for batch in batches:
+            with profiling.timed("render"):
+                writer.write_all(
+                    summary_record(filename, ftype, results["opt"], status)
+                    for filename, ftype, status, results in batch
+                )
+    except BrokenPipeError:
+        exit_on_broken_pipe()
+
+
+def print_summary_count(complete_count, total):
     print(
-        f"\n统计: {Colors.GREEN}{complete_count}{Colors.ENDC} 个文件已完成 / 共 {len(valid_files)} 个有效文件。"
+        f"\n统计: {Colors.GREEN}{complete_count}{Colors.ENDC} 个文件已完成 / 共 {total} 个有效文件。"
     )
 
 
-# --- 主程序入口 ---
+def show_batch_summary(file_list, jobs=1, cache=None, archives=(), prefetch=0):
+    """模式2：显示多个文件 (以及 tar 归档中的文件) 的汇总列表"""
+
+    scanned = scan_output_files(
+        file_list, jobs=jobs, cache=cache, archives=archives, prefetch=prefetch
+    )
 
+    if not scanned:
+        print(f"未找到有效的输出文件 ({program_labels()})。")
+        return
 
-def collect_output_files(args):
-    if not args:
-        return sorted(set(glob.glob("*.log") + glob.glob("*.out")))
+    print(f"--- 正在检查 {len(scanned)} 个文件 ---")
 
-    files = []
-    for arg in args:
-        if os.path.isdir(arg):
-            files.extend(glob.glob(os.path.join(arg, "*.log")))
-            files.extend(glob.glob(os.path.join(arg, "*.out")))
-        elif "*" in arg or "?" in arg or "[" in arg:
-            files.extend(glob.glob(arg))
-        else:
-            files.append(arg)
+    with profiling.timed("render"):
+        table_rows = [summary_row(*item) for item in scanned]
+        draw_table(OPT_SUMMARY_HEADERS, table_rows)
+    complete_count = sum(1 for item in scanned if item[3] == "NORMAL")
+    print_summary_count(complete_count, len(scanned))
+
+
+def show_recursive_summary(file_iter, jobs=1, cache=None, archives=(), prefetch=0):
+    """
+    递归模式: 边遍历目录边解析和输出, 每处理完一批文件就打印这批的结果
+    (列宽只增不减, 变宽时重新打印表头)
+    """
+    print("--- 正在递归检查输出文件 ---", flush=True)
+    table = StreamTable(OPT_SUMMARY_HEADERS)
+    complete_count = 0
+    batches = chain(
+        iter_extract_batches(file_iter, ["opt"], cache=cache, jobs=jobs, prefetch=prefetch),
+        iter_archive_batches(archives, ["opt"], cache=cache),
+    )
+    for batch in batches:
+        with profiling.timed("render"):
+            table.add_rows([summary_row(*item[:2], item[3]["opt"], item[2]) for item in batch])
+        complete_count += sum(1 for item in batch if item[2] == "NORMAL")
+    table.close()
+
+    if not table.count:
+        print(f"未找到有效的输出文件 ({program_labels()})。")
+        return
+    print_summary_count(complete_count, table.count)
 
-    return sorted(dict.fromkeys(files))
+
+# --- 主程序入口 ---
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=f"检查 {program_labels()} 几何优化的收敛情况"
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="输出文件、目录、通配符或 tar 归档 (默认: 当前目录的 *.log/*.out)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="批量模式下并行解析的进程数 (默认: 1, 0 表示使用全部 CPU)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="不读取也不更新解析结果缓存和压缩文件的索引"
+    )
+    parser.add_argument(
+        "--cache-file", default=None, help="缓存文件路径 (默认: ~/.cache/chouscripts/results.json, 三个脚本共用)"
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="递归查找目录下的输出文件, 边查找边输出结果",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="PATTERN",
+        help="要检查的文件名模式, 可多次指定 (默认: *.log 和 *.out)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="跳过与文件名、目录名或路径匹配的模式, 可多次指定",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="table",
+        help="批量模式的输出格式: 表格 (默认) 或每个文件一条记录的 jsonl/csv/tsv",
+    )
+    parser.add_argument(
+        "-f",
+        "--follow",
+        action="store_true",
+        help="类似 tail -f, 持续显示单个文件新写入的优化步骤",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=2.0,
+        help="--follow 模式下检查文件变化的最长间隔 (秒, 默认: 2)",
+    )
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--step",
+        type=parse_step_range,
+        metavar="A[:B]",
+        help=f"单文件模式: 只显示第 A 到第 B 步, 通过输出文件旁的偏移量索引 (*{INDEX_SUFFIX}) 直接定位",
+    )
+    group.add_argument(
+        "--last", type=int, metavar="N", help="单文件模式: 只显示最后 N 步 (同样使用偏移量索引)"
+    )
+    add_prefetch_arguments(parser)
+    daemon.add_daemon_arguments(parser)
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.follow and (args.step or args.last is not None):
+        parser.error("--follow 不能与 --step/--last 一起使用")
+    if args.last is not None and args.last < 1:
+        parser.error("--last 必须大于 0")
+    if (args.step or args.last is not None) and (
+        args.recursive
+        or args.format != "table"
+        or len(args.paths) != 1
+        or os.path.isdir(args.paths[0])
+    ):
+        parser.error("--step/--last 只用于单文件模式 (只给出一个输出文件, 不与 -r/--format 一起使用)")
+    if args.follow and len(args.paths) != 1:
+        parser.error("--follow 需要且只接受一个文件")
+    if args.follow and args.format != "table":
+        parser.error("--follow 只支持表格输出")
+    if args.follow and (args.profile or args.profile_trace):
+        parser.error("--profile 只用于批量模式")
+    if args.jobs < 0:
+        parser.error("--jobs 不能为负数")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    check_prefetch_arguments(parser, args)
+    args.include = tuple(args.include or DEFAULT_PATTERNS)
+    return args
+
+
+def open_cache(options):
+    if options.no_cache:
+        return None
+    return ParseCache.for_script("results", cache_file=options.cache_file)
 
 
 def main():
-    args = sys.argv[1:]
+    options = parse_args()
+    profiling.start_from_options(options)
+    if options.no_cache:
+        compress.set_saved_index(False)
+    daemon.connect_from_options(options)
+    try:
+        run(options)
+    finally:
+        profiling.finish(options)
+
+
+def run(options):
+    args = options.paths
+
+    if options.follow:
+        if not os.path.isfile(args[0]):
+            print(f"错误：文件 {args[0]} 不存在。")
+            sys.exit(1)
+        follow_file(args[0], interval=options.interval)
+        return
+
+    # tar 归档单独顺序读取; 只给出归档时不再查找当前目录
+    args, archives = split_archive_args(args, options.include, options.exclude)
+    scan_files = bool(args) or not archives
 
-    if len(args) == 1 and not os.path.isdir(args[0]) and not ("*" in args[0] or "?" in args[0] or "[" in args[0]):
+    if options.format != "table":
+        cache = open_cache(options)
+        if not scan_files:
+            file_iter = []
+        elif options.recursive:
+            file_iter = iter_output_files(args, include=options.include, exclude=options.exclude)
+        else:
+            file_iter = collect_output_files(args, patterns=options.include, exclude=options.exclude)
+        try:
+            write_summary_records(
+                file_iter,
+                options.format,
+                jobs=options.jobs,
+                cache=cache,
+                archives=archives,
+                prefetch=options.prefetch,
+            )
+        finally:
+            if cache is not None:
+                cache.save()
+        return
+
+    if options.recursive:
+        cache = open_cache(options)
+        file_iter = []
+        if scan_files:
+            file_iter = iter_output_files(args, include=options.include, exclude=options.exclude)
+        try:
+            show_recursive_summary(
+                file_iter, jobs=options.jobs, cache=cache, archives=archives, prefetch=options.prefetch
+            )
+        finally:
+            if cache is not None:
+                cache.save()
+        return
+
+    if (
+        len(args) == 1
+        and not archives
+        and not os.path.isdir(args[0])
+        and not has_magic(args[0])
+    ):
         if os.path.exists(args[0]):
-            show_single_file_detail(args[0])
+            show_single_file_detail(args[0], steps=options.step, last=options.last)
         else:
             print(f"错误：文件 {args[0]} 不存在。")
         return
 
-    files = collect_output_files(args)
-    if not files:
+    files = []
+    if scan_files:
+        files = collect_output_files(args, patterns=options.include, exclude=options.exclude)
+    if not files and not archives:
         if len(args) == 0:
             print("当前目录无 .log 或 .out 文件。")
         else:
             print("指定路径无 .log 或 .out 文件。")
         sys.exit(0)
 
-    if len(files) == 1 and len(args) == 1 and not os.path.isdir(args[0]):
-        show_single_file_detail(files[0])
+    if len(files) == 1 and len(args) == 1 and not archives and not os.path.isdir(args[0]):
+        show_single_file_detail(files[0], steps=options.step, last=options.last)
+    elif options.step or options.last is not None:
+        # 通配符匹配到多个文件或给出的是 tar 归档
+        print("错误：--step/--last 只用于单文件模式, 但找到了多个文件。")
+        sys.exit(1)
     else:
-        show_batch_summary(files)
+        cache = open_cache(options)
+        try:
+            show_batch_summary(
+                files, jobs=options.jobs, cache=cache, archives=archives, prefetch=options.prefetch
+            )
+        finally:
+            if cache is not None:
+                cache.save()
 
 
 if __name__ == "__main__":
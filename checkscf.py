@@ -1,321 +1,123 @@
 #!/usr/bin/env python
 
-import glob
+import argparse
 import os
-import re
 import sys
-
-
-class Colors:
-    GREEN = "\033[92m"
-    RED = "\033[91m"
-    YELLOW = "\033[93m"
-    CYAN = "\033[96m"
-    ENDC = "\033[0m"
-
-
-THRESHOLD_PATTERNS = {
-    "rmsdp": re.compile(r"RMS density matrix=([\d.Dd\-+]+)"),
-    "maxdp": re.compile(r"MAX density matrix=([\d.Dd\-+]+)"),
-    "de": re.compile(r"energy=([\d.Dd\-+]+)"),
-}
-CYCLE_PATTERN = re.compile(r"^\s*Cycle\s+(\d+)\s+Pass")
-ENERGY_PATTERN = re.compile(r"E=\s*([-+]?\d*\.?\d+(?:[DdEe][-+]?\d+)?)")
-RMSDP_PATTERN = re.compile(r"RMSDP=\s*([\d.Dd\-+]+)")
-MAXDP_PATTERN = re.compile(r"MaxDP=\s*([\d.Dd\-+]+)")
-DELTA_E_PATTERN = re.compile(r"DE=\s*([\d.Dd\-+]+)")
-SCF_DONE_PATTERN = re.compile(
-    r"SCF Done:\s+E\([^)]+\)\s+=\s+([-+]?\d*\.?\d+(?:[DdEe][-+]?\d+)?)\s+"
-    r"A\.U\.\s+after\s+(\d+)\s+cycles?"
+from itertools import chain
+
+from qctools import compress, daemon, profiling
+from qctools.cache import ParseCache
+from qctools.common import Colored, Colors, as_criterion, color_by_status
+from qctools.detect import check_termination_status, detect_file_type
+from qctools.discover import (
+    DEFAULT_PATTERNS,
+    collect_output_files,
+    has_magic,
+    iter_output_files,
+    split_archive_args,
 )
+from qctools.engine import (
+    extract_archives,
+    extract_files,
+    iter_archive_batches,
+    iter_extract_batches,
+)
+from qctools.output import OUTPUT_FORMATS, RecordWriter, exit_on_broken_pipe
+from qctools.scf import (
+    SCF_HEADERS,
+    format_scf_row,
+    last_scf_rows,
+    parse_scf_steps,
+    scf_segments,
+)
+from qctools.scftrend import (
+    DEFAULT_MAX_CYCLES,
+    TREND_HEADERS,
+    analyse_batch,
+    analyse_trace,
+    format_trend,
+)
+from qctools.table import StreamTable, draw_table
 
 
-def get_visible_len(s):
-    return len(re.sub(r"\033\[[0-9;]*m", "", str(s)))
-
+def format_status(status):
+    if status == "ERROR":
+        return Colored("FAIL", Colors.RED)
+    if status == "RUNNING":
+        return Colored("RUN", Colors.YELLOW)
+    if status != "NORMAL":
+        return Colored(status, Colors.YELLOW)
 
-def center_string(content, inner_width):
-    content_str = str(content)
-    visible_len = get_visible_len(content_str)
-    padding = max(0, inner_width - visible_len)
-    r_padding = padding // 2
-    l_padding = padding - r_padding
-    return " " * l_padding + content_str + " " * r_padding
+    return Colored("DONE", Colors.GREEN)
 
 
-def align_decimal(value_float, total_width, max_int_width, precision=10):
-    value_str = f"{value_float:.{precision}f}"
-    try:
-        int_part, frac_part = value_str.split(".")
-    except ValueError:
-        int_part = value_str
-        frac_part = " " * precision
+def print_trend(trend, label="最后一次 SCF"):
+    print(f"\n--- 收敛趋势 ({label}) ---")
+    rate, left, verdict = format_trend(trend)
+    print(f"判断: {verdict}")
+    if trend.rate is not None:
+        print(f"速度: {rate} 数量级/Cycle ({trend.limiting})")
+    if trend.verdict not in ("CONVERGED", "N/A"):
+        print(f"预计还需: {left} 个 Cycle")
 
-    aligned = " " * (max_int_width - len(int_part)) + f"{int_part}.{frac_part}"
-    return center_string(aligned, total_width)
 
+STEP_HEADERS = ["Job", "Step", "Cycles", "Delta-E (DE)", "RMSDP", "MaxDP", "Total Energy (E)"]
 
-def draw_table(headers, rows, float_columns=None, precision=10):
-    if not rows:
-        return
 
-    float_columns = set(float_columns or [])
-    col_widths = [len(h) for h in headers]
-    max_int_width = {idx: 0 for idx in float_columns}
-
-    for row in rows:
-        for idx in float_columns:
-            if idx >= len(row):
-                continue
-            cell = row[idx]
-            if isinstance(cell, float):
-                int_part = f"{cell:.{precision}f}".split(".")[0]
-                max_int_width[idx] = max(max_int_width[idx], len(int_part))
-
-    for row in rows:
-        for idx, cell in enumerate(row):
-            if idx >= len(col_widths):
-                continue
-            if idx in float_columns and isinstance(cell, float):
-                cell_width = max_int_width[idx] + 1 + precision
-            else:
-                cell_width = get_visible_len(cell)
-            col_widths[idx] = max(col_widths[idx], cell_width)
-
-    v, h = "│", "─"
-    tl, tr, bl, br = "┌", "┐", "└", "┘"
-    ml, mr, tm, bm, mm = "├", "┤", "┬", "┴", "┼"
-
-    def make_border(left, mid, right):
-        return left + mid.join(h * (w + 2) for w in col_widths) + right
-
-    print(make_border(tl, tm, tr))
-    print(v + "".join(f" {center_string(hd, col_widths[i])} {v}" for i, hd in enumerate(headers)))
-    print(make_border(ml, mm, mr))
-
-    for row in rows:
-        cells = []
-        for idx, cell in enumerate(row):
-            if idx in float_columns and isinstance(cell, float):
-                cells.append(align_decimal(cell, col_widths[idx], max_int_width[idx], precision))
-            else:
-                cells.append(center_string(cell, col_widths[idx]))
-        print(v + "".join(f" {cell} {v}" for cell in cells))
-
-    print(make_border(bl, bm, br))
-
-
-def convert_d_to_float(value):
-    if value is None:
-        return None
+def parse_step(text):
+    """--step 的参数: 'N' (第一个作业的第 N 步) 或 'JOB:N' -> (job, step)"""
+    job, _, step = text.rpartition(":")
     try:
-        return float(value.rstrip(".").replace("D", "E").replace("d", "E"))
+        result = (int(job) if job else 1, int(step))
     except ValueError:
-        return None
-
-
-def color_by_threshold(value, threshold):
-    if value is None:
-        return "N/A"
-    color = Colors.GREEN if abs(value) < threshold else Colors.RED
-    return f"{color}{value:12.2E}{Colors.ENDC}"
+        raise argparse.ArgumentTypeError(f"无法识别的步骤: {text} (应为 N 或 JOB:N)")
+    if min(result) < 1:
+        raise argparse.ArgumentTypeError(f"步骤和作业从 1 开始编号: {text}")
+    return result
 
 
-def detect_file_type(filename, lines_to_check=100):
-    try:
-        with open(filename, "r", errors="ignore") as handle:
-            for _ in range(lines_to_check):
-                line = handle.readline()
-                if not line:
-                    break
-                if "Gaussian, Inc." in line or "Cite this work as:" in line:
-                    return "GAUSSIAN"
-    except OSError:
-        return None
-    return None
-
-
-def read_tail(filename, size=20000):
-    try:
-        with open(filename, "rb") as handle:
-            handle.seek(0, os.SEEK_END)
-            file_size = handle.tell()
-            handle.seek(-min(file_size, size), os.SEEK_END)
-            return handle.read().decode("utf-8", errors="ignore")
-    except OSError:
-        return ""
-
-
-def check_termination_status(filename):
-    tail = read_tail(filename)
-    if not tail.strip():
-        return "RUNNING"
-    if "Normal termination" in tail:
-        return "NORMAL"
-    if "Error termination" in tail:
-        return "ERROR"
-    return "RUNNING"
-
-
-def get_thresholds(content):
-    rmsdp_match = re.search(r"RMS density matrix=([\d.Dd\-+]+)", content)
-    maxdp_match = re.search(r"MAX density matrix=([\d.Dd\-+]+)", content)
-    de_match = re.search(r"energy=([\d.Dd\-+]+)", content)
-
-    return {
-        "rmsdp": convert_d_to_float(rmsdp_match.group(1)) if rmsdp_match else 1.0e-8,
-        "maxdp": convert_d_to_float(maxdp_match.group(1)) if maxdp_match else 1.0e-6,
-        "de": convert_d_to_float(de_match.group(1)) if de_match else 1.0e-6,
-    }
-
-
-def update_last_or_append(rows, row, keep_all):
-    if keep_all:
-        rows.append(row)
-    elif rows:
-        rows[0] = row
-    else:
-        rows.append(row)
-
-
-def format_detailed_rows(raw_rows, thresholds):
-    return [
-        [
-            cycle,
-            color_by_threshold(delta_e, thresholds["de"]),
-            color_by_threshold(rmsdp, thresholds["rmsdp"]),
-            color_by_threshold(maxdp, thresholds["maxdp"]),
-            energy,
-        ]
-        for cycle, delta_e, rmsdp, maxdp, energy in raw_rows
-    ]
-
-
-def parse_scf_steps(filename, keep_all=True):
-    thresholds = {"rmsdp": 1.0e-8, "maxdp": 1.0e-6, "de": 1.0e-6}
-    detailed_rows = []
-    fallback_rows = []
-    pending = None
-    pending_remaining = 0
-
-    try:
-        with open(filename, "r", errors="ignore") as handle:
-            for line in handle:
-                for key, pattern in THRESHOLD_PATTERNS.items():
-                    match = pattern.search(line)
-                    if match:
-                        value = convert_d_to_float(match.group(1))
-                        if value is not None:
-                            thresholds[key] = value
-
-                done_match = SCF_DONE_PATTERN.search(line)
-                if done_match:
-                    energy = convert_d_to_float(done_match.group(1))
-                    if energy is not None:
-                        update_last_or_append(
-                            fallback_rows,
-                            [int(done_match.group(2)), "N/A", "N/A", "N/A", energy],
-                            keep_all,
-                        )
-
-                if pending is not None:
-                    stripped = line.strip()
-                    if pending["energy"] is None and stripped.startswith("E="):
-                        energy_match = ENERGY_PATTERN.search(stripped)
-                        if energy_match:
-                            pending["energy"] = convert_d_to_float(energy_match.group(1))
-
-                    if pending["rmsdp"] is None and stripped.startswith("RMSDP="):
-                        rmsdp_match = RMSDP_PATTERN.search(stripped)
-                        maxdp_match = MAXDP_PATTERN.search(stripped)
-                        delta_e_match = DELTA_E_PATTERN.search(stripped)
-                        if rmsdp_match and maxdp_match:
-                            pending["rmsdp"] = convert_d_to_float(rmsdp_match.group(1))
-                            pending["maxdp"] = convert_d_to_float(maxdp_match.group(1))
-                            pending["delta_e"] = (
-                                convert_d_to_float(delta_e_match.group(1))
-                                if delta_e_match
-                                else None
-                            )
-
-                    if (
-                        pending["energy"] is not None
-                        and pending["rmsdp"] is not None
-                        and pending["maxdp"] is not None
-                    ):
-                        update_last_or_append(
-                            detailed_rows,
-                            [
-                                pending["cycle"],
-                                pending["delta_e"],
-                                pending["rmsdp"],
-                                pending["maxdp"],
-                                pending["energy"],
-                            ],
-                            keep_all,
-                        )
-                        pending = None
-                    else:
-                        pending_remaining -= 1
-                        if pending_remaining <= 0:
-                            pending = None
-
-                cycle_match = CYCLE_PATTERN.search(line)
-                if cycle_match:
-                    pending = {
-                        "cycle": int(cycle_match.group(1)),
-                        "energy": None,
-                        "rmsdp": None,
-                        "maxdp": None,
-                        "delta_e": None,
-                    }
-                    pending_remaining = 15
-    except OSError:
-        return [], None
-
-    if detailed_rows:
-        return format_detailed_rows(detailed_rows, thresholds), thresholds
-
-    return fallback_rows, thresholds
-
-
-def is_detailed_scf_converged(last_step):
-    return all(Colors.GREEN in str(item) for item in last_step[1:4])
-
-
-def has_density_convergence_data(last_step):
-    return bool(last_step) and all(str(item) != "N/A" for item in last_step[1:4])
-
-
-def format_status(status):
-    if status == "ERROR":
-        return f"{Colors.RED}FAIL{Colors.ENDC}"
-    if status == "RUNNING":
-        return f"{Colors.YELLOW}RUN{Colors.ENDC}"
-    if status != "NORMAL":
-        return f"{Colors.YELLOW}{status}{Colors.ENDC}"
-
-    return f"{Colors.GREEN}DONE{Colors.ENDC}"
+def step_rows(segments):
+    """每次 SCF 一行: 作业、步骤、Cycle 数以及最后一个 Cycle 的收敛判据和能量"""
+    counts = sorted(segment.cycles for segment in segments)
+    median = counts[len(counts) // 2] if counts else 0
+    rows = []
+    for segment in segments:
+        last = format_scf_row(segment.rows[-1]) if segment.rows else [None] * 5
+        cycles = str(segment.cycles)
+        if median and segment.cycles > 2 * median:
+            # 明显慢于其他几何步
+            cycles = Colored(cycles, Colors.YELLOW)
+        energy = segment.energy if segment.energy is not None else last[4]
+        rows.append(
+            [segment.job, segment.step, cycles]
+            + [item if item is not None else "N/A" for item in last[1:4]]
+            + [energy if energy is not None else "N/A"]
+        )
+    return rows
 
 
-def color_filename(filename, status, scf_data):
-    if status == "ERROR":
-        return f"{Colors.RED}{filename}{Colors.ENDC}"
-    if status == "RUNNING":
-        return f"{Colors.YELLOW}{filename}{Colors.ENDC}"
-    if status == "NORMAL":
-        return f"{Colors.GREEN}{filename}{Colors.ENDC}"
-    return filename
+def print_step_summary(segments):
+    print(f"--- 各步骤的 SCF ({len(segments)} 次) ---")
+    draw_table(STEP_HEADERS, step_rows(segments), float_columns={6})
+    slowest = max(segments, key=lambda segment: segment.cycles)
+    print(f"Cycle 最多: Job {slowest.job} Step {slowest.step} ({slowest.cycles} 个 Cycle)")
+    print("使用 --step [JOB:]N 查看某一步的 SCF 过程, --all-cycles 显示全部 Cycle")
 
 
-def show_single_file_detail(filename):
+def show_single_file_detail(filename, max_cycles=DEFAULT_MAX_CYCLES, step=None, all_cycles=False):
+    """
+    一次 SCF 时显示全部 Cycle; 优化等多次 SCF 时显示各步骤的汇总 (all_cycles 时仍显示全部 Cycle)
+    step: (job, step), 只显示这一次 SCF 的各个 Cycle
+    """
     file_type = detect_file_type(filename)
     if file_type != "GAUSSIAN":
         print(f"{Colors.RED}跳过: 无法识别为 Gaussian 输出文件{Colors.ENDC}: {filename}")
         return
 
-    scf_data, thresholds = parse_scf_steps(filename)
-    status = check_termination_status(filename)
+    status = check_termination_status(filename, file_type)
+    state = {}
+    scf_data, thresholds = parse_scf_steps(filename, state=state, final=status != "RUNNING")
+    segments = scf_segments(state) if state else []
 
     print(f"--- SCF 收敛监控表: {filename} [{Colors.CYAN}GAUSSIAN{Colors.ENDC}] ---")
 
@@ -325,9 +127,21 @@ def show_single_file_detail(filename):
         print(f"  RMSDP: {thresholds['rmsdp']:<10.1E}")
         print(f"  MaxDP: {thresholds['maxdp']:<10.1E}\n")
 
-    headers = ["Step", "Delta-E (DE)", "RMSDP", "MaxDP", "Total Energy (E)"]
-    if scf_data:
-        draw_table(headers, scf_data, float_columns={4})
+    if step is not None:
+        selected = [segment for segment in segments if (segment.job, segment.step) == step]
+        if not selected:
+            print(f"未找到 Job {step[0]} Step {step[1]} 的 SCF (共 {len(segments)} 次 SCF)。")
+        else:
+            print(f"--- Job {step[0]} Step {step[1]}: {selected[0].cycles} 个 Cycle ---")
+            rows = selected[0].rows
+            draw_table(SCF_HEADERS, [format_scf_row(row) for row in rows], float_columns={4})
+            print_trend(analyse_trace(rows, max_cycles=max_cycles), f"Job {step[0]} Step {step[1]}")
+    elif scf_data:
+        if len(segments) > 1 and not all_cycles:
+            print_step_summary(segments)
+        else:
+            draw_table(SCF_HEADERS, [format_scf_row(row) for row in scf_data], float_columns={4})
+        print_trend(analyse_trace(last_scf_rows(scf_data), max_cycles=max_cycles))
     else:
         print("未找到 SCF 步骤数据。")
 
@@ -337,96 +151,348 @@ def show_single_file_detail(filename):
         print("      (任务已正常结束)")
 
 
-def collect_output_files(args):
-    if not args:
-        return sorted(set(glob.glob("*.out") + glob.glob("*.log")))
+def scan_output_files(file_list, cache=None, archives=()):
+    """
+    返回按文件名排序的 [(filename, status, scf_data)], 之后是 archives 中各 tar 归档的成员;
+    只包含存在的 Gaussian 输出文件
+    """
+    files = [filename for filename in file_list if os.path.isfile(filename)]
+    scanned = extract_files(files, ["scf"], cache=cache)
+    scanned += extract_archives(archives, ["scf"], cache=cache)
+    return [
+        (filename, status, results["scf"])
+        for filename, ftype, status, results in scanned
+        if ftype == "GAUSSIAN"
+    ]
 
-    files = []
-    for arg in args:
-        if os.path.isdir(arg):
-            files.extend(glob.glob(os.path.join(arg, "*.out")))
-            files.extend(glob.glob(os.path.join(arg, "*.log")))
-        elif any(ch in arg for ch in "*?[]"):
-            files.extend(glob.glob(arg))
-        else:
-            files.append(arg)
 
-    return sorted(dict.fromkeys(files))
+SCF_SUMMARY_HEADERS = ["File", "Type", "Step", "Delta-E (DE)", "RMSDP", "MaxDP", "Total Energy (E)", "Status"]
 
 
-def show_batch_summary(file_list):
-    valid_files = []
-    for filename in sorted(file_list):
-        if os.path.isfile(filename) and detect_file_type(filename) == "GAUSSIAN":
-            valid_files.append(filename)
+def summary_headers(trend=False):
+    """--trend 时在 Status 之前加上收敛趋势的三列"""
+    if not trend:
+        return SCF_SUMMARY_HEADERS
+    return SCF_SUMMARY_HEADERS[:-1] + TREND_HEADERS + SCF_SUMMARY_HEADERS[-1:]
 
-    if not valid_files:
-        print("未找到有效的 Gaussian 输出文件 (.out/.log)。")
-        return
 
-    headers = ["File", "Type", "Step", "Delta-E (DE)", "RMSDP", "MaxDP", "Total Energy (E)", "Status"]
-    rows = []
-    complete_count = 0
+def analyse_scanned(scanned, trend=False, max_cycles=DEFAULT_MAX_CYCLES):
+    """[(filename, status, scf_data)] 一次分析完, 返回对应的 ScfTrend 列表; 未启用时为 None"""
+    if not trend:
+        return [None] * len(scanned)
+    return analyse_batch([scf_data or [] for _, _, scf_data in scanned], max_cycles=max_cycles)
 
-    for filename in valid_files:
-        status = check_termination_status(filename)
-        scf_data, _ = parse_scf_steps(filename, keep_all=False)
-        if status == "NORMAL":
-            complete_count += 1
 
-        step = "N/A"
-        delta_e = f"{Colors.RED}No Data{Colors.ENDC}"
-        rmsdp = f"{Colors.RED}No Data{Colors.ENDC}"
-        maxdp = f"{Colors.RED}No Data{Colors.ENDC}"
-        energy = "N/A"
+def summary_row(filename, status, scf_data, trend=None):
+    step = "N/A"
+    delta_e = Colored("No Data", Colors.RED)
+    rmsdp = Colored("No Data", Colors.RED)
+    maxdp = Colored("No Data", Colors.RED)
+    energy = "N/A"
 
-        if status == "RUNNING" and not scf_data:
-            delta_e = rmsdp = maxdp = f"{Colors.YELLOW}...{Colors.ENDC}"
+    if status == "RUNNING" and not scf_data:
+        delta_e = rmsdp = maxdp = Colored("...", Colors.YELLOW)
 
-        if scf_data:
-            last_step = scf_data[-1]
-            step, delta_e, rmsdp, maxdp, energy = last_step
+    if scf_data:
+        step, delta_e, rmsdp, maxdp, energy = format_scf_row(scf_data[-1])
 
-        rows.append(
-            [
-                color_filename(filename, status, scf_data),
-                "GAUSSIAN",
-                step,
-                delta_e,
-                rmsdp,
-                maxdp,
-                energy,
-                format_status(status),
+    return [
+        color_by_status(filename, status),
+        "GAUSSIAN",
+        step,
+        delta_e,
+        rmsdp,
+        maxdp,
+        energy,
+        *(format_trend(trend) if trend is not None else []),
+        format_status(status),
+    ]
+
+
+SCF_RECORD_FIELDS = [
+    "file",
+    "type",
+    "status",
+    "cycle",
+    "delta_e",
+    "delta_e_converged",
+    "rmsdp",
+    "rmsdp_converged",
+    "maxdp",
+    "maxdp_converged",
+    "energy",
+]
+
+TREND_RECORD_FIELDS = ["trend", "rate", "cycles_left", "limiting"]
+
+
+def summary_record(filename, status, scf_data, trend=None):
+    """机器可读输出中的一条记录, 取最后一个 SCF Cycle; trend 为 ScfTrend 时加上收敛趋势"""
+    record = dict.fromkeys(SCF_RECORD_FIELDS)
+    record.update(file=filename, type="GAUSSIAN", status=status)
+    if trend is not None:
+        record.update(zip(TREND_RECORD_FIELDS, trend))
+    if scf_data:
+        cycle, delta_e, rmsdp, maxdp, energy = scf_data[-1]
+        record.update(cycle=cycle, energy=energy)
+        for key, item in (("delta_e", delta_e), ("rmsdp", rmsdp), ("maxdp", maxdp)):
+            item = as_criterion(item)
+            if item is not None:
+                record[key], record[f"{key}_converged"] = item.value, item.converged
+    return record
+
+
+def write_summary_records(
+    file_iter, fmt, cache=None, archives=(), trend=False, max_cycles=DEFAULT_MAX_CYCLES
+):
+    """--format jsonl/csv/tsv: 每解析完一个文件就输出其记录"""
+    batches = chain(
+        iter_extract_batches(file_iter, ["scf"], cache=cache, batch_size=1),
+        iter_archive_batches(archives, ["scf"], cache=cache),
+    )
+    try:
+        writer = RecordWriter(fmt, SCF_RECORD_FIELDS + (TREND_RECORD_FIELDS if trend else []))
+        for batch in batches:
+            scanned = [
+                (filename, status, results["scf"])
+                for filename, ftype, status, results in batch
+                if ftype == "GAUSSIAN"
             ]
-        )
+            trends = analyse_scanned(scanned, trend, max_cycles)
+            with profiling.timed("render"):
+                writer.write_all(
+                    summary_record(*item, trend=item_trend)
+                    for item, item_trend in zip(scanned, trends)
+                )
+    except BrokenPipeError:
+        exit_on_broken_pipe()
 
-    print(f"--- 正在检查 {len(valid_files)} 个 Gaussian 文件 ---")
-    draw_table(headers, rows, float_columns={6})
+
+def print_summary_count(complete_count, total):
     print(
-        f"\n统计: {Colors.GREEN}{complete_count}{Colors.ENDC} 个文件已完成 / 共 {len(valid_files)} 个有效文件。"
+        f"\n统计: {Colors.GREEN}{complete_count}{Colors.ENDC} 个文件已完成 / 共 {total} 个有效文件。"
     )
 
 
+def show_batch_summary(
+    file_list, cache=None, archives=(), trend=False, max_cycles=DEFAULT_MAX_CYCLES
+):
+    scanned = scan_output_files(file_list, cache=cache, archives=archives)
+
+    if not scanned:
+        print("未找到有效的 Gaussian 输出文件 (.out/.log)。")
+        return
+
+    complete_count = sum(1 for item in scanned if item[1] == "NORMAL")
+
+    print(f"--- 正在检查 {len(scanned)} 个 Gaussian 文件 ---")
+    trends = analyse_scanned(scanned, trend, max_cycles)
+    with profiling.timed("render"):
+        rows = [summary_row(*item, trend=t) for item, t in zip(scanned, trends)]
+        draw_table(summary_headers(trend), rows, float_columns={6})
+    print_summary_count(complete_count, len(scanned))
+
+
+def show_recursive_summary(
+    file_iter, cache=None, archives=(), trend=False, max_cycles=DEFAULT_MAX_CYCLES
+):
+    """递归模式: 边遍历目录边解析和输出, 每处理完一批文件就打印这批的结果"""
+    print("--- 正在递归检查 Gaussian 输出文件 ---", flush=True)
+    table = StreamTable(summary_headers(trend), float_columns={6})
+    complete_count = 0
+    batches = chain(
+        iter_extract_batches(file_iter, ["scf"], cache=cache),
+        iter_archive_batches(archives, ["scf"], cache=cache),
+    )
+    for batch in batches:
+        scanned = [
+            (filename, status, results["scf"])
+            for filename, ftype, status, results in batch
+            if ftype == "GAUSSIAN"
+        ]
+        trends = analyse_scanned(scanned, trend, max_cycles)
+        with profiling.timed("render"):
+            table.add_rows([summary_row(*item, trend=t) for item, t in zip(scanned, trends)])
+        complete_count += sum(1 for item in scanned if item[1] == "NORMAL")
+    table.close()
+
+    if not table.count:
+        print("未找到有效的 Gaussian 输出文件 (.out/.log)。")
+        return
+    print_summary_count(complete_count, table.count)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="检查 Gaussian 输出文件的 SCF 收敛情况")
+    parser.add_argument("paths", nargs="*", help="输出文件、目录、通配符或 tar 归档 (默认: 当前目录的 *.out/*.log)")
+    parser.add_argument(
+        "-r", "--recursive", action="store_true", help="递归查找目录下的输出文件, 边查找边输出结果"
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="PATTERN",
+        help="要检查的文件名模式, 可多次指定 (默认: *.log 和 *.out)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="跳过与文件名、目录名或路径匹配的模式, 可多次指定",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="table",
+        help="批量模式的输出格式: 表格 (默认) 或每个文件一条记录的 jsonl/csv/tsv",
+    )
+    parser.add_argument(
+        "--trend",
+        action="store_true",
+        help="批量模式中分析最后一次 SCF 的收敛速度、预计剩余 Cycle 数, 标出停滞或振荡的 SCF",
+    )
+    parser.add_argument(
+        "--max-cycles",
+        type=int,
+        default=DEFAULT_MAX_CYCLES,
+        help=f"SCF 的最大 Cycle 数, 预计超过时标为 TOO_SLOW (默认: {DEFAULT_MAX_CYCLES})",
+    )
+    parser.add_argument(
+        "--step",
+        type=parse_step,
+        metavar="[JOB:]N",
+        help="单文件模式: 只显示第 N 步 (Link1 作业 JOB 中第 N 次 SCF) 的各个 Cycle",
+    )
+    parser.add_argument(
+        "--all-cycles",
+        action="store_true",
+        help="单文件模式: 多次 SCF 时也在一个表格中显示全部 Cycle, 不按步骤汇总",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="不读取也不更新解析结果缓存和压缩文件的索引")
+    parser.add_argument(
+        "--cache-file", default=None, help="缓存文件路径 (默认: ~/.cache/chouscripts/results.json, 三个脚本共用)"
+    )
+    daemon.add_daemon_arguments(parser)
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if (args.step or args.all_cycles) and (
+        args.recursive
+        or args.format != "table"
+        or len(args.paths) != 1
+        or os.path.isdir(args.paths[0])
+    ):
+        parser.error("--step/--all-cycles 只用于单文件模式 (只给出一个输出文件, 不与 -r/--format 一起使用)")
+    args.include = tuple(args.include or DEFAULT_PATTERNS)
+    return args
+
+
+def open_cache(options):
+    if options.no_cache:
+        return None
+    return ParseCache.for_script("results", cache_file=options.cache_file)
+
+
 def main():
-    args = sys.argv[1:]
+    options = parse_args()
+    profiling.start_from_options(options)
+    if options.no_cache:
+        compress.set_saved_index(False)
+    daemon.connect_from_options(options)
+    try:
+        run(options)
+    finally:
+        profiling.finish(options)
+
+
+def run(options):
+    # tar 归档单独顺序读取; 只给出归档时不再查找当前目录
+    args, archives = split_archive_args(options.paths, options.include, options.exclude)
+    scan_files = bool(args) or not archives
+
+    if options.format != "table":
+        cache = open_cache(options)
+        if not scan_files:
+            file_iter = []
+        elif options.recursive:
+            file_iter = iter_output_files(args, include=options.include, exclude=options.exclude)
+        else:
+            file_iter = collect_output_files(args, patterns=options.include, exclude=options.exclude)
+        try:
+            write_summary_records(
+                (f for f in file_iter if os.path.isfile(f)),
+                options.format,
+                cache=cache,
+                archives=archives,
+                trend=options.trend,
+                max_cycles=options.max_cycles,
+            )
+        finally:
+            if cache is not None:
+                cache.save()
+        return
+
+    if options.recursive:
+        cache = open_cache(options)
+        file_iter = []
+        if scan_files:
+            file_iter = iter_output_files(args, include=options.include, exclude=options.exclude)
+        try:
+            show_recursive_summary(
+                file_iter,
+                cache=cache,
+                archives=archives,
+                trend=options.trend,
+                max_cycles=options.max_cycles,
+            )
+        finally:
+            if cache is not None:
+                cache.save()
+        return
 
-    if len(args) == 1 and not os.path.isdir(args[0]) and not any(ch in args[0] for ch in "*?[]"):
+    if (
+        len(args) == 1
+        and not archives
+        and not os.path.isdir(args[0])
+        and not has_magic(args[0])
+    ):
         if not os.path.exists(args[0]):
             print(f"错误: 文件 {args[0]} 不存在。")
             sys.exit(1)
-        show_single_file_detail(args[0])
+        show_single_file_detail(
+            args[0], max_cycles=options.max_cycles, step=options.step, all_cycles=options.all_cycles
+        )
         return
 
-    files = collect_output_files(args)
-    if not files:
+    files = []
+    if scan_files:
+        files = collect_output_files(args, patterns=options.include, exclude=options.exclude)
+    if not files and not archives:
         target = "当前目录" if not args else "指定路径"
         print(f"{target}无 .out 或 .log 文件。")
         return
 
-    if len(files) == 1 and len(args) == 1 and not os.path.isdir(args[0]):
-        show_single_file_detail(files[0])
+    if len(files) == 1 and len(args) == 1 and not archives and not os.path.isdir(args[0]):
+        show_single_file_detail(
+            files[0], max_cycles=options.max_cycles, step=options.step, all_cycles=options.all_cycles
+        )
+    elif options.step or options.all_cycles:
+        # 通配符匹配到多个文件或给出的是 tar 归档
+        print("错误: --step/--all-cycles 只用于单文件模式, 但找到了多个文件。")
+        sys.exit(1)
     else:
-        show_batch_summary(files)
+        cache = open_cache(options)
+        try:
+            show_batch_summary(
+                files,
+                cache=cache,
+                archives=archives,
+                trend=options.trend,
+                max_cycles=options.max_cycles,
+            )
+        finally:
+            if cache is not None:
+                cache.save()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+"""
+从 Gaussian/ORCA/CP2K 输出文件的最后一个结构生成续算用的 .gjf / .xyz 文件
+
+在一个进程中批量处理, 每个文件只读取开头和末尾 (见 qctools.geom),
+代替 MultiConverter.sh / xyz2gjf.sh 对每个文件启动一次 Multiwfn。
+"""
+
+import argparse
+import os
+import sys
+
+from qctools import daemon, profiling
+from qctools.cache import ParseCache
+from qctools.common import Colors
+from qctools.compress import strip_compression_suffix
+from qctools.discover import (
+    DEFAULT_PATTERNS,
+    collect_output_files,
+    iter_output_files,
+    split_archive_args,
+)
+from qctools.engine import iter_extract_batches
+from qctools.geom import DEFAULT_ROUTE, GEOMETRY_READERS, format_gjf, format_xyz
+from qctools.prefetch import add_prefetch_arguments, check_prefetch_arguments
+
+
+def restart_path(filename, fmt, suffix="_restart", output_dir=None):
+    """job.log (或 job.log.gz) -> job_restart.gjf, 默认写在输出文件旁边"""
+    stem = os.path.splitext(strip_compression_suffix(filename))[0]
+    if output_dir is not None:
+        stem = os.path.join(output_dir, os.path.basename(stem))
+    return f"{stem}{suffix}.{fmt}"
+
+
+def format_restart(filename, geometry, fmt, route=None):
+    title = os.path.basename(strip_compression_suffix(filename))
+    if fmt == "xyz":
+        return format_xyz(geometry, title=title)
+    return format_gjf(geometry, title=title, route=route)
+
+
+def write_restart_files(file_iter, options, cache=None):
+    """返回 (写出的文件数, 跳过的文件数)"""
+    written = skipped = 0
+    batches = iter_extract_batches(
+        file_iter, ["geom"], cache=cache, jobs=options.jobs, prefetch=options.prefetch
+    )
+    for batch in batches:
+        for filename, ftype, status, results in batch:
+            if options.unfinished and status == "NORMAL":
+                continue
+            geometry = results.get("geom")
+            if not geometry:
+                if ftype in GEOMETRY_READERS:
+                    print(f"{Colors.YELLOW}跳过: 未找到坐标{Colors.ENDC}: {filename}")
+                    skipped += 1
+                continue
+            target = restart_path(filename, options.format, options.suffix, options.output_dir)
+            if os.path.exists(target) and not options.force:
+                print(f"{Colors.YELLOW}跳过: {target} 已存在 (--force 覆盖){Colors.ENDC}")
+                skipped += 1
+                continue
+            with open(target, "w") as handle:
+                handle.write(format_restart(filename, geometry, options.format, options.route))
+            written += 1
+            print(f"[{written}] {filename} [{ftype}, {status}] -> {target} ({len(geometry['atoms'])} 个原子)")
+    return written, skipped
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="从 Gaussian/ORCA/CP2K 输出的最后一个结构生成续算用的 .gjf / .xyz 文件"
+    )
+    parser.add_argument(
+        "paths", nargs="*", help="输出文件、目录或通配符 (默认: 当前目录的 *.log/*.out)"
+    )
+    parser.add_argument(
+        "--format", choices=("gjf", "xyz"), default="gjf", help="生成的文件格式 (默认: gjf)"
+    )
+    parser.add_argument(
+        "--route",
+        default=None,
+        help=f".gjf 的计算方法行 (默认: 沿用原 Gaussian 任务的 route, 其他程序为 '{DEFAULT_ROUTE}')",
+    )
+    parser.add_argument(
+        "--suffix", default="_restart", help="生成的文件名: <原文件名><后缀>.<格式> (默认: _restart)"
+    )
+    parser.add_argument("-o", "--output-dir", default=None, help="写入此目录 (默认: 输出文件所在目录)")
+    parser.add_argument("--force", action="store_true", help="覆盖已存在的文件")
+    parser.add_argument(
+        "--unfinished", action="store_true", help="只处理没有正常结束的任务 (报错或仍在运行)"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="并行解析的进程数 (默认: 1, 0 表示使用全部 CPU)"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="不读取也不更新解析结果缓存")
+    parser.add_argument(
+        "--cache-file", default=None, help="缓存文件路径 (默认: ~/.cache/chouscripts/results.json, 各脚本共用)"
+    )
+    parser.add_argument("-r", "--recursive", action="store_true", help="递归查找目录下的输出文件")
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="PATTERN",
+        help="要处理的文件名模式, 可多次指定 (默认: *.log 和 *.out)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="跳过与文件名、目录名或路径匹配的模式, 可多次指定",
+    )
+    add_prefetch_arguments(parser)
+    daemon.add_daemon_arguments(parser)
+    profiling.add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error("--jobs 不能为负数")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    check_prefetch_arguments(parser, args)
+    if args.output_dir is not None and not os.path.isdir(args.output_dir):
+        parser.error(f"目录不存在: {args.output_dir}")
+    args.include = tuple(args.include or DEFAULT_PATTERNS)
+    return args
+
+
+def main():
+    options = parse_args()
+    profiling.start_from_options(options)
+    daemon.connect_from_options(options)
+    try:
+        run(options)
+    finally:
+        profiling.finish(options)
+
+
+def run(options):
+    # tar 归档只能顺序读取成员, 没有只读末尾的快速路径, 也没有写出续算文件的位置
+    paths, archives = split_archive_args(options.paths, options.include, options.exclude)
+    for archive in archives:
+        print(f"{Colors.YELLOW}跳过: 不处理 tar 归档, 请先解压{Colors.ENDC}: {archive.path}")
+    if archives and not paths:
+        sys.exit(0)
+
+    if options.recursive:
+        file_iter = iter_output_files(paths, include=options.include, exclude=options.exclude)
+    else:
+        file_iter = collect_output_files(paths, patterns=options.include, exclude=options.exclude)
+        if not file_iter:
+            print("未找到输出文件。")
+            sys.exit(0)
+
+    cache = None
+    if not options.no_cache:
+        cache = ParseCache.for_script("results", cache_file=options.cache_file)
+    try:
+        written, skipped = write_restart_files(file_iter, options, cache=cache)
+    finally:
+        if cache is not None:
+            cache.save()
+    print(f"完成: 写出 {written} 个文件, 跳过 {skipped} 个。")
+
+
+if __name__ == "__main__":
+    main()
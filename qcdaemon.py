@@ -0,0 +1,7 @@
+#!/usr/bin/env python
+"""常驻解析服务: 保存目录树中全部输出文件的解析结果, 供 checkopt.py / checkscf.py / checkircall.py 查询"""
+
+from qctools.daemon import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""checkopt.py / checkscf.py / checkircall.py 共用的辅助模块"""
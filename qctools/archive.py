@@ -0,0 +1,140 @@
+"""
+不解包直接检查 tar 归档中的输出文件
+
+归档 (.tar / .tar.gz / .tgz / .tar.xz / .tar.bz2 / .tar.zst) 只按顺序读取一遍:
+名称不符合要求 (见 qctools.discover.wanted_member) 的成员直接跳过, 其内容不会被解码;
+匹配的成员以只能顺序读取的流交给 qctools.engine 解析, 不写入临时文件。
+未压缩的 .tar 以可 seek 的方式打开, 跳过的成员连读取都不需要。
+归档内的压缩成员 (job.log.gz 等) 同样边读边解压。
+
+.tar.zst 优先使用可选的 zstandard 模块, 未安装时调用 zstd 命令解压。
+"""
+
+import gzip
+import lzma
+import shutil
+import subprocess
+import sys
+import tarfile
+import zlib
+from collections import namedtuple
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+from qctools.compress import compression_of
+
+# 扩展名: tarfile 的打开方式 (None 表示先用 zstd 解压)
+ARCHIVE_SUFFIXES = {
+    ".tar": "r:",
+    ".tar.gz": "r|gz",
+    ".tgz": "r|gz",
+    ".tar.xz": "r|xz",
+    ".txz": "r|xz",
+    ".tar.bz2": "r|bz2",
+    ".tbz2": "r|bz2",
+    ".tar.zst": None,
+    ".tzst": None,
+}
+
+# 命令行中的一个归档, 以及选择成员用的文件名模式
+ArchiveInput = namedtuple("ArchiveInput", ["path", "include", "exclude"])
+
+ARCHIVE_SEPARATOR = ":"
+
+
+def archive_suffix(filename):
+    lower = filename.lower()
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if lower.endswith(suffix):
+            return suffix
+    return None
+
+
+def is_archive(filename):
+    return archive_suffix(filename) is not None
+
+
+def member_path(archive, name):
+    """结果中显示的成员名称: project.tar:job1/opt.log"""
+    return f"{archive}{ARCHIVE_SEPARATOR}{name}"
+
+
+class _ZstdCommand:
+    """zstd -dc 的标准输出, 关闭时结束子进程"""
+
+    def __init__(self, filename):
+        self.process = subprocess.Popen(
+            [shutil.which("zstd"), "-dcq", "--", filename],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, size=-1):
+        return self.process.stdout.read(size)
+
+    def close(self):
+        self.process.stdout.close()
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+def _open_zstd(filename):
+    if zstandard is not None:
+        raw = open(filename, "rb")
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+    if shutil.which("zstd"):
+        return _ZstdCommand(filename)
+    raise OSError("读取 .tar.zst 需要安装 zstandard 模块 (pip install zstandard) 或 zstd 命令")
+
+
+def _open_member_stream(handle, name):
+    """归档内的压缩成员边读边解压; 无法解压时返回 None"""
+    kind = compression_of(name)
+    if kind == "gzip":
+        return gzip.GzipFile(fileobj=handle, mode="rb")
+    if kind == "xz":
+        return lzma.LZMAFile(handle, "rb")
+    if kind == "zstd":
+        if zstandard is None:
+            return None
+        return zstandard.ZstdDecompressor().stream_reader(handle, read_across_frames=True)
+    return handle
+
+
+def iter_archive_members(filename, wanted):
+    """
+    按归档中的顺序产出 (成员名, 二进制流), 只产出 wanted(成员名) 为真的普通文件
+    流只能顺序读取, 且必须在取下一个成员之前用完; 归档损坏或被截断时,
+    已产出的成员保留, 在标准错误中提示后结束
+    """
+    mode = ARCHIVE_SUFFIXES[archive_suffix(filename)]
+    source = None
+    try:
+        if mode is None:
+            source = _open_zstd(filename)
+            tar = tarfile.open(fileobj=source, mode="r|")
+        else:
+            tar = tarfile.open(filename, mode)
+        with tar:
+            for member in tar:
+                if not member.isfile() or not wanted(member.name):
+                    continue
+                handle = tar.extractfile(member)
+                stream = _open_member_stream(handle, member.name)
+                if stream is None:
+                    continue
+                try:
+                    yield member.name, stream
+                finally:
+                    if stream is not handle:
+                        stream.close()
+                    handle.close()
+    except (OSError, EOFError, tarfile.TarError, lzma.LZMAError, zlib.error) as exc:
+        sys.stderr.write(f"读取归档 {filename} 失败: {exc}\n")
+    finally:
+        if source is not None:
+            source.close()
@@ -0,0 +1,147 @@
+"""
+解析结果的磁盘缓存
+
+以 (路径, 大小, mtime, inode) 作为键保存每个输出文件的解析结果,
+文件未变化时直接复用, 只有新文件或正在增长的文件才需要重新读取。
+缓存为单个 JSON 文件, 超过大小上限时按最近使用时间淘汰。
+"""
+
+import json
+import os
+import tempfile
+import time
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+def default_cache_dir():
+    """缓存目录: $CHOUSCRIPTS_CACHE_DIR > $XDG_CACHE_HOME/chouscripts > ~/.cache/chouscripts"""
+    env_dir = os.environ.get("CHOUSCRIPTS_CACHE_DIR")
+    if env_dir:
+        return env_dir
+    xdg = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(xdg, "chouscripts")
+
+
+def stat_key(filename):
+    """返回文件的缓存键 [size, mtime_ns, inode], 无法 stat 时返回 None"""
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+class ParseCache:
+    """
+    用法:
+        cache = ParseCache.for_script("checkopt")
+        value = cache.get(filename)      # 未命中返回 None
+        if value is None:
+            value = parse(filename)
+            cache.put(filename, value)   # 使用 get() 时记录的 stat 作为键
+        cache.save()
+
+    get() 在解析之前记录文件状态, 因此解析过程中文件继续增长时,
+    保存的是旧的键, 下次运行会重新解析, 不会把旧结果当作新结果。
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._pending_keys = {}
+        self._load()
+
+    @classmethod
+    def for_script(cls, name, cache_file=None, max_bytes=DEFAULT_MAX_BYTES):
+        path = cache_file or os.path.join(default_cache_dir(), f"{name}.json")
+        return cls(path, max_bytes=max_bytes)
+
+    def _read_entries(self):
+        try:
+            with open(self.path, "r") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        entries = data.get("entries") if isinstance(data, dict) else None
+        return entries if isinstance(entries, dict) else {}
+
+    def _load(self):
+        self.entries = self._read_entries()
+
+    def get(self, filename):
+        abspath = os.path.abspath(filename)
+        key = stat_key(filename)
+        self._pending_keys[abspath] = key
+        entry = self.entries.get(abspath)
+        if key is None or entry is None or entry.get("key") != key:
+            self.misses += 1
+            return None
+        entry["used"] = time.time()
+        self.dirty = True
+        self.hits += 1
+        return entry.get("value")
+
+    def get_previous(self, filename):
+        """
+        get() 未命中后调用: 如果旧条目属于同一个文件 (inode 相同) 且文件只增不减,
+        返回旧条目的值, 供增量解析从上次的位置继续
+        """
+        abspath = os.path.abspath(filename)
+        entry = self.entries.get(abspath)
+        key = self._pending_keys.get(abspath) or stat_key(filename)
+        if entry is None or key is None:
+            return None
+        old_size, _, old_inode = entry.get("key", [0, 0, None])
+        if old_inode != key[2] or key[0] < old_size:
+            return None
+        return entry.get("value")
+
+    def put(self, filename, value):
+        abspath = os.path.abspath(filename)
+        key = self._pending_keys.pop(abspath, None) or stat_key(filename)
+        if key is None:
+            return
+        self.entries[abspath] = {"key": key, "used": time.time(), "value": value}
+        self.dirty = True
+
+    def _evict(self, entries):
+        """按最近使用时间从旧到新淘汰, 直到序列化大小不超过上限"""
+        sizes = {path: len(json.dumps(entry)) + len(path) + 4 for path, entry in entries.items()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return entries
+        for path in sorted(entries, key=lambda p: entries[p].get("used", 0)):
+            if total <= self.max_bytes:
+                break
+            total -= sizes[path]
+            del entries[path]
+        return entries
+
+    def save(self):
+        if not self.dirty:
+            return
+        # 合并其他进程在此期间写入的条目 (同一路径以本进程为准)
+        merged = self._read_entries()
+        merged.update(self.entries)
+        merged = self._evict(merged)
+
+        directory = os.path.dirname(self.path) or "."
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".cache-", dir=directory)
+            with os.fdopen(fd, "w") as handle:
+                json.dump({"version": 1, "entries": merged}, handle, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # 缓存写入失败不影响检查结果
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.entries = merged
+        self.dirty = False
@@ -0,0 +1,130 @@
+"""颜色与字符串辅助函数"""
+
+import re
+from collections import namedtuple
+
+
+# --- 颜色定义 ---
+class Colors:
+    GREEN = "\033[92m"
+    RED = "\033[91m"
+    YELLOW = "\033[93m"
+    CYAN = "\033[96m"
+    ENDC = "\033[0m"
+
+
+ANSI_PATTERN = re.compile(r"\033\[[0-9;]*m")
+
+
+class Colored(namedtuple("Colored", ["text", "color"])):
+    """
+    带颜色的单元格: 文本和颜色分开保存, 表格计算列宽时直接取 len(text),
+    不必再用正则去掉颜色代码; str() / f-string 中得到带 ANSI 颜色代码的字符串
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.color}{self.text}{Colors.ENDC}"
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+
+def get_visible_len(s):
+    """获取去除ANSI颜色代码后的字符串长度"""
+    if isinstance(s, Colored):
+        return len(str(s.text))
+    s = str(s)
+    if "\033" not in s:
+        return len(s)
+    return len(ANSI_PATTERN.sub("", s))
+
+
+def center_string(content, inner_width):
+    """带颜色字符串的居中对齐"""
+    content_str = str(content)
+    visible_len = get_visible_len(content)
+    padding = max(0, inner_width - visible_len)
+    r_padding = padding // 2
+    l_padding = padding - r_padding
+    return " " * l_padding + content_str + " " * r_padding
+
+
+# 一个收敛判据: 数值 (无法解析时为 None)、阈值 (未知时为 None)、是否收敛、
+# 显示时保留的小数位数 (None: 科学计数法)
+# 基于 tuple, 不带实例字典; 写入缓存 (JSON) 后读回为 list, 用 as_criterion 恢复
+Criterion = namedtuple("Criterion", ["value", "threshold", "converged", "digits"])
+
+
+def as_criterion(item):
+    if item is None or isinstance(item, Criterion):
+        return item
+    return Criterion(*item)
+
+
+def _to_float(text):
+    try:
+        return float(text)
+    except ValueError:
+        # 例如 Gaussian 溢出时输出的 ********
+        return None
+
+
+def parse_criterion(value_text, threshold_text, converged):
+    """由输出文件中的文本构造 Criterion, 显示时保留原文的小数位数"""
+    mantissa = value_text.lower().split("e")[0]
+    digits = len(mantissa) - mantissa.index(".") - 1 if "." in mantissa else 0
+    if "e" in value_text.lower():
+        digits = None
+    threshold = _to_float(threshold_text) if threshold_text is not None else None
+    return Criterion(_to_float(value_text), threshold, converged, digits)
+
+
+def format_criterion(item, missing="N/A"):
+    """
+    渲染时才上色: 已收敛为绿色, 未收敛为红色, 不是收敛判据 (converged 为 None) 时不上色;
+    item 为 None 时返回 missing
+    """
+    item = as_criterion(item)
+    if item is None:
+        return missing
+    if item.value is None:
+        text = "N/A"
+    elif item.digits is None:
+        text = f"{item.value:12.2E}"
+    else:
+        text = f"{item.value:.{item.digits}f}"
+    if item.converged is None:
+        return text
+    return Colored(text, Colors.GREEN if item.converged else Colors.RED)
+
+
+def color_by_status(text, status):
+    """按任务状态给文本上色: NORMAL 绿色, ERROR 红色, RUNNING 黄色"""
+    if status == "NORMAL":
+        return Colored(text, Colors.GREEN)
+    if status == "ERROR":
+        return Colored(text, Colors.RED)
+    if status == "RUNNING":
+        return Colored(text, Colors.YELLOW)
+    return text
+
+
+def update_last_or_append(rows, row, keep_all):
+    if keep_all:
+        rows.append(row)
+    elif rows:
+        rows[0] = row
+    else:
+        rows.append(row)
+
+
+def convert_d_to_float(value):
+    """Fortran 风格的数字 (1.0D-08) 转为 float, 无法转换时返回 None"""
+    if value is None:
+        return None
+    try:
+        return float(value.rstrip(".").replace("D", "E").replace("d", "E"))
+    except ValueError:
+        return None
@@ -0,0 +1,557 @@
+"""
+压缩输出文件 (.gz / .xz / .zst) 的透明读取
+
+open_decompressed 返回可 seek 的只读解压流, 解析函数通过 qctools.profiling.open_file
+像读普通文件一样使用它。向前 seek 时继续解压并丢弃数据; 向后 seek 或跳到文件末尾时,
+从不晚于目标位置的最近一个重启点开始解压:
+  - xz: 文件末尾的 index 记录了每个 block 的位置和解压后大小, 打开时即可得到总大小,
+    读取末尾只需解压最后一个 block (xz -T 多线程压缩的文件有多个 block);
+  - zstd: seekable 格式末尾的 seek table, 或多帧文件 (pzstd 等) 的各帧起点;
+  - gzip: 多成员文件 (bgzip 等) 的各成员起点; 此外在本进程内每解压 1 MiB 保存一次
+    解压器副本 (zlib 的 copy), 同一进程中再次读取时从最近的副本继续。
+第一次完整解压一个文件后, 把解压后总大小、各成员起点和最后 256 KiB 的内容 (压缩保存)
+写入缓存目录下的索引文件。文件未变化时, 之后读取文件末尾 (read_tail、
+parse_gaussian_last_step_from_tail 等) 不再需要解压。
+--no-cache 时 (set_saved_index(False)) 不读取也不写入索引文件, 只使用本进程内的索引。
+
+zstd 需要可选的 zstandard 模块, 未安装时 .zst 文件无法打开 (作为无法识别的文件跳过)。
+"""
+
+import base64
+import bisect
+import hashlib
+import io
+import json
+import lzma
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+from qctools.cache import default_cache_dir, stat_key
+
+COMPRESSED_SUFFIXES = {".gz": "gzip", ".xz": "xz", ".zst": "zstd"}
+MAGIC = {"gzip": b"\x1f\x8b", "xz": b"\xfd7zXZ\x00", "zstd": b"\x28\xb5\x2f\xfd"}
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+ZSTD_SEEKABLE_MAGIC = 0x8F92EAB1
+
+INPUT_CHUNK = 64 * 1024
+# gzip: 每解压这么多字节保存一次解压器副本, 最多保留 MAX_CHECKPOINTS 个 (超过时间隔加倍)
+CHECKPOINT_SPACING = 1 << 20
+MAX_CHECKPOINTS = 32
+# 向前 seek 超过这个距离时, 先看有没有更近的重启点
+RESTART_DISTANCE = 4 << 20
+# 索引文件中保存的文件末尾内容, 与 parse_gaussian_last_step_from_tail 的初始窗口相同
+TAIL_SNAPSHOT_BYTES = 256 * 1024
+MAX_SAVED_POINTS = 1024
+# 本进程内保留索引的文件数
+INDEX_MEMORY_FILES = 16
+
+# 是否读写缓存目录中的索引文件, 见 set_saved_index
+_saved_index = True
+
+_DECOMPRESS_ERRORS = (zlib.error, lzma.LZMAError) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+
+
+def compression_of(filename):
+    """根据扩展名返回 'gzip' / 'xz' / 'zstd', 未压缩返回 None"""
+    return COMPRESSED_SUFFIXES.get(os.path.splitext(filename)[1].lower())
+
+
+def is_compressed(filename):
+    return compression_of(filename) is not None
+
+
+def strip_compression_suffix(name):
+    """job.log.gz -> job.log, 未压缩的名称原样返回"""
+    root, ext = os.path.splitext(name)
+    return root if ext.lower() in COMPRESSED_SUFFIXES else name
+
+
+def _new_decompressor(kind):
+    if kind == "gzip":
+        return zlib.decompressobj(wbits=31)
+    if kind == "xz":
+        return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def _varint(data, pos):
+    """xz 的变长整数"""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _xz_points(raw, file_size):
+    """
+    从 stream footer 和 index 得到每个 block 的重启点和解压后总大小, 无法解析时返回 None
+    重启点: (压缩位置, 解压后位置, stream header, 本 stream 的 index 位置, stream 结束位置);
+    从 block 开始解压时先送入 stream header, 读到 index 位置后跳到下一个 stream
+    """
+    streams = []
+    pos = file_size
+    while pos > 0:
+        # stream padding: 4 的倍数个 0
+        while pos >= 4:
+            raw.seek(pos - 4)
+            if raw.read(4) != b"\0\0\0\0":
+                break
+            pos -= 4
+        if pos < 24:
+            return None
+        raw.seek(pos - 12)
+        footer = raw.read(12)
+        if footer[10:] != b"YZ":
+            return None
+        backward_size = (struct.unpack_from("<I", footer, 4)[0] + 1) * 4
+        index_start = pos - 12 - backward_size
+        if index_start < 12:
+            return None
+        raw.seek(index_start)
+        index = raw.read(backward_size)
+        if index[:1] != b"\0":
+            return None
+        count, i = _varint(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded, i = _varint(index, i)
+            size, i = _varint(index, i)
+            records.append((unpadded, size))
+        stream_start = index_start - sum((unpadded + 3) & ~3 for unpadded, _ in records) - 12
+        if stream_start < 0:
+            return None
+        raw.seek(stream_start)
+        header = raw.read(12)
+        if not header.startswith(MAGIC["xz"]):
+            return None
+        streams.append((stream_start, header, records, index_start, pos))
+        pos = stream_start
+
+    points = []
+    uncompressed = 0
+    for stream_start, header, records, index_start, stream_end in reversed(streams):
+        compressed = stream_start + 12
+        for unpadded, size in records:
+            points.append((compressed, uncompressed, header, index_start, stream_end))
+            compressed += (unpadded + 3) & ~3
+            uncompressed += size
+    return points, uncompressed
+
+
+def _zstd_points(raw, file_size):
+    """zstd seekable 格式: 末尾 seek table 中每一帧的大小, 不是该格式时返回 None"""
+    if file_size < 17:
+        return None
+    raw.seek(file_size - 9)
+    frames, descriptor, magic = struct.unpack("<IBI", raw.read(9))
+    if magic != ZSTD_SEEKABLE_MAGIC:
+        return None
+    entry = 12 if descriptor & 0x80 else 8
+    table_start = file_size - 9 - frames * entry
+    if table_start < 8:
+        return None
+    raw.seek(table_start)
+    table = raw.read(frames * entry)
+    points = []
+    compressed = uncompressed = 0
+    for i in range(frames):
+        frame_compressed, frame_size = struct.unpack_from("<II", table, i * entry)
+        points.append((compressed, uncompressed, b"", None, None))
+        compressed += frame_compressed
+        uncompressed += frame_size
+    return points, uncompressed
+
+
+class _Index:
+    """
+    一个压缩文件的重启点和已知信息
+    points: 可以独立开始解压的位置 (成员起点、xz block), 按解压后位置排序
+    checkpoints / recent: gzip 解压器副本 (压缩位置, 解压后位置, 解压器), 只在本进程内有效
+    """
+
+    def __init__(self, kind, key):
+        self.kind = kind
+        self.key = key
+        self.size = None
+        self.set_points([(0, 0, b"", None, None)])
+        self.checkpoints = []
+        self.recent = None
+        self.spacing = CHECKPOINT_SPACING
+        self.tail = None
+        self.dirty = False
+
+    def set_points(self, points):
+        self.points = list(points)
+        self.offsets = [point[1] for point in self.points]
+
+    def add_member(self, compressed, uncompressed):
+        i = bisect.bisect_left(self.offsets, uncompressed)
+        if i < len(self.offsets) and self.offsets[i] == uncompressed:
+            return
+        self.points.insert(i, (compressed, uncompressed, b"", None, None))
+        self.offsets.insert(i, uncompressed)
+        self.dirty = True
+
+    def add_checkpoint(self, compressed, uncompressed, decompressor):
+        checkpoint = (compressed, uncompressed, decompressor)
+        if self.recent is None or uncompressed > self.recent[1]:
+            self.recent = checkpoint
+        last = self.checkpoints[-1][1] if self.checkpoints else 0
+        if uncompressed - last < self.spacing:
+            return
+        self.checkpoints.append(checkpoint)
+        if len(self.checkpoints) > MAX_CHECKPOINTS:
+            self.checkpoints = self.checkpoints[1::2]
+            self.spacing *= 2
+
+    def best_restart(self, target):
+        """不晚于 target 的最近的重启点, 返回 _begin 的参数"""
+        i = bisect.bisect_right(self.offsets, target) - 1
+        best = self.points[max(i, 0)] + (None,)
+        candidates = self.checkpoints + ([self.recent] if self.recent else [])
+        for compressed, uncompressed, decompressor in candidates:
+            if best[1] < uncompressed <= target:
+                best = (compressed, uncompressed, b"", None, None, decompressor)
+        if best[5] is not None:
+            best = best[:5] + (best[5].copy(),)
+        return best
+
+
+def _index_path(filename):
+    digest = hashlib.sha1(os.path.abspath(filename).encode("utf-8", "surrogateescape"))
+    return os.path.join(default_cache_dir(), "compress-index", digest.hexdigest()[:24] + ".json")
+
+
+def _load_index(filename, kind, key):
+    try:
+        with open(_index_path(filename), "r") as handle:
+            data = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if data.get("key") != key or data.get("kind") != kind:
+        return None
+    index = _Index(kind, key)
+    index.size = data.get("size")
+    for compressed, uncompressed in data.get("points", []):
+        index.add_member(compressed, uncompressed)
+    if data.get("tail"):
+        try:
+            index.tail = zlib.decompress(base64.b64decode(data["tail"]))
+        except (ValueError, zlib.error):
+            index.tail = None
+    index.dirty = False
+    return index
+
+
+def _save_index(filename, index):
+    """写入索引文件 (原子替换); 缓存目录不可写时忽略"""
+    points = [(c, u) for c, u, prefix, _, _ in index.points if not prefix and u]
+    if len(points) > MAX_SAVED_POINTS:
+        step = len(points) / MAX_SAVED_POINTS
+        points = [points[int(i * step)] for i in range(MAX_SAVED_POINTS)]
+    data = {
+        "key": index.key,
+        "kind": index.kind,
+        "size": index.size,
+        "points": points,
+        "tail": base64.b64encode(zlib.compress(index.tail, 6)).decode("ascii")
+        if index.tail is not None
+        else None,
+    }
+    path = _index_path(filename)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as handle:
+            json.dump(data, handle)
+        os.replace(tmp_path, path)
+    except OSError:
+        return
+    index.dirty = False
+
+
+def set_saved_index(enabled):
+    """--no-cache: 之后打开的压缩文件不读取也不写入缓存目录中的索引文件"""
+    global _saved_index
+    _saved_index = enabled
+
+
+def saved_index_enabled():
+    return _saved_index
+
+
+_INDEXES = OrderedDict()
+
+
+def _get_index(filename, raw, kind, saved=True):
+    """
+    本进程内共享的索引; 文件变化 (大小/mtime/inode) 后重新建立
+    saved 为 False 时不读取缓存目录中的索引文件
+    """
+    key = stat_key(filename)
+    path = os.path.abspath(filename)
+    index = _INDEXES.get(path)
+    if index is None or index.key != key:
+        index = (_load_index(filename, kind, key) if saved else None) or _Index(kind, key)
+        builder = {"xz": _xz_points, "zstd": _zstd_points}.get(kind)
+        found = builder(raw, key[0]) if builder and key else None
+        if found and found[0]:
+            index.set_points(found[0])
+            index.size = found[1]
+        _INDEXES[path] = index
+        while len(_INDEXES) > INDEX_MEMORY_FILES:
+            _INDEXES.popitem(last=False)
+    _INDEXES.move_to_end(path)
+    return index
+
+
+_warned = set()
+
+
+def _warn_once(message):
+    if message not in _warned:
+        _warned.add(message)
+        sys.stderr.write(message + "\n")
+
+
+class SeekableDecompressor(io.RawIOBase):
+    """
+    压缩文件的只读解压流, tell/seek 使用解压后的位置
+    saved_index 为 False 时不读取也不写入缓存目录中的索引文件
+    """
+
+    def __init__(self, filename, saved_index=True):
+        super().__init__()
+        self.name = filename
+        self.kind = compression_of(filename)
+        self._saved_index = saved_index
+        if self.kind == "zstd" and zstandard is None:
+            _warn_once("读取 .zst 文件需要安装 zstandard 模块 (pip install zstandard), 已跳过")
+            raise OSError(f"未安装 zstandard, 无法读取 {filename}")
+        self._raw = io.FileIO(filename, "r")
+        try:
+            self._index = _get_index(filename, self._raw, self.kind, saved_index)
+        except (OSError, struct.error, IndexError):
+            self._raw.close()
+            raise
+        self._begin(0, 0)
+
+    def _begin(self, compressed, uncompressed, prefix=b"", limit=None, resume=None, decompressor=None):
+        """从压缩位置 compressed (对应解压后位置 uncompressed) 开始解压"""
+        self._raw.seek(compressed)
+        self._decomp = decompressor
+        if prefix:
+            self._decomp = _new_decompressor(self.kind)
+            self._decomp.decompress(prefix)
+        self._limit, self._resume = limit, resume
+        self._pending = b""
+        self._pos = uncompressed  # _buffer[0] 对应的解压后位置
+        self._buffer = b""
+        self._offset = 0
+        self._done = False
+        self._tail = bytearray()
+        self._tail_start = uncompressed
+        self._next_checkpoint = uncompressed + CHECKPOINT_SPACING
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos + self._offset
+
+    def _fill(self):
+        """丢弃当前缓冲区, 解压出下一段数据; 到达文件末尾返回 False"""
+        self._pos += len(self._buffer)
+        self._buffer = b""
+        self._offset = 0
+        try:
+            while not self._buffer and not self._done:
+                self._decode_step()
+        except _DECOMPRESS_ERRORS as exc:
+            raise OSError(f"解压 {self.name} 失败: {exc}") from exc
+        return bool(self._buffer)
+
+    def _decode_step(self):
+        if self._limit is not None and not self._pending and self._raw.tell() >= self._limit:
+            # 从 xz block 开始的解压到达本 stream 的 index, 跳到下一个 stream
+            self._raw.seek(self._resume)
+            self._limit = self._resume = None
+            self._decomp = None
+        if self._decomp is None or self._decomp.eof:
+            if not self._next_member():
+                self._finish()
+                return
+
+        data = self._pending
+        if not data:
+            size = INPUT_CHUNK
+            if self._limit is not None:
+                size = min(size, self._limit - self._raw.tell())
+            data = self._raw.read(size)
+        self._pending = b""
+        if not data:
+            # 压缩数据被截断: 已经解压出的内容照常使用
+            self._finish()
+            return
+
+        out = self._decomp.decompress(data)
+        if self._decomp.eof:
+            self._pending = self._decomp.unused_data
+        self._buffer = out
+        end = self._pos + len(out)
+        if self._index.tail is None:
+            self._tail += out
+            if len(self._tail) > 2 * TAIL_SNAPSHOT_BYTES:
+                del self._tail[:-TAIL_SNAPSHOT_BYTES]
+        if self.kind == "gzip" and not self._decomp.eof and end >= self._next_checkpoint:
+            self._index.add_checkpoint(self._raw.tell(), end, self._decomp.copy())
+            self._next_checkpoint = end + CHECKPOINT_SPACING
+
+    def _next_member(self):
+        """上一个成员 (gzip member / xz stream / zstd frame) 结束后, 找到下一个成员的起点"""
+        data = self._pending
+        while True:
+            if len(data) < 12:
+                more = self._raw.read(INPUT_CHUNK)
+                data += more
+                if more:
+                    continue
+            if data[:1] == b"\0":
+                # 成员之间的填充
+                data = data.lstrip(b"\0")
+                continue
+            if (
+                self.kind == "zstd"
+                and len(data) >= 8
+                and struct.unpack_from("<I", data)[0] & 0xFFFFFFF0 == ZSTD_SKIPPABLE_MAGIC
+            ):
+                skip = 8 + struct.unpack_from("<I", data, 4)[0]
+                if skip <= len(data):
+                    data = data[skip:]
+                else:
+                    self._raw.seek(skip - len(data), os.SEEK_CUR)
+                    data = b""
+                continue
+            break
+
+        self._pending = b""
+        if not data.startswith(MAGIC[self.kind]):
+            # 文件结束 (或末尾的无关数据)
+            return False
+        self._index.add_member(self._raw.tell() - len(data), self._pos)
+        self._decomp = _new_decompressor(self.kind)
+        self._pending = data
+        return True
+
+    def _finish(self):
+        self._done = True
+        index = self._index
+        if index.size is None:
+            index.size = self._pos
+            index.dirty = True
+        if index.tail is None and (len(self._tail) >= TAIL_SNAPSHOT_BYTES or self._tail_start == 0):
+            index.tail = bytes(self._tail[-TAIL_SNAPSHOT_BYTES:])
+            index.dirty = True
+        self._tail = bytearray()
+        if index.dirty and self._saved_index:
+            _save_index(self.name, index)
+
+    def _total_size(self):
+        if self._index.size is None:
+            # 解压到文件末尾, 同时记录重启点和末尾内容
+            self._offset = len(self._buffer)
+            while self._fill():
+                pass
+        return self._index.size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            target = offset
+        elif whence == io.SEEK_CUR:
+            target = self.tell() + offset
+        elif whence == io.SEEK_END:
+            target = self._total_size() + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        if target < 0:
+            raise OSError(22, "Invalid argument")
+        self._move_to(target)
+        return target
+
+    def _move_to(self, target):
+        if self._pos <= target <= self._pos + len(self._buffer):
+            self._offset = target - self._pos
+            return
+
+        index = self._index
+        if index.tail is not None and index.size is not None and target >= index.size - len(index.tail):
+            # 文件末尾的内容已在索引中, 不必解压
+            self._begin(0, index.size - len(index.tail))
+            self._buffer = index.tail
+            self._done = True
+            self._offset = min(target - self._pos, len(self._buffer))
+            if target > index.size:
+                self._pos, self._buffer, self._offset = target, b"", 0
+            return
+
+        current = self.tell()
+        if target < self._pos or target - current > RESTART_DISTANCE:
+            restart = index.best_restart(target)
+            if target < self._pos or restart[1] > current:
+                self._begin(*restart)
+
+        while target > self._pos + len(self._buffer):
+            if not self._fill():
+                self._pos = target
+                return
+        self._offset = target - self._pos
+
+    def readinto(self, buffer):
+        if self._offset >= len(self._buffer) and not self._fill():
+            return 0
+        view = memoryview(buffer).cast("B")
+        count = min(len(view), len(self._buffer) - self._offset)
+        view[:count] = self._buffer[self._offset : self._offset + count]
+        self._offset += count
+        return count
+
+    def readall(self):
+        chunks = [self._buffer[self._offset :]]
+        self._offset = len(self._buffer)
+        while self._fill():
+            chunks.append(self._buffer)
+            self._offset = len(self._buffer)
+        return b"".join(chunks)
+
+    def close(self):
+        if not self.closed:
+            self._raw.close()
+        super().close()
+
+
+def open_decompressed(filename, saved_index=None):
+    """
+    返回压缩文件的可 seek 原始解压流 (io.RawIOBase), 外面再套 BufferedReader 使用
+    saved_index: 是否读写缓存目录中的索引文件, None 表示按 set_saved_index 的设置
+    """
+    if saved_index is None:
+        saved_index = _saved_index
+    return SeekableDecompressor(filename, saved_index)
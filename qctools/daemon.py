@@ -0,0 +1,500 @@
+"""
+常驻内存的解析服务 (可选)
+
+    python qcdaemon.py ~/calc &
+
+启动时解析 ROOT 下的全部输出文件 (与 -r 相同的 --include/--exclude 规则), 所有提取器的结果
+(优化步、SCF、IRC) 保存在内存中; 之后根据 inotify 事件只重新解析有变化的文件,
+正在运行的任务与磁盘缓存一样从上次的位置继续读取。
+checkopt.py / checkscf.py / checkircall.py 的批量模式发现 socket 时把文件列表发给服务端,
+直接得到结果; 服务端不可用、仍在初始解析或超时时照常在本地解析。
+
+NFS/Lustre 上其他节点的写入不会触发 inotify, 因此服务端每隔 --rescan 秒重新遍历一次目录树;
+此外每次查询都用与磁盘缓存相同的键 (大小, mtime, inode) 检查文件, 漏掉事件也不会返回过期的结果。
+ROOT 之外的文件同样可以查询, 只是不会被监视。
+
+协议: 每个连接发送一行 JSON 请求, 收到一行 JSON 回复
+    {"op": "extract", "files": [绝对路径], "names": [提取器]}
+        -> {"ok": true, "rows": [[文件, 程序, 状态, {提取器: 结果}]]}
+    {"op": "status"} -> {"ok": true, "root": ..., "files": 文件数, ...}
+    {"op": "stop"}   -> {"ok": true}
+失败时回复 {"ok": false, "error": 原因}。
+
+run_in_process() 在当前进程的线程中运行服务端, 用于测试和 benchmarks/bench_daemon.py。
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+from qctools import engine
+from qctools.cache import ParseCache, default_cache_dir
+from qctools.discover import DEFAULT_PATTERNS, is_excluded, is_output_file, walk_output_files
+from qctools.engine import EXTRACTORS, extract_files
+from qctools.watch import IN_CREATE, IN_DELETE, IN_ISDIR, IN_MOVED_FROM, IN_MOVED_TO, TreeWatcher
+
+SOCKET_NAME = "daemon.sock"
+# 每隔多少秒重新遍历目录树 (补上 NFS 等不产生 inotify 事件的修改)
+DEFAULT_RESCAN = 60.0
+# 收到事件后最多等待多少秒再解析, 持续写入的文件的多次修改合并为一次
+DEFAULT_SETTLE = 0.5
+# 事件循环检查是否需要停止的最长间隔
+STOP_POLL = 0.5
+# 客户端等待回复的秒数, 超时后在本地解析
+CLIENT_TIMEOUT = 10.0
+
+
+def default_socket_path():
+    return os.path.join(default_cache_dir(), SOCKET_NAME)
+
+
+class MemoryCache(ParseCache):
+    """只保存在内存中的 ParseCache: 不读写磁盘, 也不淘汰条目"""
+
+    def __init__(self):
+        super().__init__(None)
+
+    def _read_entries(self):
+        return {}
+
+    def save(self):
+        self.dirty = False
+
+    def discard(self, filename):
+        self.entries.pop(os.path.abspath(filename), None)
+
+    def view(self, filenames):
+        """
+        只含 filenames 已有条目的新 MemoryCache: 在其上解析 (不持有服务端的锁),
+        之后用 publish 把新写入的条目合并回来
+        """
+        view = MemoryCache()
+        for filename in filenames:
+            abspath = os.path.abspath(filename)
+            if abspath in self.entries:
+                view.entries[abspath] = self.entries[abspath]
+        return view
+
+    def publish(self, view):
+        """合并 view 中新写入的条目 (put 总是创建新的条目)"""
+        self.entries.update(
+            (path, entry) for path, entry in view.entries.items() if self.entries.get(path) is not entry
+        )
+
+
+class ParseService:
+    """
+    root 下全部输出文件的解析结果
+    run() 在单独的线程中处理文件事件; handle_request() 由各连接的线程调用。
+    两者都在 lock 之外解析 (在 MemoryCache.view 得到的副本上), 只在取得副本和合并结果时
+    持有 lock, 一个请求中的大文件不会阻塞其他请求和文件事件的处理
+    """
+
+    def __init__(
+        self,
+        root,
+        include=DEFAULT_PATTERNS,
+        exclude=(),
+        jobs=1,
+        rescan=DEFAULT_RESCAN,
+        settle=DEFAULT_SETTLE,
+    ):
+        self.root = os.path.abspath(root)
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.jobs = jobs
+        self.rescan = rescan
+        self.settle = settle
+        # 服务端总是运行全部提取器, 任何脚本的查询都能命中
+        self.names = list(EXTRACTORS)
+        self.cache = MemoryCache()
+        self.files = set()
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.watcher = None
+        self.started = time.time()
+        self.counts = {"queries": 0, "parsed": 0, "events": 0, "rescans": 0}
+
+    def wanted(self, path):
+        name = os.path.basename(path)
+        return is_output_file(name, path, self.include) and not is_excluded(name, path, self.exclude)
+
+    def refresh(self, paths):
+        """重新解析 paths 中有变化的文件 (未变化的命中缓存, 不读取), 已不存在的文件删除"""
+        present = [path for path in paths if os.path.isfile(path)]
+        with self.lock:
+            for path in set(paths).difference(present):
+                self.files.discard(path)
+                self.cache.discard(path)
+            self.files.update(present)
+            view = self.cache.view(present)
+        extract_files(present, self.names, cache=view, jobs=self.jobs, remote=False)
+        with self.lock:
+            self.cache.publish(view)
+            self.counts["parsed"] += view.misses
+
+    def _walk(self, top, watch):
+        """top 下的输出文件; watch 为真时同时为 top 及其下未被排除的子目录添加 watch"""
+        if watch and self.watcher is not None:
+            for directory, subdirs, _ in os.walk(top):
+                subdirs[:] = [
+                    d for d in subdirs if not is_excluded(d, os.path.join(directory, d), self.exclude)
+                ]
+                if not self.watcher.add_directory(directory):
+                    # 超出 max_user_watches 等: 其余目录只靠定时重新遍历
+                    sys.stderr.write(f"无法监视 {directory}, 改为每 {self.rescan:g} 秒重新遍历\n")
+                    break
+        return [os.path.abspath(path) for path in walk_output_files(top, self.include, self.exclude)]
+
+    def scan(self, watch=False):
+        """遍历整棵树: 新文件和有变化的文件重新解析, 消失的文件删除"""
+        self.refresh(sorted(self.files.union(self._walk(self.root, watch))))
+
+    def _on_events(self, events, dirty):
+        """把事件涉及的文件加入 dirty; 事件队列溢出时返回 True (需要重新遍历并添加 watch)"""
+        for path, mask in events:
+            if path is None:
+                return True
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    prefix = path + os.sep
+                    dirty.update(f for f in self.files if f.startswith(prefix))
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    if not is_excluded(os.path.basename(path), path, self.exclude):
+                        dirty.update(self._walk(path, True))
+            elif self.wanted(path):
+                dirty.add(path)
+        return False
+
+    def run(self):
+        """初始解析, 然后处理文件事件直到 stopped 被设置"""
+        try:
+            self.watcher = TreeWatcher()
+        except (OSError, AttributeError):
+            self.watcher = None
+        try:
+            self.scan(watch=True)
+            self.ready.set()
+            dirty = set()
+            first_dirty = None
+            rewatch = False
+            next_rescan = time.monotonic() + self.rescan
+            while not self.stopped.is_set():
+                deadline = next_rescan if first_dirty is None else min(next_rescan, first_dirty + self.settle)
+                timeout = min(max(0.0, deadline - time.monotonic()), STOP_POLL)
+                if self.watcher is not None:
+                    events = self.watcher.read_events(timeout)
+                else:
+                    self.stopped.wait(timeout)
+                    events = []
+                if events:
+                    self.counts["events"] += len(events)
+                    if self._on_events(events, dirty):
+                        rewatch = True
+                        next_rescan = 0.0
+                    if dirty and first_dirty is None:
+                        first_dirty = time.monotonic()
+
+                now = time.monotonic()
+                if now >= next_rescan:
+                    self.scan(watch=rewatch)
+                    self.counts["rescans"] += 1
+                    dirty.clear()
+                    first_dirty = None
+                    rewatch = False
+                    next_rescan = time.monotonic() + self.rescan
+                elif first_dirty is not None and now >= first_dirty + self.settle:
+                    self.refresh(sorted(dirty))
+                    dirty.clear()
+                    first_dirty = None
+        finally:
+            if self.watcher is not None:
+                self.watcher.close()
+
+    def status(self):
+        return {
+            "ok": True,
+            "root": self.root,
+            "ready": self.ready.is_set(),
+            "files": len(self.files),
+            "watched": len(self.watcher.directories) if self.watcher is not None else 0,
+            "uptime": round(time.time() - self.started, 1),
+            **self.counts,
+        }
+
+    def handle_request(self, request):
+        op = request.get("op") if isinstance(request, dict) else None
+        if op == "status":
+            return self.status()
+        if op == "stop":
+            self.stopped.set()
+            return {"ok": True}
+        if op != "extract":
+            return {"ok": False, "error": f"未知的请求: {op}"}
+        if not self.ready.is_set():
+            return {"ok": False, "error": "正在进行初始解析"}
+        files, names = request.get("files"), request.get("names")
+        if not isinstance(files, list) or not all(isinstance(f, str) for f in files):
+            return {"ok": False, "error": "files 必须是文件路径列表"}
+        if not isinstance(names, list) or not set(names) <= set(EXTRACTORS):
+            return {"ok": False, "error": f"names 必须是 {', '.join(EXTRACTORS)} 中的提取器"}
+        with self.lock:
+            self.counts["queries"] += 1
+            view = self.cache.view(files)
+        rows = extract_files(files, self.names, cache=view, jobs=self.jobs, remote=False)
+        with self.lock:
+            self.cache.publish(view)
+        # 只返回请求的结果 (例如 checkopt.py 不需要 mkrestart.py 的结构)
+        rows = [
+            (filename, ftype, status, {name: results[name] for name in names if name in results})
+            for filename, ftype, status, results in rows
+        ]
+        return {"ok": True, "rows": rows}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            reply = self.server.service.handle_request(json.loads(self.rfile.readline()))
+        except ValueError as exc:
+            reply = {"ok": False, "error": f"无效的请求: {exc}"}
+        try:
+            self.wfile.write(json.dumps(reply, separators=(",", ":")).encode("utf-8") + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已超时并改为本地解析
+            pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _bind(socket_path, service):
+    """创建监听 socket (只有本用户可以连接); 上次异常退出留下的 socket 文件先删除"""
+    if os.path.exists(socket_path):
+        try:
+            DaemonClient(socket_path, timeout=1.0).request({"op": "status"})
+        except (OSError, ValueError):
+            os.remove(socket_path)
+        else:
+            raise OSError(f"{socket_path} 上已有服务端在运行")
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    old_umask = os.umask(0o077)
+    try:
+        server = _Server(socket_path, _Handler)
+    finally:
+        os.umask(old_umask)
+    server.service = service
+    return server
+
+
+@contextlib.contextmanager
+def running(service, socket_path):
+    """在后台线程中运行 service 和监听 socket_path 的服务端, 退出时停止并删除 socket"""
+    server = _bind(socket_path, service)
+    worker = threading.Thread(target=service.run, name="qcdaemon-watch", daemon=True)
+    listener = threading.Thread(target=server.serve_forever, name="qcdaemon-socket", daemon=True)
+    worker.start()
+    listener.start()
+    try:
+        yield server
+    finally:
+        service.stopped.set()
+        server.shutdown()
+        server.server_close()
+        worker.join()
+        with contextlib.suppress(OSError):
+            os.remove(socket_path)
+
+
+@contextlib.contextmanager
+def run_in_process(root, socket_path=None, timeout=None, **options):
+    """
+    在当前进程的线程中启动服务端, 初始解析完成后产出 (ParseService, DaemonClient)
+    socket_path 为 None 时使用临时目录中的 socket; options 传给 ParseService
+    """
+    service = ParseService(root, **options)
+    with tempfile.TemporaryDirectory(prefix="qcdaemon-") as tmp_dir:
+        path = socket_path or os.path.join(tmp_dir, SOCKET_NAME)
+        with running(service, path):
+            service.ready.wait(timeout)
+            yield service, DaemonClient(path)
+
+
+class DaemonClient:
+    """服务端的客户端; extract() 失败一次后不再尝试, 调用者改为本地解析"""
+
+    def __init__(self, path, timeout=CLIENT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.failed = False
+
+    def request(self, request):
+        """发送一个请求并返回回复 (dict); 连接失败、超时或回复无效时抛出 OSError/ValueError"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as reader:
+                reply = json.loads(reader.readline())
+        if not isinstance(reply, dict):
+            raise ValueError("无效的回复")
+        return reply
+
+    def extract(self, file_list, names):
+        """与 qctools.engine.extract_files 的返回值相同 (文件名保持调用者给出的形式); 失败返回 None"""
+        if self.failed:
+            return None
+        originals = {}
+        for filename in file_list:
+            originals.setdefault(os.path.abspath(filename), filename)
+        if not originals:
+            return []
+        try:
+            reply = self.request({"op": "extract", "files": list(originals), "names": list(names)})
+        except (OSError, ValueError):
+            reply = {}
+        if not reply.get("ok"):
+            self.failed = True
+            return None
+        rows = [(originals[f], file_type, status, results) for f, file_type, status, results in reply["rows"]]
+        rows.sort(key=lambda row: row[0])
+        return rows
+
+
+def add_daemon_arguments(parser):
+    parser.add_argument(
+        "--daemon-socket",
+        metavar="PATH",
+        help=f"常驻解析服务 (qcdaemon.py) 的 socket (默认: 缓存目录中的 {SOCKET_NAME}, 存在时批量模式自动使用)",
+    )
+    parser.add_argument("--no-daemon", action="store_true", help="不使用常驻解析服务, 总是在本地解析")
+
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def connect_from_options(options):
+    """
+    批量模式改为向服务端查询: 未指定 --no-daemon/--no-cache/--profile 且 socket 存在时;
+    返回 DaemonClient 或 None
+    """
+    if options.no_daemon or options.no_cache or options.profile or options.profile_trace:
+        return None
+    path = options.daemon_socket or default_socket_path()
+    if not _is_socket(path):
+        if options.daemon_socket:
+            sys.stderr.write(f"{path} 不是常驻解析服务的 socket, 改为本地解析\n")
+        return None
+    client = DaemonClient(path)
+    engine.use_remote(client)
+    return client
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="常驻内存的解析服务: 监视目录树中的输出文件, 通过 Unix socket 回答"
+        " checkopt.py / checkscf.py / checkircall.py 批量模式的查询"
+    )
+    parser.add_argument("root", nargs="?", default=".", help="要监视的目录 (默认: 当前目录)")
+    parser.add_argument(
+        "--socket", default=None, help=f"socket 路径 (默认: 缓存目录中的 {SOCKET_NAME})"
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="PATTERN",
+        help="要解析的文件名模式, 可多次指定 (默认: *.log 和 *.out)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="跳过与文件名、目录名或路径匹配的模式, 可多次指定",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="解析使用的进程数 (默认: 1, 0 表示使用全部 CPU)"
+    )
+    parser.add_argument(
+        "--rescan",
+        type=float,
+        default=DEFAULT_RESCAN,
+        help=f"重新遍历目录树的间隔 (秒, 默认: {DEFAULT_RESCAN:g}), 用于 inotify 收不到的 NFS 写入",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=DEFAULT_SETTLE,
+        help=f"文件变化后最多等待多少秒再解析 (默认: {DEFAULT_SETTLE:g})",
+    )
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--status", action="store_true", help="显示正在运行的服务端的状态")
+    group.add_argument("--stop", action="store_true", help="停止正在运行的服务端")
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error("--jobs 不能为负数")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    if args.rescan <= 0 or args.settle < 0:
+        parser.error("--rescan 必须大于 0, --settle 不能为负数")
+    args.include = tuple(args.include or DEFAULT_PATTERNS)
+    return args
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    path = options.socket or default_socket_path()
+
+    if options.status or options.stop:
+        try:
+            reply = DaemonClient(path).request({"op": "status" if options.status else "stop"})
+        except (OSError, ValueError) as exc:
+            print(f"无法连接服务端 {path}: {exc}")
+            sys.exit(1)
+        print(json.dumps(reply, ensure_ascii=False, indent=1))
+        return
+
+    if not os.path.isdir(options.root):
+        print(f"错误：目录 {options.root} 不存在。")
+        sys.exit(1)
+    service = ParseService(
+        options.root,
+        include=options.include,
+        exclude=options.exclude,
+        jobs=options.jobs,
+        rescan=options.rescan,
+        settle=options.settle,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: service.stopped.set())
+    try:
+        with running(service, path):
+            sys.stderr.write(f"监听 {path}, 正在解析 {service.root} ...\n")
+            announced = False
+            while not service.stopped.wait(1.0):
+                if not announced and service.ready.is_set():
+                    sys.stderr.write(f"初始解析完成: {len(service.files)} 个文件\n")
+                    announced = True
+    except OSError as exc:
+        print(f"错误：{exc}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
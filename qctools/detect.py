@@ -0,0 +1,151 @@
+"""
+输出文件类型识别与任务结束状态判断
+
+各程序用 register_program 登记: 文件头中的特征字节串 (可附带二次确认)、正常结束和报错的标志。
+识别时只读取文件开头固定大小的一块 (DETECT_BYTES, 一次 read), 在其中查找所有程序的特征,
+最先出现的特征所属的程序即文件类型 (同一位置按登记顺序)。
+优化步骤的解析器以相同的程序名登记在 qctools.opt.STEP_PARSERS 中。
+"""
+
+import os
+from collections import namedtuple
+
+from qctools.profiling import open_file
+
+# 识别程序类型读取的文件头大小 (各程序的标志都在前几十行)
+DETECT_BYTES = 16 * 1024
+
+# name: 程序名 (文件类型); label: 显示名称; signatures: 文件头中的特征 (bytes);
+# confirm(head, pos): 在 pos 处找到特征后的二次确认 (None 表示不需要);
+# normal / error: 文件末尾出现时表示正常结束 / 报错的字符串 (先判断 normal)
+Program = namedtuple("Program", ["name", "label", "signatures", "confirm", "normal", "error"])
+
+PROGRAMS = {}
+
+
+def register_program(name, label, signatures, normal=(), error=(), confirm=None):
+    PROGRAMS[name] = Program(name, label, tuple(signatures), confirm, tuple(normal), tuple(error))
+
+
+def program_labels():
+    """支持的程序, 用于提示信息: Gaussian/CP2K/ORCA/..."""
+    return "/".join(program.label for program in PROGRAMS.values())
+
+
+def _cp2k_confirm(head, pos):
+    """'PROGRAM STARTED AT' 较通用: 该行或其后 1000 字节内须出现 CP2K"""
+    end = head.find(b"\n", pos)
+    end = len(head) if end < 0 else end + 1
+    return b"CP2K" in head[head.rfind(b"\n", 0, pos) + 1 : end + 1000]
+
+
+register_program(
+    "GAUSSIAN",
+    "Gaussian",
+    [b"Gaussian, Inc.", b"Cite this work as:"],
+    normal=["Normal termination"],
+    error=["Error termination"],
+)
+register_program(
+    "CP2K",
+    "CP2K",
+    [b"CP2K|", b"PROGRAM STARTED AT"],
+    normal=["PROGRAM ENDED AT"],
+    error=["ABNORMAL TERMINATION", "An error has occurred"],
+    confirm=_cp2k_confirm,
+)
+# ORCA 报错通常不会有特定的统一结尾标志，如果没正常结束且文件不更新，
+# 往往是报错，但在脚本里很难严格区分 Error 和 Running，
+# 这里假设只要没看到 normal termination 且不是明显报错就是 running/error
+register_program(
+    "ORCA",
+    "ORCA",
+    [b"* O   R   C   A *", b"Program Version"],
+    normal=["ORCA TERMINATED NORMALLY"],
+    error=["ORCA finished by error termination"],
+)
+# xtb 的 "normal termination of xtb" 写在标准错误中, 而且是 "abnormal termination" 的子串
+register_program(
+    "XTB",
+    "xtb",
+    [b"x T B", b"xtb version"],
+    normal=["* finished run on"],
+    error=["abnormal termination of xtb", "[ERROR] Program stopped"],
+)
+register_program(
+    "QCHEM",
+    "Q-Chem",
+    [b"Welcome to Q-Chem", b"Q-Chem, Inc."],
+    normal=["Thank you very much for using Q-Chem"],
+    error=["Q-Chem fatal error"],
+)
+register_program(
+    "PSI4",
+    "Psi4",
+    [b"Psi4: An Open-Source Ab Initio Electronic Structure Package"],
+    normal=["Psi4 exiting successfully"],
+    error=["Psi4 encountered an error", "Traceback (most recent call last)"],
+)
+
+
+def detect_program(head):
+    """在文件开头的字节串 head 中识别程序类型, 返回 PROGRAMS 中的程序名或 None"""
+    best_pos, best_name = len(head), None
+    for program in PROGRAMS.values():
+        for signature in program.signatures:
+            pos = head.find(signature, 0, best_pos + len(signature))
+            while 0 <= pos < best_pos:
+                if program.confirm is None or program.confirm(head, pos):
+                    best_pos, best_name = pos, program.name
+                    break
+                pos = head.find(signature, pos + 1, best_pos + len(signature))
+    return best_name
+
+
+def detect_file_type(filename):
+    """
+    检查文件类型: 只读取文件开头 DETECT_BYTES 字节
+    返回: 'GAUSSIAN', 'CP2K', 'ORCA', 'XTB', 'QCHEM', 'PSI4' (见 PROGRAMS) or None
+    """
+    try:
+        with open_file(filename, "rb") as f:
+            return detect_program(f.read(DETECT_BYTES))
+    except Exception:
+        return None
+
+
+TAIL_CHECK_BYTES = 20000
+
+
+def read_tail(filename, size=TAIL_CHECK_BYTES):
+    """读取文件末尾 size 字节并解码, 读取失败时抛出 OSError"""
+    with open_file(filename, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        f.seek(-min(file_size, size), os.SEEK_END)
+        # 解码为字符串，忽略解码错误
+        return f.read().decode("utf-8", errors="ignore")
+
+
+def termination_status_from_text(content, file_type):
+    """根据文件末尾的文本判断任务状态"""
+    # 如果文件内容太少（刚开始运行）
+    if not content.strip():
+        return "RUNNING"
+
+    program = PROGRAMS.get(file_type)
+    if program is not None:
+        if any(marker in content for marker in program.normal):
+            return "NORMAL"
+        if any(marker in content for marker in program.error):
+            return "ERROR"
+    return "RUNNING"
+
+
+def check_termination_status(filename, file_type):
+    """检查任务是正常结束、报错还是正在运行 (只读取文件末尾 20KB)"""
+    try:
+        content = read_tail(filename)
+    except Exception:
+        return "ERROR"
+    return termination_status_from_text(content, file_type)
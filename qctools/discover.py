@@ -0,0 +1,157 @@
+"""
+查找要检查的输出文件
+
+默认只查找当前目录或指定目录下一层的 *.log / *.out;
+递归模式 (-r) 用 os.scandir 逐个目录遍历, 边遍历边产出文件, 调用者不必等待整棵目录树遍历完。
+文件名模式同时匹配压缩后的文件, 例如 *.log 也匹配 job.log.gz / job.log.xz / job.log.zst。
+命令行中的 tar 归档由 split_archive_args 分出, 归档内的成员用同样的模式选择 (wanted_member)。
+"""
+
+import fnmatch
+import glob
+import os
+
+from qctools.archive import ArchiveInput, is_archive
+from qctools.compress import COMPRESSED_SUFFIXES, strip_compression_suffix
+
+DEFAULT_PATTERNS = ("*.log", "*.out")
+
+
+def has_magic(arg):
+    return any(ch in arg for ch in "*?[")
+
+
+def with_compressed(patterns):
+    """每个模式后面加上各压缩扩展名, 用于 glob"""
+    return tuple(patterns) + tuple(p + suffix for p in patterns for suffix in COMPRESSED_SUFFIXES)
+
+
+def collect_output_files(args, patterns=DEFAULT_PATTERNS, exclude=()):
+    """非递归模式: 展开目录和通配符, 返回去重后排序的文件列表"""
+    patterns = with_compressed(patterns)
+    files = []
+    if not args:
+        for pattern in patterns:
+            files.extend(glob.glob(pattern))
+    for arg in args:
+        if os.path.isdir(arg):
+            for pattern in patterns:
+                files.extend(glob.glob(os.path.join(arg, pattern)))
+        elif has_magic(arg):
+            files.extend(glob.glob(arg))
+        else:
+            files.append(arg)
+
+    if exclude:
+        files = [f for f in files if not _matches(os.path.basename(f), f, exclude)]
+    return sorted(dict.fromkeys(files))
+
+
+def _matches(name, path, patterns):
+    if any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(path, p) for p in patterns):
+        return True
+    plain_name = strip_compression_suffix(name)
+    if plain_name == name:
+        return False
+    plain_path = strip_compression_suffix(path)
+    return any(fnmatch.fnmatch(plain_name, p) or fnmatch.fnmatch(plain_path, p) for p in patterns)
+
+
+def is_excluded(name, path, exclude=()):
+    """文件名/目录名 name 或路径 path 与 exclude 中的模式匹配 (与 walk_output_files 的规则相同)"""
+    return bool(exclude) and _matches(name, path, exclude)
+
+
+def is_output_file(name, path, include=DEFAULT_PATTERNS):
+    """文件名 name 或路径 path 与 include 中的模式匹配 (包括压缩后的文件)"""
+    return _matches(name, path, include)
+
+
+def wanted_member(name, include=DEFAULT_PATTERNS, exclude=()):
+    """归档成员名: 文件名或任一级目录名匹配 exclude 时跳过, 否则文件名须匹配 include"""
+    if exclude:
+        parts = name.split("/")
+        if any(_matches(part, name, exclude) for part in parts):
+            return False
+    return _matches(os.path.basename(name), name, include)
+
+
+def split_archive_args(args, include=DEFAULT_PATTERNS, exclude=()):
+    """
+    把参数中的 tar 归档 (包括通配符展开得到的) 分出来, 返回 (其他参数, [ArchiveInput])
+    展开后不含归档的参数原样保留
+    """
+    others, archives = [], []
+    for arg in args:
+        targets = sorted(glob.glob(arg)) if has_magic(arg) else [arg]
+        found = [t for t in targets if is_archive(t) and os.path.isfile(t)]
+        if not found:
+            others.append(arg)
+            continue
+        archives.extend(ArchiveInput(path, tuple(include), tuple(exclude)) for path in found)
+        others.extend(t for t in targets if t not in found)
+    return others, archives
+
+
+def walk_output_files(top, include=DEFAULT_PATTERNS, exclude=(), visited=None):
+    """
+    深度优先遍历 top, 逐个产出文件名匹配 include 的文件
+    exclude 中的模式与文件名/目录名或完整路径匹配时跳过 (目录整个跳过);
+    同一目录内按名称排序, 先产出文件再进入子目录。
+    跟随指向目录的符号链接, 但每个目录 (st_dev, st_ino) 只进入一次, 避免循环
+    """
+    if visited is None:
+        visited = set()
+    stack = [top]
+    while stack:
+        directory = stack.pop()
+        try:
+            st = os.stat(directory)
+        except OSError:
+            continue
+        key = (st.st_dev, st.st_ino)
+        if key in visited:
+            continue
+        visited.add(key)
+
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if exclude and _matches(entry.name, entry.path, exclude):
+                continue
+            try:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                elif entry.is_file() and _matches(entry.name, entry.path, include):
+                    yield entry.path
+            except OSError:
+                continue
+        # 栈顶为第一个子目录
+        stack.extend(reversed(subdirs))
+
+
+def iter_output_files(args, include=DEFAULT_PATTERNS, exclude=()):
+    """
+    递归模式: 依次处理每个参数 (默认为当前目录), 目录递归遍历, 通配符先展开;
+    产出的文件不排序也不汇总, 同一个文件只产出一次
+    """
+    visited = set()
+    seen = set()
+    for arg in args or ["."]:
+        targets = sorted(glob.glob(arg)) if has_magic(arg) else [arg]
+        for target in targets:
+            if os.path.isdir(target):
+                candidates = walk_output_files(target, include, exclude, visited)
+            else:
+                candidates = [target]
+            for path in candidates:
+                if path.startswith("./"):
+                    path = path[2:]
+                if path not in seen:
+                    seen.add(path)
+                    yield path
@@ -0,0 +1,522 @@
+"""
+一次读取、多种结果的提取引擎
+
+checkopt.py / checkscf.py / checkircall.py / mkrestart.py 的批量模式都通过 extract_files 获取结果。
+每个文件先读取文件头判断程序类型、读取末尾 20KB 判断结束状态, 然后:
+  - 请求的提取器都有从文件末尾读取的快速路径 (例如只需要最后一个优化步) 时, 不读取全文;
+  - 否则顺序读取一遍全文, 每批行同时交给请求的所有逐行提取器
+    (优化步、SCF 迭代、IRC 点), 一次读取得到全部结果。
+结果保存在各脚本共用的缓存中, 之后对同一个目录运行其他脚本时直接命中缓存;
+仍在运行的任务同时保存读取位置和各提取器的状态, 下次只读取新增的内容;
+第一次遇到仍在运行的任务时, 能从末尾快速路径得到状态的提取器 (seed) 不读取全文。
+
+常驻解析服务 (qctools.daemon) 运行时, 各脚本通过 use_remote 让 extract_files 把文件列表
+交给服务端, 直接得到内存中的结果; 服务端不可用时照常在本进程中解析。
+
+tar 归档中的成员只能顺序读取一次 (extract_archives): 文件头、全文和末尾都从这一遍中得到,
+所有逐行提取器一起运行。整个归档的结果以归档文件为键保存在同一个缓存中。
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from qctools import compress, profiling
+from qctools.archive import iter_archive_members, member_path
+from qctools.detect import (
+    DETECT_BYTES,
+    TAIL_CHECK_BYTES,
+    check_termination_status,
+    detect_file_type,
+    detect_program,
+    termination_status_from_text,
+)
+from qctools.discover import wanted_member
+from qctools.geom import GEOMETRY_READERS, last_geometry
+from qctools.incremental import (
+    CHUNK_SIZE,
+    complete_part,
+    decode_lines,
+    iter_complete_line_batches,
+    resume_position,
+)
+from qctools.irc import feed_irc_lines, irc_result, new_irc_state, termination_from_lines
+from qctools.opt import STEP_PARSERS, parse_last_step_state, parse_opt_steps
+from qctools.prefetch import Prefetcher
+from qctools.profiling import open_file
+from qctools.scf import LAST_SCF, feed_scf_lines, new_scf_state, scf_result
+
+# programs: 适用的程序类型 (None 表示全部)
+# tail(filename, file_type, final): 只读文件末尾的快速路径 (None 表示没有),
+#     final 为 True 时 (任务不是 RUNNING) 文件末尾没有换行符的最后一行也参与解析
+# new_state(file_type) / feed(state, lines) / result(state): 逐行提取, state 须可 JSON 序列化
+# seed(filename, file_type): 与 tail 相同只读文件末尾, 但返回可以继续逐行提取的状态
+#     (含读取位置 offset 和签名 sig), 失败时返回 None
+Extractor = namedtuple("Extractor", ["programs", "tail", "new_state", "feed", "result", "seed"])
+
+EXTRACTORS = {}
+
+# 缓存中保存的逐行提取器状态的格式版本, 状态的含义改变时加一, 旧状态从头解析
+RESUME_VERSION = 2
+
+# 常驻解析服务的客户端 (None 表示在本进程中解析)
+_remote = None
+
+
+def register_extractor(
+    name, programs=None, tail=None, new_state=None, feed=None, result=None, seed=None
+):
+    EXTRACTORS[name] = Extractor(programs, tail, new_state, feed, result, seed)
+
+
+def extractor_applies(name, file_type):
+    programs = EXTRACTORS[name].programs
+    return programs is None or file_type in programs
+
+
+# --- 优化步骤: 最后一步 (keep_all=False) ---
+
+
+def _opt_tail(filename, file_type, final):
+    return parse_opt_steps(filename, file_type, keep_all=False, final=final)
+
+
+def _opt_new_state(file_type):
+    state = STEP_PARSERS[file_type][0](False)
+    state["program"] = file_type
+    return state
+
+
+def _opt_feed(state, lines):
+    STEP_PARSERS[state["program"]][1](state, lines)
+
+
+def _opt_result(state):
+    return STEP_PARSERS[state["program"]][2](state)
+
+
+def _opt_seed(filename, file_type):
+    state = parse_last_step_state(filename, file_type)
+    if state is not None:
+        state["program"] = file_type
+    return state
+
+
+register_extractor(
+    "opt",
+    programs=tuple(STEP_PARSERS),
+    tail=_opt_tail,
+    new_state=_opt_new_state,
+    feed=_opt_feed,
+    result=_opt_result,
+    seed=_opt_seed,
+)
+
+
+# --- 最后一个结构: 只从文件末尾查找坐标块 (mkrestart.py) ---
+
+register_extractor("geom", programs=tuple(GEOMETRY_READERS), tail=last_geometry)
+
+
+# --- SCF 迭代: 最后一次 SCF 的各个 Cycle (最后一行即最后一个 Cycle) ---
+
+register_extractor(
+    "scf",
+    programs=("GAUSSIAN",),
+    new_state=lambda file_type: new_scf_state(LAST_SCF),
+    feed=feed_scf_lines,
+    result=lambda state: scf_result(state)[0],
+)
+
+
+# --- IRC: 正/反方向最后一个点及其能量, 以及根据最后 20 个非空行判断的终止状态 ---
+
+
+def _irc_result(state):
+    return {"points": list(irc_result(state)), "status": termination_from_lines(state["tail"])}
+
+
+register_extractor(
+    "irc",
+    programs=("GAUSSIAN",),
+    new_state=lambda file_type: new_irc_state(),
+    feed=feed_irc_lines,
+    result=_irc_result,
+)
+
+
+def _line_pass(filename, file_type, names, resume, final):
+    """
+    顺序读取文件, 每批行依次交给 names 中的逐行提取器
+    resume 为 None 时从头读取; 否则为上次保存的 {"version", "offset", "sig", "states"},
+    只保留 names 的状态从上次的位置继续, 版本不同、缺少所需状态或文件被截断/替换时返回 None;
+    final 为 True 时 (不再继续增量解析), 文件末尾没有换行符的最后一行也交给提取器
+    返回更新后的 resume, 读取失败时返回 None
+    """
+    try:
+        with open_file(filename, "rb") as f:
+            if resume is None:
+                resume = {
+                    "version": RESUME_VERSION,
+                    "offset": 0,
+                    "states": {name: EXTRACTORS[name].new_state(file_type) for name in names},
+                }
+            elif (
+                resume.get("version") != RESUME_VERSION
+                or not set(names) <= set(resume.get("states", {}))
+                or not resume_position(f, resume)
+            ):
+                return None
+            else:
+                resume = dict(resume, states={name: resume["states"][name] for name in names})
+            feeds = [(EXTRACTORS[name].feed, resume["states"][name]) for name in names]
+            for lines in iter_complete_line_batches(f, resume, final=final):
+                for feed, state in feeds:
+                    feed(state, lines)
+    except Exception:
+        return None
+    return resume
+
+
+def _seed_states(filename, file_type, names):
+    """names 中有 seed 的提取器从文件末尾得到的状态 {名称: 状态}, 失败的提取器不包括在内"""
+    states = {}
+    for name in names:
+        seed = EXTRACTORS[name].seed
+        state = seed(filename, file_type) if seed is not None else None
+        if state is not None:
+            states[name] = state
+    return states
+
+
+def run_extractors(filename, names, resume=None, track=False):
+    """
+    对单个文件运行 names 中的提取器, 返回
+        {"file_type": None}                             无法识别的文件
+        {"file_type", "status", "results": {名称: 结果}[, "resume"]}
+    resume: 上次返回的 "resume", 有效时逐行提取器只读取其后新增的内容
+    track: 为 True 时 (调用者会保存结果) 仍在运行的任务在返回值的 "resume" 中保存读取位置和状态;
+           没有可用的 resume 时, 请求的提取器都有快速路径则用 seed 从文件末尾得到状态, 不读取全文
+    """
+    with profiling.phase("detect"):
+        file_type = detect_file_type(filename)
+    if not file_type:
+        return {"file_type": None}
+    with profiling.phase("termination"):
+        status = check_termination_status(filename, file_type)
+    value = {"file_type": file_type, "status": status, "results": {}}
+
+    wanted = [name for name in names if extractor_applies(name, file_type)]
+    line_names = [name for name in wanted if EXTRACTORS[name].feed is not None]
+    running = status == "RUNNING"
+    incremental = track and running
+    passed = None
+    if resume is not None and line_names:
+        profiling.set_parse_path("resume")
+        with profiling.phase("parse"):
+            passed = _line_pass(filename, file_type, line_names, resume, not running)
+    if passed is None and line_names:
+        if any(EXTRACTORS[name].tail is None for name in wanted):
+            profiling.set_parse_path("full")
+            with profiling.phase("parse"):
+                passed = _line_pass(filename, file_type, line_names, None, not incremental)
+        elif incremental:
+            profiling.set_parse_path("tail")
+            with profiling.phase("parse"):
+                states = _seed_states(filename, file_type, line_names)
+            for name, state in states.items():
+                value["results"][name] = EXTRACTORS[name].result(state)
+            positions = {(state["offset"], state.get("sig")) for state in states.values()}
+            if len(states) == len(line_names) and len(positions) == 1:
+                offset, sig = positions.pop()
+                value["resume"] = {
+                    "version": RESUME_VERSION,
+                    "offset": offset,
+                    "sig": sig,
+                    "states": states,
+                }
+    if passed is not None:
+        for name in line_names:
+            value["results"][name] = EXTRACTORS[name].result(passed["states"][name])
+        if incremental:
+            value["resume"] = passed
+
+    for name in wanted:
+        if name not in value["results"]:
+            tail = EXTRACTORS[name].tail
+            if tail is None:
+                value["results"][name] = None
+                continue
+            profiling.set_parse_path("tail")
+            with profiling.phase("parse"):
+                value["results"][name] = tail(filename, file_type, not running)
+    return value
+
+
+def _run_item(item):
+    """返回 (结果, 性能统计); 未启用性能分析时统计为 None"""
+    filename, names, resume, track, profiled, saved_index = item
+    # 进程池的子进程不一定继承主进程的设置
+    compress.set_saved_index(saved_index)
+    if not profiled:
+        return run_extractors(filename, names, resume, track), None
+    with profiling.track(filename) as stats:
+        value = run_extractors(filename, names, resume, track)
+    return value, stats
+
+
+def use_remote(client):
+    """
+    之后的 extract_files 先调用 client.extract(file_list, names), 返回 None 时在本进程中解析
+    client 为 None 时恢复本地解析
+    """
+    global _remote
+    _remote = client
+
+
+def _covers(value, names):
+    if not value.get("file_type"):
+        return True
+    results = value.get("results", {})
+    return all(
+        name in results for name in names if extractor_applies(name, value["file_type"])
+    )
+
+
+def extract_files(file_list, names, cache=None, jobs=1, pool=None, remote=True, prefetch=0):
+    """
+    逐个 (jobs=1) 或用进程池并行地对每个文件运行提取器
+    返回按文件名排序的 [(filename, file_type, status, results)], 无法识别类型的文件被丢弃
+    提供 cache 时, 未变化且已包含所需结果的文件直接使用缓存;
+    仍在增长的文件从缓存中保存的位置继续读取
+    pool: 可选的 ProcessPoolExecutor, 多次调用时复用同一个进程池
+    remote: 为 False 时不使用 use_remote 设置的服务端 (服务端自己解析时)
+    prefetch: 逐个解析时用这么多个线程提前读取后面文件的开头和末尾 (见 qctools.prefetch)
+    """
+    if remote and _remote is not None:
+        rows = _remote.extract(file_list, names)
+        if rows is not None:
+            return rows
+    files = sorted(file_list)
+    profiler = profiling.get_profiler()
+    values = {}
+    partial = {}
+    todo = []
+    for filename in files:
+        cached = cache.get(filename) if cache is not None else None
+        if cached is not None:
+            if _covers(cached, names):
+                values[filename] = cached
+                if profiler is not None:
+                    profiler.add_file(profiling.new_file_stats(filename, cached=True))
+                continue
+            partial[filename] = cached
+        resume = None
+        if cache is not None:
+            previous = cached or cache.get_previous(filename) or {}
+            resume = previous.get("resume")
+        todo.append(
+            (
+                filename,
+                names,
+                resume,
+                cache is not None,
+                profiler is not None,
+                compress.saved_index_enabled(),
+            )
+        )
+
+    if jobs > 1 and len(todo) > 1:
+        # 每个进程一次领取若干文件, 减少进程间通信次数
+        chunksize = max(1, len(todo) // (jobs * 8))
+        if pool is not None:
+            results = list(pool.map(_run_item, todo, chunksize=chunksize))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as new_pool:
+                results = list(new_pool.map(_run_item, todo, chunksize=chunksize))
+    elif prefetch > 0 and len(todo) > 1:
+        results = []
+        with Prefetcher([item[0] for item in todo], prefetch) as prefetcher:
+            for item in todo:
+                with prefetcher.use(item[0]):
+                    results.append(_run_item(item))
+    else:
+        results = [_run_item(item) for item in todo]
+
+    for (filename, *_), (value, stats) in zip(todo, results):
+        if stats is not None:
+            profiler.add_file(stats)
+        cached = partial.get(filename)
+        if cached is not None and cached.get("file_type") == value.get("file_type"):
+            # 文件未变化: 保留缓存中其他脚本需要的结果
+            value["results"] = dict(cached.get("results", {}), **value.get("results", {}))
+        values[filename] = value
+        if cache is not None:
+            cache.put(filename, value)
+
+    return [
+        (filename, values[filename]["file_type"], values[filename]["status"], values[filename]["results"])
+        for filename in files
+        if values[filename].get("file_type")
+    ]
+
+
+def iter_extract_batches(file_iter, names, cache=None, jobs=1, batch_size=None, prefetch=0):
+    """
+    与 extract_files 相同, 但文件名来自一个迭代器 (例如递归遍历目录):
+    每凑够 batch_size 个文件就处理一批, 产出这批的结果列表 (批内按文件名排序),
+    不必等待全部文件名产生
+    """
+    if batch_size is None:
+        batch_size = max(64, jobs * 16, prefetch * 4)
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        batch = []
+        for filename in file_iter:
+            batch.append(filename)
+            if len(batch) >= batch_size:
+                yield extract_files(batch, names, cache=cache, jobs=jobs, pool=pool, prefetch=prefetch)
+                batch = []
+        if batch:
+            yield extract_files(batch, names, cache=cache, jobs=jobs, pool=pool, prefetch=prefetch)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+# 归档成员: 第一次读取的大小 (其开头 DETECT_BYTES 用于识别程序类型)
+STREAM_HEAD_BYTES = 64 * 1024
+
+
+def run_extractors_on_stream(handle, names):
+    """
+    与 run_extractors 相同, 但 handle 是只能顺序读取一次的二进制流 (例如归档成员):
+    文件头、全文和结束状态所需的末尾内容都从同一遍读取中得到, 所有逐行提取器一起运行
+    """
+    head = handle.read(STREAM_HEAD_BYTES)
+    profiling.add_read(len(head))
+    with profiling.phase("detect"):
+        file_type = detect_program(head[:DETECT_BYTES])
+    if not file_type:
+        return {"file_type": None}
+
+    line_names = [
+        name
+        for name, extractor in EXTRACTORS.items()
+        if extractor.feed is not None and extractor_applies(name, file_type)
+    ]
+    states = {name: EXTRACTORS[name].new_state(file_type) for name in line_names}
+    feeds = [(EXTRACTORS[name].feed, states[name]) for name in line_names]
+    profiling.set_parse_path("full")
+    tail = b""
+    pending = b""
+    with profiling.phase("parse"):
+        for chunk in chain([head], iter(lambda: handle.read(CHUNK_SIZE), b"")):
+            if chunk is not head:
+                profiling.add_read(len(chunk))
+            if len(chunk) >= TAIL_CHECK_BYTES:
+                tail = chunk[-TAIL_CHECK_BYTES:]
+            else:
+                tail = (tail + chunk)[-TAIL_CHECK_BYTES:]
+            data = pending + chunk
+            end = data.rfind(b"\n") + 1
+            pending = data[end:]
+            if end:
+                lines = decode_lines(data[:end])
+                for feed, state in feeds:
+                    feed(state, lines)
+        if pending:
+            lines = decode_lines(complete_part(pending, final=True))
+            for feed, state in feeds:
+                feed(state, lines)
+
+    with profiling.phase("termination"):
+        status = termination_status_from_text(tail.decode("utf-8", errors="ignore"), file_type)
+    results = {name: EXTRACTORS[name].result(states[name]) for name in line_names}
+    for name in names:
+        if extractor_applies(name, file_type):
+            results.setdefault(name, None)
+    return {"file_type": file_type, "status": status, "results": results}
+
+
+def _scan_archive(archive, names):
+    """顺序读取一遍归档, 逐个产出 [成员名, file_type, status, results], 包括无法识别的成员"""
+    profiler = profiling.get_profiler()
+    wanted = lambda name: wanted_member(name, archive.include, archive.exclude)  # noqa: E731
+    for name, handle in iter_archive_members(archive.path, wanted):
+        stats = None
+        try:
+            if profiler is None:
+                value = run_extractors_on_stream(handle, names)
+            else:
+                with profiling.track(member_path(archive.path, name)) as stats:
+                    value = run_extractors_on_stream(handle, names)
+        except Exception:
+            value = {"file_type": None}
+        if stats is not None:
+            profiler.add_file(stats)
+        yield [name, value["file_type"], value.get("status"), value.get("results", {})]
+
+
+def _archive_entry(archive, members):
+    return {
+        "archive": {
+            "include": list(archive.include),
+            "exclude": list(archive.exclude),
+            "extractors": list(EXTRACTORS),
+            "members": members,
+        }
+    }
+
+
+def _archive_covers(cached, archive, names):
+    entry = cached.get("archive") if cached else None
+    return (
+        entry is not None
+        and entry["include"] == list(archive.include)
+        and entry["exclude"] == list(archive.exclude)
+        and set(names) <= set(entry["extractors"])
+    )
+
+
+def _member_rows(archive, members):
+    return [
+        (member_path(archive.path, name), file_type, status, results)
+        for name, file_type, status, results in members
+        if file_type
+    ]
+
+
+def iter_archive_batches(archives, names, cache=None):
+    """
+    对每个归档 (qctools.archive.ArchiveInput) 中名称匹配的成员运行提取器, 产出格式与
+    iter_extract_batches 相同的结果批次, 文件名为 "归档:成员名", 无法识别类型的成员被丢弃:
+    读取归档时每解析完一个成员产出一批; 未变化且成员选择相同的归档直接使用缓存, 整个归档为一批
+    """
+    for archive in archives:
+        cached = cache.get(archive.path) if cache is not None else None
+        if _archive_covers(cached, archive, names):
+            rows = _member_rows(archive, cached["archive"]["members"])
+            profiler = profiling.get_profiler()
+            if profiler is not None:
+                for row in rows:
+                    profiler.add_file(profiling.new_file_stats(row[0], cached=True))
+            yield rows
+            continue
+        members = []
+        for member in _scan_archive(archive, names):
+            members.append(member)
+            yield _member_rows(archive, [member])
+        if cache is not None:
+            cache.put(archive.path, _archive_entry(archive, members))
+
+
+def extract_archives(archives, names, cache=None):
+    """与 iter_archive_batches 相同, 但返回全部结果, 每个归档内按成员名排序"""
+    results = []
+    for archive in archives:
+        rows = []
+        for batch in iter_archive_batches([archive], names, cache=cache):
+            rows.extend(batch)
+        results.extend(sorted(rows, key=lambda row: row[0]))
+    return results
@@ -0,0 +1,314 @@
+"""
+输出文件中最后一个结构的提取, 以及续算用的 .gjf / .xyz 文件
+
+从文件末尾开始读取 (窗口不断加倍, 与 qctools.opt._parse_tail_first 相同),
+查找最后一个完整的坐标块, 不读取全文:
+  Gaussian  "Standard orientation:" / "Input orientation:" 表 (取两者中最后出现的一个)
+  ORCA      "CARTESIAN COORDINATES (ANGSTROEM)"
+  CP2K      "ATOMIC COORDINATES IN angstrom"; 优化时输出文件只在开始时打印坐标,
+            同目录下的轨迹 <项目名>-pos-1.xyz 存在且原子数相同时取其最后一帧
+电荷、自旋多重度以及 Gaussian 的 Link0 (%chk, %mem 等) 和 route 从文件开头 HEAD_BYTES 中读取。
+
+结构为 {"atoms": [[元素, x, y, z], ...], "charge", "multiplicity", "link0", "route"},
+读不到的项为 None (link0 为 [])。
+"""
+
+import os
+import re
+
+from qctools.incremental import complete_part, decode_lines
+from qctools.profiling import mark_tail, open_file
+
+# 读取电荷、多重度和 route 的文件头大小 (ORCA 在输入文件回显中, 位于程序简介之后)
+HEAD_BYTES = 64 * 1024
+# 从末尾查找坐标的初始窗口
+TAIL_BYTES = 256 * 1024
+
+# 原子序数 -> 元素符号, 0 为 Gaussian 的 ghost 原子
+ELEMENTS = (
+    "Bq H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca "
+    "Sc Ti V Cr Mn Fe Co Ni Cu Zn Ga Ge As Se Br Kr Rb Sr Y Zr "
+    "Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce Pr Nd "
+    "Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg "
+    "Tl Pb Bi Po At Rn Fr Ra Ac Th Pa U Np Pu Am Cm Bk Cf Es Fm "
+    "Md No Lr Rf Db Sg Bh Hs Mt Ds Rg Cn Nh Fl Mc Lv Ts Og"
+).split()
+
+# 续算的 .gjf 没有原 Gaussian route 可用时 (ORCA/CP2K 的结构) 使用, 可用 --route 指定
+DEFAULT_ROUTE = "#p opt freq b3lyp/6-31g(d)"
+
+GAUSSIAN_ORIENTATIONS = ("Standard orientation:", "Input orientation:")
+GAUSSIAN_CHARGE_PATTERN = re.compile(r"Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)")
+# ORCA 输入文件回显: "|  5> * xyz 0 1"
+ORCA_CHARGE_PATTERN = re.compile(
+    r"^\|\s*\d+>\s*\*\s*(?:xyz|xyzfile|int|internal|gzmt|pdbfile)\s+(-?\d+)\s+(\d+)",
+    re.IGNORECASE | re.MULTILINE,
+)
+CP2K_CHARGE_PATTERN = re.compile(r"DFT\|\s+Charge\s+(-?\d+)")
+CP2K_MULTIPLICITY_PATTERN = re.compile(r"DFT\|\s+Multiplicity\s+(\d+)")
+CP2K_PROJECT_PATTERN = re.compile(r"GLOBAL\|\s+Project name\s+(\S+)")
+
+
+def _coordinates(tokens):
+    try:
+        return [float(value) for value in tokens]
+    except ValueError:
+        return None
+
+
+# --- 坐标块: find(lines) 返回窗口内最后一个完整的块 (原子列表) 或 None ---
+
+
+def _last_gaussian_block(lines):
+    """
+    Standard/Input orientation 表, 以虚线结束:
+     ---------------------------------------------------------------------
+     Center     Atomic      Atomic             Coordinates (Angstroms)
+     Number     Number       Type             X           Y           Z
+     ---------------------------------------------------------------------
+          1          8           0        0.000000    0.000000    0.117300
+     ---------------------------------------------------------------------
+    旧版本没有 Atomic Type 列
+    """
+    for index in range(len(lines) - 1, -1, -1):
+        line = lines[index]
+        if "orientation:" not in line or line.strip() not in GAUSSIAN_ORIENTATIONS:
+            continue
+        atoms = []
+        for row in lines[index + 5 :]:
+            tokens = row.split()
+            if row.lstrip().startswith("---"):
+                if atoms:
+                    return atoms
+                break
+            xyz = _coordinates(tokens[-3:]) if len(tokens) >= 5 else None
+            if xyz is None or not tokens[1].isdigit() or int(tokens[1]) >= len(ELEMENTS):
+                break
+            atoms.append([ELEMENTS[int(tokens[1])]] + xyz)
+    return None
+
+
+def _last_orca_block(lines):
+    """
+    ---------------------------------
+    CARTESIAN COORDINATES (ANGSTROEM)
+    ---------------------------------
+      O      0.000000    0.000000    0.117300
+      H      0.000000    0.757200   -0.469200
+
+    以空行结束
+    """
+    for index in range(len(lines) - 1, -1, -1):
+        if lines[index].strip() != "CARTESIAN COORDINATES (ANGSTROEM)":
+            continue
+        atoms = []
+        for row in lines[index + 2 :]:
+            tokens = row.split()
+            if not tokens:
+                if atoms:
+                    return atoms
+                break
+            xyz = _coordinates(tokens[1:4]) if len(tokens) == 4 else None
+            if xyz is None:
+                break
+            atoms.append([tokens[0]] + xyz)
+    return None
+
+
+def _last_cp2k_block(lines):
+    """
+     MODULE QUICKSTEP:  ATOMIC COORDINATES IN angstrom
+
+      Atom  Kind  Element       X           Y           Z          Z(eff)       Mass
+
+           1     1 O    8    0.000000    0.000000    0.117300      6.00      15.9994
+
+    以空行结束; 新版本的标题为大写 ANGSTROM
+    """
+    for index in range(len(lines) - 1, -1, -1):
+        line = lines[index]
+        if "ATOMIC COORDINATES IN" not in line.upper() or "ANGSTROM" not in line.upper():
+            continue
+        atoms = []
+        for row in lines[index + 4 :]:
+            tokens = row.split()
+            if not tokens:
+                if atoms:
+                    return atoms
+                break
+            xyz = _coordinates(tokens[4:7]) if len(tokens) >= 7 else None
+            if xyz is None or not tokens[0].isdigit():
+                break
+            atoms.append([tokens[2]] + xyz)
+    return None
+
+
+def _last_block_from_tail(filename, find, initial_size=TAIL_BYTES, final=False):
+    """
+    从文件末尾开始查找 find 能识别的最后一个完整坐标块, 窗口不断加倍直到整个文件
+    final 为 True 时 (任务已结束) 末尾没有换行符的最后一行也交给 find
+    """
+    try:
+        with open_file(filename, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            file_size = f.tell()
+            size = min(initial_size, file_size)
+            while True:
+                start = file_size - size
+                f.seek(start, os.SEEK_SET)
+                data = f.read(size)
+                if start:
+                    # 丢弃被窗口截断的第一行
+                    data = data[data.find(b"\n") + 1 :]
+                # 最后一行可能还没写完, 只交给 find 完整的行
+                atoms = find(decode_lines(complete_part(data, final)))
+                if atoms or size >= file_size:
+                    mark_tail(size < file_size or file_size <= initial_size)
+                    return atoms
+                size = min(size * 2, file_size)
+    except Exception:
+        return None
+
+
+def read_head(filename, size=HEAD_BYTES):
+    try:
+        with open_file(filename, "rb") as f:
+            return f.read(size).decode("utf-8", errors="ignore")
+    except Exception:
+        return ""
+
+
+# --- 各程序: 文件头中的电荷、多重度等 ---
+
+
+def _gaussian_header(head):
+    """Link0 (%...) 行、route (# 开头, 可能折成多行, 到虚线为止) 以及电荷和多重度"""
+    info = {"link0": [], "route": None}
+    lines = head.split("\n")
+    for index, line in enumerate(lines):
+        text = line.strip()
+        if text.startswith("%") and info["route"] is None:
+            info["link0"].append(text)
+        elif text.startswith("#"):
+            route = []
+            for row in lines[index:]:
+                if row.strip().startswith("---"):
+                    break
+                # 折行处可能在单词中间, 只去掉行首的一个空格
+                route.append(row[1:] if row.startswith(" ") else row)
+            info["route"] = "".join(route).strip()
+            break
+    match = GAUSSIAN_CHARGE_PATTERN.search(head)
+    if match:
+        info["charge"], info["multiplicity"] = int(match.group(1)), int(match.group(2))
+    return info
+
+
+def _orca_header(head):
+    match = ORCA_CHARGE_PATTERN.search(head)
+    if not match:
+        return {}
+    return {"charge": int(match.group(1)), "multiplicity": int(match.group(2))}
+
+
+def _cp2k_header(head):
+    info = {}
+    match = CP2K_CHARGE_PATTERN.search(head)
+    if match:
+        info["charge"] = int(match.group(1))
+    match = CP2K_MULTIPLICITY_PATTERN.search(head)
+    if match:
+        info["multiplicity"] = int(match.group(1))
+    match = CP2K_PROJECT_PATTERN.search(head)
+    if match:
+        info["project"] = match.group(1)
+    return info
+
+
+def _last_xyz_frame(filename, natoms):
+    """xyz 轨迹的最后一帧 (每帧 natoms + 2 行), 与 natoms 不符或读取失败时返回 None"""
+    try:
+        with open_file(filename, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            file_size = f.tell()
+            # 每行最多约 100 字节, 多读一些以包含完整的最后一帧
+            size = min(file_size, (natoms + 2) * 128 + 4096)
+            f.seek(file_size - size)
+            lines = [line for line in decode_lines(f.read(size)) if line.strip()]
+    except Exception:
+        return None
+    frame = lines[-(natoms + 2) :]
+    if len(frame) != natoms + 2 or frame[0].strip() != str(natoms):
+        return None
+    atoms = []
+    for row in frame[2:]:
+        tokens = row.split()
+        xyz = _coordinates(tokens[1:4]) if len(tokens) >= 4 else None
+        if xyz is None:
+            return None
+        atoms.append([tokens[0]] + xyz)
+    return atoms
+
+
+def _cp2k_trajectory(filename, info, atoms):
+    project = info.pop("project", None)
+    if not project or not atoms:
+        return atoms
+    path = os.path.join(os.path.dirname(filename), f"{project}-pos-1.xyz")
+    if not os.path.isfile(path):
+        return atoms
+    return _last_xyz_frame(path, len(atoms)) or atoms
+
+
+# 程序名 (与 qctools.detect 相同) -> (查找坐标块, 解析文件头)
+GEOMETRY_READERS = {
+    "GAUSSIAN": (_last_gaussian_block, _gaussian_header),
+    "ORCA": (_last_orca_block, _orca_header),
+    "CP2K": (_last_cp2k_block, _cp2k_header),
+}
+
+
+def last_geometry(filename, file_type, final=False):
+    """最后一个结构 (见模块说明), 没有坐标块或程序不支持时返回 None; final 同 _last_block_from_tail"""
+    if file_type not in GEOMETRY_READERS:
+        return None
+    find, header = GEOMETRY_READERS[file_type]
+    atoms = _last_block_from_tail(filename, find, final=final)
+    info = {"charge": None, "multiplicity": None, "link0": [], "route": None}
+    info.update(header(read_head(filename)))
+    if file_type == "CP2K":
+        atoms = _cp2k_trajectory(filename, info, atoms)
+    if not atoms:
+        return None
+    info["atoms"] = atoms
+    return info
+
+
+# --- 写出续算文件 ---
+
+
+def _atom_lines(atoms):
+    return [f" {symbol:<2} {x:16.8f} {y:16.8f} {z:16.8f}" for symbol, x, y, z in atoms]
+
+
+def format_xyz(geometry, title=""):
+    atoms = geometry["atoms"]
+    return "\n".join([str(len(atoms)), title] + _atom_lines(atoms)) + "\n"
+
+
+def format_gjf(geometry, title="", route=None, link0=None, charge=None, multiplicity=None):
+    """
+    Gaussian 输入文件; route / link0 / charge / multiplicity 为 None 时依次使用
+    原任务的设置 (来自 Gaussian 输出), 否则为 DEFAULT_ROUTE、无 Link0、0 和 1
+    """
+    if route is None:
+        route = geometry.get("route") or DEFAULT_ROUTE
+    if link0 is None:
+        link0 = geometry.get("link0") or []
+    if charge is None:
+        charge = geometry["charge"] if geometry.get("charge") is not None else 0
+    if multiplicity is None:
+        multiplicity = geometry["multiplicity"] if geometry.get("multiplicity") is not None else 1
+    lines = list(link0) + [route, "", title or "restart", "", f"{charge} {multiplicity}"]
+    # Gaussian 要求输入文件以空行结束
+    return "\n".join(lines + _atom_lines(geometry["atoms"]) + ["", ""])
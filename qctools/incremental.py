@@ -0,0 +1,120 @@
+"""
+从上次解析结束的位置继续读取文件
+
+解析函数把读取位置 (offset) 和位置之前若干字节的签名保存在 state 中,
+下次调用时先确认文件没有被截断或替换, 然后只读取新增的完整行。
+最后一行如果还没有写完 (没有换行符), 留到下次再读; 文件不会再增长时 (final=True,
+例如任务已经结束) 也交给解析函数, 只用 \\r 换行的文件因此也能解析。
+"""
+
+import os
+
+from qctools.profiling import open_file
+
+SIGNATURE_BYTES = 64
+CHUNK_SIZE = 1 << 20
+
+
+def _signature(handle, offset):
+    start = max(0, offset - SIGNATURE_BYTES)
+    handle.seek(start, os.SEEK_SET)
+    return handle.read(offset - start).hex()
+
+
+def resume_position(handle, state):
+    """
+    将 handle (二进制模式) 定位到 state["offset"]
+    文件比记录的位置短或签名不符 (被覆盖/重新提交) 时返回 False,
+    此时调用者应清空 state 从头解析
+    """
+    offset = state.get("offset", 0)
+    if offset:
+        handle.seek(0, os.SEEK_END)
+        if handle.tell() < offset or _signature(handle, offset) != state.get("sig"):
+            return False
+    handle.seek(offset, os.SEEK_SET)
+    return True
+
+
+def decode_lines(data):
+    """以换行符结尾的字节串 -> 去掉换行符的 str 行 (\n, \r\n, \r; 忽略非法字节)"""
+    text = data.decode("utf-8", errors="ignore")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = text.split("\n")
+    lines.pop()
+    return lines
+
+
+def complete_part(data, final=False):
+    """data 中以换行符结尾的部分; final 为 True 时末尾没有换行符的最后一行补上换行符"""
+    if final:
+        return data if not data or data.endswith(b"\n") else data + b"\n"
+    return data[: data.rfind(b"\n") + 1]
+
+
+def iter_complete_chunks(handle, state, chunk_size=CHUNK_SIZE, final=False):
+    """
+    从当前位置读到最后一个换行符为止, 产出以换行符结尾的 bytes 数据块 (不解码)
+    读完后更新 state 中的 offset 和签名, 并把 handle 留在 offset 处,
+    以便同一个 handle 之后继续读取; 调用者必须把生成器读完
+    final 为 True 时, 文件末尾没有换行符的部分补上换行符后最后产出, 但不计入 offset
+    """
+    offset = handle.tell()
+    pending = b""
+    for chunk in iter(lambda: handle.read(chunk_size), b""):
+        data = pending + chunk
+        end = data.rfind(b"\n") + 1
+        if not end:
+            pending = data
+            continue
+        pending = data[end:]
+        offset += end
+        yield data[:end]
+
+    if offset != state.get("offset", 0):
+        state["offset"] = offset
+        state["sig"] = _signature(handle, offset)
+    else:
+        handle.seek(offset, os.SEEK_SET)
+    if final and pending:
+        yield complete_part(pending, final)
+
+
+def iter_complete_line_batches(handle, state, chunk_size=CHUNK_SIZE, final=False):
+    """
+    与 iter_complete_chunks 相同, 但每个数据块产出一批去掉换行符的 str 行
+    换行处理与文本模式相同 (\\n, \\r\\n, \\r), 解码时忽略非法字节
+    """
+    for data in iter_complete_chunks(handle, state, chunk_size, final):
+        yield decode_lines(data)
+
+
+def iter_complete_lines(handle, state, chunk_size=CHUNK_SIZE, final=False):
+    """与 iter_complete_line_batches 相同, 但逐行产出"""
+    for lines in iter_complete_line_batches(handle, state, chunk_size, final):
+        yield from lines
+
+
+def parse_incremental(filename, state, keep_all, new_state, feed, final=False):
+    """
+    打开文件, 从 state 记录的位置继续读取新增的完整行并交给 feed 处理
+    state 为空、keep_all 不同或文件被截断/替换时, 用 new_state 重置后从头解析
+    final: 文件不会再增长 (任务已结束), 末尾没有换行符的最后一行也交给 feed;
+           之后不应再用同一个 state 继续解析
+    """
+    try:
+        with open_file(filename, "rb") as f:
+            if (
+                not state
+                or state.get("keep_all") != keep_all
+                or not resume_position(f, state)
+            ):
+                state.clear()
+                state.update(new_state(keep_all))
+                f.seek(0)
+            feed(state, iter_complete_lines(f, state, final=final))
+    except Exception:
+        state.clear()
+        return False
+    return True
@@ -0,0 +1,96 @@
+"""Gaussian IRC 计算的解析"""
+
+from collections import deque
+
+from qctools.profiling import open_file
+
+NA_STR = "N/A"
+# 找到点编号后, 在接下来的 9 行中查找其能量
+IRC_ENERGY_LINES = 9
+# 根据最后若干个非空行判断终止状态
+IRC_TAIL_LINES = 20
+
+IRC_HEADERS = ["File", "Fwd Point", "Fwd Energy", "Rev Point", "Rev Energy", "Status"]
+
+
+def new_irc_state():
+    return {
+        "forward": [NA_STR, NA_STR],
+        "reverse": [NA_STR, NA_STR],
+        "searches": [],
+        "tail": [],
+    }
+
+
+def feed_irc_lines(state, lines):
+    """
+    逐行更新 IRC 状态: 记录每个方向最后一个点编号, 并在其后 9 行内寻找能量;
+    同时在 state["tail"] 中保存最后 20 个去掉空白后的非空行, 供判断终止状态
+    """
+    searches = state["searches"]
+    tail = deque(state["tail"], maxlen=IRC_TAIL_LINES)
+    for line in lines:
+        L1 = line.strip()
+        if L1:
+            tail.append(L1)
+
+        # 先处理之前的点尚未找到的能量 (按点出现的顺序)
+        if searches:
+            for search in list(searches):
+                if L1.startswith("Energy ="):
+                    try:
+                        state[search[0]][1] = L1.split()[2]
+                        searches.remove(search)  # 找到了能量，停止查找
+                        continue
+                    except IndexError:
+                        pass
+                search[1] -= 1
+                if search[1] <= 0:
+                    searches.remove(search)
+
+        # 检查点编号
+        if "Point Number:" not in L1:
+            continue
+        direction = None
+        if "FORWARD direction" in L1:
+            direction = "forward"
+        elif "REVERSE direction" in L1:
+            direction = "reverse"
+        if direction:
+            try:
+                state[direction][0] = L1.split()[2]
+            except IndexError:
+                continue
+            searches.append([direction, IRC_ENERGY_LINES])
+    state["tail"] = list(tail)
+
+
+def irc_result(state):
+    fwd_point, fwd_energy = state["forward"]
+    rev_point, rev_energy = state["reverse"]
+    return fwd_point, fwd_energy, rev_point, rev_energy
+
+
+def ParseGIRC(filename):
+    """
+    解析 Gaussian IRC 文件。
+
+    查找为 FORWARD 和 REVERSE 方向报告的 *最后* 一个点编号和能量。
+    """
+    state = new_irc_state()
+    try:
+        with open_file(filename, "r", errors="ignore") as f:
+            feed_irc_lines(state, f)
+    except OSError:
+        return NA_STR, NA_STR, NA_STR, NA_STR
+    return irc_result(state)
+
+
+def termination_from_lines(last_lines):
+    """根据最后若干个非空行判断终止状态"""
+    for line in reversed(last_lines):
+        if "Normal termination" in line:
+            return "NORMAL"
+        if "Error termination" in line:
+            return "ERROR"
+    return "RUNNING"
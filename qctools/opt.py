@@ -0,0 +1,798 @@
+"""
+Gaussian / CP2K / ORCA / xtb / Q-Chem / Psi4 几何优化步骤的解析
+
+每种程序的解析器是一个逐行状态机 (初始状态, 逐行处理, 汇总结果), 用 register_step_parser
+登记在 STEP_PARSERS 中 (程序名与 qctools.detect.register_program 相同),
+完整解析、增量解析、从文件末尾开始的解析和 --follow 模式共用同一套状态机。
+每一步为 [步数, Max Force, RMS Force, Max Disp, RMS Disp], 后四项为 Criterion (或 None),
+显示前用 format_opt_row 转为带颜色的字符串。
+"""
+
+import mmap
+import os
+import re
+
+from qctools.common import (
+    Colored,
+    Colors,
+    Criterion,
+    format_criterion,
+    parse_criterion,
+    update_last_or_append,
+)
+from qctools.detect import DETECT_BYTES
+from qctools.incremental import decode_lines, iter_complete_lines, parse_incremental
+from qctools.profiling import add_mapped, mark_tail, open_file
+
+
+def parse_gaussian_block(lines, step):
+    parts = [
+        lines[0].split(),  # Max Force
+        lines[1].split(),  # RMS Force
+        lines[2].split(),  # Max Disp
+        lines[3].split(),  # RMS Disp
+    ]
+
+    # 每项: 名称 名称 数值 阈值 YES/NO
+    return [step] + [parse_criterion(p[2], p[3], p[4] == "YES") for p in parts]
+
+
+def parse_gaussian_last_step_from_tail(filename, initial_size=262144, final=False):
+    """
+    Gaussian 的最后一步: 从文件末尾开始交给逐行状态机 (keep_all=False), 窗口不断加倍
+    直到找到不属于 freq 等任务 (最多 2 步) 的收敛表, 步数取 Gaussian 输出的 Step number
+    """
+    return _parse_tail_first(
+        filename,
+        _new_gaussian_state,
+        _feed_gaussian_lines,
+        _gaussian_rows,
+        initial_size=initial_size,
+        complete=_gaussian_tail_complete,
+        final=final,
+    )
+
+
+def is_gaussian_convergence_block(window):
+    """window 的前两行是否为 'Maximum Force ... YES/NO' 和 'RMS Force'"""
+    l1 = window[0].strip()
+    if not (l1.startswith("Maximum Force") and ("YES" in l1 or "NO" in l1)):
+        return False
+    l2 = window[1].strip()
+    return l2.startswith("RMS") and "Force" in l2
+
+
+GAUSSIAN_FORCE_PATTERN = re.compile(rb"Maximum Force")
+GAUSSIAN_STEP_PATTERN = re.compile(r"Step number\s+(\d+)\s+out of a maximum of\s+(\d+)")
+
+
+def scan_gaussian_steps_mmap(filename, final=False):
+    """
+    完整优化历史的快速提取 (结果与逐行滑动窗口完全相同)
+    将文件映射到内存, 用一次 bytes 正则 finditer 找到所有含 'Maximum Force' 的行,
+    只解码这些行及其后 3 行; 其余内容既不解码也不切分成行。
+    含 \r 换行的文件退回到逐行解析 (final 的含义同 parse_incremental)
+    """
+    results = []
+    try:
+        with open_file(filename, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # 空文件、压缩文件等无法映射的文件
+                mm = None
+            if mm is None or mm.find(b"\r") != -1:
+                if mm is not None:
+                    mm.close()
+                state = {}
+                if not parse_incremental(
+                    filename, state, True, _new_gaussian_state, _feed_gaussian_lines, final
+                ):
+                    return []
+                return _gaussian_rows(state)
+
+            with mm:
+                add_mapped(len(mm))
+                step_counter = 0
+                last_line_start = -1
+                for match in GAUSSIAN_FORCE_PATTERN.finditer(mm):
+                    line_start = mm.rfind(b"\n", 0, match.start()) + 1
+                    if line_start == last_line_start:
+                        continue
+                    last_line_start = line_start
+
+                    # 窗口需要 4 个完整的行 (最后一行未写完时不计, final 时计入)
+                    bounds = [line_start]
+                    for _ in range(4):
+                        end = mm.find(b"\n", bounds[-1])
+                        if end == -1:
+                            if not final or bounds[-1] >= len(mm):
+                                break
+                            end = len(mm)
+                        bounds.append(end + 1)
+                    if len(bounds) < 5:
+                        break
+
+                    window = [
+                        mm[bounds[k] : bounds[k + 1] - 1].decode("utf-8", errors="ignore")
+                        for k in range(4)
+                    ]
+                    if not is_gaussian_convergence_block(window):
+                        continue
+                    step_counter += 1
+                    try:
+                        results.append(parse_gaussian_block(window, step_counter))
+                    except (IndexError, ValueError):
+                        continue
+    except Exception:
+        return []
+    return results
+
+
+def _parse_tail_first(
+    filename,
+    new_state,
+    feed,
+    collect,
+    initial_size=262144,
+    complete=None,
+    final=False,
+    head_seed=None,
+):
+    """
+    只需要最后一步时, 从文件末尾开始读取, 窗口不断加倍直到找到结果
+    窗口从其中第一个完整行开始交给与完整解析相同的逐行状态机 (keep_all=False),
+    complete(state) 判断窗口内的结果是否可信 (默认: 有结果即可);
+    head_seed(state, lines) 用文件开头 DETECT_BYTES 字节内的完整行预先填入
+    只在优化开始前输出一次的内容 (如 xtb 的收敛阈值);
+    窗口扩大到整个文件时等同于完整解析; final 的含义同 parse_incremental
+    """
+    state = _tail_state(
+        filename, new_state, feed, collect, initial_size, complete, final, head_seed
+    )
+    return collect(state) if state is not None else []
+
+
+def _tail_state(
+    filename,
+    new_state,
+    feed,
+    collect,
+    initial_size=262144,
+    complete=None,
+    final=False,
+    head_seed=None,
+):
+    """
+    _parse_tail_first 的状态机状态, 读取失败时返回 None
+    final 为 False 时, 状态中记录最后一个完整行之后的位置 (offset) 和签名,
+    可以交给 parse_incremental 继续解析
+    """
+    try:
+        with open_file(filename, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            file_size = f.tell()
+            size = min(initial_size, file_size)
+            head_lines = None
+            if head_seed is not None and size < file_size:
+                # 与识别文件类型时读取的文件头相同, 只保留其中的完整行
+                f.seek(0, os.SEEK_SET)
+                head = f.read(DETECT_BYTES)
+                end = max(head.rfind(b"\n"), head.rfind(b"\r")) + 1
+                head_lines = decode_lines(head[:end])
+            while True:
+                start = file_size - size
+                f.seek(start, os.SEEK_SET)
+                if start:
+                    # 丢弃被窗口截断的第一行
+                    f.readline()
+                state = new_state(False)
+                if head_lines and start:
+                    head_seed(state, head_lines)
+                feed(state, iter_complete_lines(f, state, final=final))
+                rows = collect(state)
+                if size >= file_size or (rows and (complete is None or complete(state))):
+                    # 文件比初始窗口大, 却要读到文件开头才有结果: 视为快速路径回退
+                    mark_tail(size < file_size or file_size <= initial_size)
+                    return state
+                size = min(max(size * 2, 1), file_size)
+    except Exception:
+        return None
+
+
+def _new_gaussian_state(keep_all):
+    return {
+        "offset": 0,
+        "keep_all": keep_all,
+        "window": [],
+        "step_counter": 0,
+        # 以下只用于 keep_all=False: 当前任务 (Link1) 最近的 [Step number, 最大步数]、
+        # 当前任务中已出现的收敛表个数, 以及 freq 等任务 (最大步数 <= 2) 的最后一步
+        "printed": None,
+        "job_blocks": 0,
+        "fallback": None,
+        "numbered": False,
+        "rows": [],
+    }
+
+
+def _feed_gaussian_lines(state, lines):
+    """
+    Gaussian: 4 行滑动窗口, 遇到 Maximum Force / RMS Force 开头的收敛表即记录一步
+    keep_all=True 时步数为收敛表的序号 (与 scan_gaussian_steps_mmap 和偏移量索引相同);
+    keep_all=False 时为 Gaussian 输出的 Step number (每个 Link1 任务重新开始),
+    没有 Step number 时为当前任务中收敛表的序号
+    """
+    results = state["rows"]
+    window = state["window"]
+    keep_all = state["keep_all"]
+    step_counter = state["step_counter"]
+    printed = state["printed"]
+    job_blocks = state["job_blocks"]
+    for line in lines:
+        if not keep_all:
+            if "Step number" in line:
+                match = GAUSSIAN_STEP_PATTERN.search(line)
+                if match:
+                    printed = [int(match.group(1)), int(match.group(2))]
+            elif "Entering Gaussian System" in line or "Proceeding to internal job step" in line:
+                printed, job_blocks = None, 0
+
+        window.append(line)
+        if len(window) < 4:
+            continue
+        if len(window) > 4:
+            window.pop(0)
+
+        if not is_gaussian_convergence_block(window):
+            continue
+
+        step_counter += 1
+        job_blocks += 1
+        step = step_counter if keep_all else (printed[0] if printed else job_blocks)
+        try:
+            row = parse_gaussian_block(window, step)
+        except (IndexError, ValueError):
+            continue
+        if keep_all or printed is None or printed[1] > 2:
+            update_last_or_append(results, row, keep_all)
+            state["numbered"] = printed is not None
+        else:
+            state["fallback"] = row
+    state["step_counter"] = step_counter
+    state["printed"] = printed
+    state["job_blocks"] = job_blocks
+
+
+def _gaussian_rows(state):
+    """keep_all=False 时优先取优化任务的最后一步, 只有 freq 等任务时取其最后一步"""
+    if not state["rows"] and state.get("fallback"):
+        return [state["fallback"]]
+    return list(state["rows"])
+
+
+def _gaussian_tail_complete(state):
+    """
+    窗口内只有 freq 等任务的收敛表时继续扩大窗口, 查找之前的优化任务;
+    最后一步的 Step number 在窗口之外时 (两步之间输出很长) 同样继续扩大
+    """
+    return bool(state["rows"]) and state.get("numbered", False)
+
+
+def parse_gaussian_steps(filename, keep_all=True, state=None, final=False):
+    """
+    解析 Gaussian 优化步骤
+    state: 可选的 dict, 记录读取位置、未完成的 4 行窗口和步数计数;
+           再次传入同一个 state 时只解析上次之后新增的内容 (就地更新)
+    final: 文件不会再增长 (任务已结束), 末尾没有换行符的最后一行也参与解析
+    """
+    if state is None:
+        if keep_all:
+            return scan_gaussian_steps_mmap(filename, final)
+        return parse_gaussian_last_step_from_tail(filename, final=final)
+
+    if not parse_incremental(
+        filename, state, keep_all, _new_gaussian_state, _feed_gaussian_lines, final
+    ):
+        return []
+    return _gaussian_rows(state)
+
+
+CP2K_STEP_PATTERN = re.compile(r"OPT\|\s+Step number\s+(\d+)")
+CP2K_LABELS = [
+    ("max_grad", "Maximum gradient", "Maximum gradient is converged"),
+    ("rms_grad", "RMS gradient", "RMS gradient is converged"),
+    ("max_step", "Maximum step size", "Maximum step size is converged"),
+    ("rms_step", "RMS step size", "RMS step size is converged"),
+]
+CP2K_VALUE_PATTERNS = {
+    key: re.compile(rf"OPT\|\s+{re.escape(label_val)}\s+([-+]?\d*\.\d+)")
+    for key, label_val, _ in CP2K_LABELS
+}
+CP2K_CONV_PATTERNS = {
+    key: re.compile(rf"OPT\|\s+{re.escape(label_conv)}\s+(YES|NO)")
+    for key, _, label_conv in CP2K_LABELS
+}
+
+
+def _new_cp2k_state(keep_all):
+    return {"offset": 0, "keep_all": keep_all, "block": None, "rows": []}
+
+
+def _cp2k_block_add(block, text):
+    """每个标签只取块内第一次出现的值, 与整块 re.search 的结果相同"""
+    if "OPT|" not in text:
+        return
+    for key, _, _ in CP2K_LABELS:
+        if key not in block["vals"]:
+            match = CP2K_VALUE_PATTERNS[key].search(text)
+            if match:
+                block["vals"][key] = match.group(1)
+        if key not in block["convs"]:
+            match = CP2K_CONV_PATTERNS[key].search(text)
+            if match:
+                block["convs"][key] = match.group(1)
+
+
+def _cp2k_block_row(block):
+    def get_val_and_status(key):
+        val = block["vals"].get(key)
+        status = block["convs"].get(key)
+        if val is None or status is None:
+            return None
+        # 统一保留 6 位小数显示
+        return Criterion(float(val), None, status == "YES", 6)
+
+    max_grad, rms_grad, max_step, rms_step = (
+        get_val_and_status(key) for key, _, _ in CP2K_LABELS
+    )
+    if max_grad is None and max_step is None:
+        return None
+    return [int(block["step"]), max_grad, rms_grad, max_step, rms_step]
+
+
+def _feed_cp2k_lines(state, lines):
+    """CP2K: 以 'OPT| Step number' 分块, 块在下一个步骤开始时结束"""
+    for line in lines:
+        # 步骤标题和收敛判据都在 'OPT|' 行中, 其余行 (SCF 输出等) 直接跳过
+        if "OPT|" not in line:
+            continue
+        block = state["block"]
+        match = CP2K_STEP_PATTERN.search(line) if "Step number" in line else None
+        if match is None:
+            if block is not None:
+                _cp2k_block_add(block, line)
+            continue
+
+        if block is not None:
+            _cp2k_block_add(block, line[: match.start()])
+            row = _cp2k_block_row(block)
+            if row:
+                update_last_or_append(state["rows"], row, state["keep_all"])
+        block = {"step": match.group(1), "vals": {}, "convs": {}}
+        _cp2k_block_add(block, line[match.end():])
+        state["block"] = block
+
+
+def _cp2k_rows(state):
+    """已结束的步骤加上当前 (文件末尾) 尚未结束的步骤"""
+    rows = list(state["rows"])
+    if state["block"] is not None:
+        row = _cp2k_block_row(state["block"])
+        if row:
+            update_last_or_append(rows, row, state["keep_all"])
+    return rows
+
+
+def parse_cp2k_steps(filename, keep_all=True, state=None):
+    """解析 CP2K 优化步骤 (GEO_OPT), 见 parse_steps"""
+    return parse_steps(filename, "CP2K", keep_all=keep_all, state=state)
+
+
+# ORCA 收敛表结构通常如下：
+# ----------------------|Geometry convergence|-------------------------
+# Item                value                   Tolerance       Converged
+# ---------------------------------------------------------------------
+# RMS gradient        0.0001155240            0.0001000000      NO
+# MAX gradient        0.0003965150            0.0003000000      NO
+# RMS step            0.0002714441            0.0020000000      YES
+# MAX step            0.0007522183            0.0040000000      YES
+ORCA_CYCLE_PATTERN = re.compile(r"GEOMETRY OPTIMIZATION CYCLE\s+(\d+)")
+ORCA_TABLE_LINES = 19
+ORCA_LABELS = [
+    ("RMS gradient", "RMS_G"),
+    ("MAX gradient", "MAX_G"),
+    ("RMS step", "RMS_S"),
+    ("MAX step", "MAX_S"),
+]
+
+
+def _new_orca_state(keep_all):
+    return {"offset": 0, "keep_all": keep_all, "step_counter": 0, "tables": [], "rows": []}
+
+
+def _orca_table_row(table):
+    # 组装数据，确保顺序：Max Grad, RMS Grad, Max Step, RMS Step
+    extracted_data = table["data"]
+    if len(extracted_data) < 4:
+        return None
+    return [
+        table["step"],
+        extracted_data.get("MAX_G"),
+        extracted_data.get("RMS_G"),
+        extracted_data.get("MAX_S"),
+        extracted_data.get("RMS_S"),
+    ]
+
+
+def _orca_table_add(table, sub_line):
+    """处理收敛表中的一行, 遇到表格结束标志返回 False"""
+    # 遇到分隔符或结束标志停止
+    if "Max(Bonds)" in sub_line or "The step convergence" in sub_line:
+        return False
+
+    parts = sub_line.split()
+    if len(parts) < 4:
+        return True
+
+    # 提取 Value 和 Converged (YES/NO)
+    # 格式: Label Value Tolerance Converged
+    for label, label_key in ORCA_LABELS:
+        if sub_line.startswith(label):
+            # ORCA 的分割比较稳定，最后一位是 YES/NO, 值是倒数第三个, 阈值是倒数第二个
+            table["data"][label_key] = parse_criterion(parts[-3], parts[-2], parts[-1] == "YES")
+            break
+    return True
+
+
+def _feed_orca_lines(state, lines):
+    """ORCA: 'Geometry convergence' 之后最多 19 行内收集 4 个收敛判据"""
+    tables = state["tables"]
+    for raw_line in lines:
+        line = raw_line.strip()
+
+        # 先让已打开的收敛表处理这一行
+        for table in list(tables):
+            table["seen"] += 1
+            if not _orca_table_add(table, line) or table["seen"] >= ORCA_TABLE_LINES:
+                tables.remove(table)
+                row = _orca_table_row(table)
+                if row:
+                    update_last_or_append(state["rows"], row, state["keep_all"])
+
+        # 匹配类似 "* GEOMETRY OPTIMIZATION CYCLE   1      *" 的行
+        if "GEOMETRY OPTIMIZATION CYCLE" in line:
+            match = ORCA_CYCLE_PATTERN.search(line)
+            if match:
+                state["step_counter"] = int(match.group(1))
+
+        if "Geometry convergence" in line:
+            tables.append({"step": state["step_counter"], "seen": 0, "data": {}})
+
+
+def _orca_rows(state):
+    """已结束的收敛表加上文件末尾尚未读完的收敛表"""
+    rows = list(state["rows"])
+    for table in state["tables"]:
+        row = _orca_table_row(table)
+        if row:
+            update_last_or_append(rows, row, state["keep_all"])
+    return rows
+
+
+def _orca_tail_complete(state):
+    """
+    窗口内最后一个收敛表之前必须有 GEOMETRY OPTIMIZATION CYCLE 行,
+    否则步数仍是初始值 0, 需要继续扩大窗口
+    """
+    return _orca_rows(state)[-1][0] != 0
+
+
+def parse_orca_steps(filename, keep_all=True, state=None):
+    """
+    解析 ORCA 优化步骤, 见 parse_steps;
+    keep_all=False 时从文件末尾倒序查找最后一个收敛表及其所在的优化循环
+    """
+    return parse_steps(filename, "ORCA", keep_all=keep_all, state=state)
+
+
+# xtb (ANCopt) 每个优化循环:
+# ........................................................................
+# .............................. CYCLE    3 ..............................
+# ........................................................................
+#  * total energy  :    -5.0705443 Eh     change       -0.1234567E-03
+#    gradient norm :     0.0012345 Eh/α   predicted    -0.1234E-03 ( -12.34%)
+#    displ. norm   :     0.0023456 α      lambda       -0.1234E-03
+#    maximum displ.:     0.0012345 α      in ANC's #1, #2, ...
+# 收敛只看能量变化和梯度范数, 阈值在优化开始前的参数表中:
+#           :   grad. convergence          0.1000000E-02 Eh/α :
+XTB_NUMBER = r"([-+]?\d*\.\d+(?:[EeDd][-+]?\d+)?)"
+XTB_CYCLE_PATTERN = re.compile(r"^\s*\.+\s*CYCLE\s+(\d+)\s*\.+\s*$")
+XTB_GCONV_PATTERN = re.compile(r"grad\. convergence\s+" + XTB_NUMBER)
+XTB_GNORM_PATTERN = re.compile(r"gradient norm\s*:\s*" + XTB_NUMBER)
+XTB_DISPL_PATTERN = re.compile(r"maximum displ\.\s*:\s*" + XTB_NUMBER)
+
+
+def _new_xtb_state(keep_all):
+    return {"offset": 0, "keep_all": keep_all, "gconv": None, "block": None, "rows": []}
+
+
+def _xtb_block_row(state, block):
+    if block["gnorm"] is None:
+        return None
+    gconv = state["gconv"]
+    gnorm = parse_criterion(block["gnorm"], gconv, None)
+    if gnorm.value is not None and gnorm.threshold is not None:
+        gnorm = gnorm._replace(converged=gnorm.value < gnorm.threshold)
+    # 位移不是 xtb 的收敛判据, 只显示数值
+    displ = parse_criterion(block["displ"], None, None) if block["displ"] is not None else None
+    return [block["step"], gnorm, None, displ, None]
+
+
+def _feed_xtb_lines(state, lines):
+    """xtb: 以 'CYCLE N' 分块, 读到 'maximum displ.' 或下一个循环开始时记录一步"""
+    for line in lines:
+        block = state["block"]
+        if "CYCLE" in line:
+            match = XTB_CYCLE_PATTERN.match(line)
+            if match:
+                if block is not None:
+                    row = _xtb_block_row(state, block)
+                    if row:
+                        update_last_or_append(state["rows"], row, state["keep_all"])
+                state["block"] = {"step": int(match.group(1)), "gnorm": None, "displ": None}
+        elif block is not None and "gradient norm" in line:
+            match = XTB_GNORM_PATTERN.search(line)
+            if match:
+                block["gnorm"] = match.group(1)
+        elif block is not None and "maximum displ." in line:
+            match = XTB_DISPL_PATTERN.search(line)
+            if match:
+                block["displ"] = match.group(1)
+                row = _xtb_block_row(state, block)
+                if row:
+                    update_last_or_append(state["rows"], row, state["keep_all"])
+                state["block"] = None
+        elif "grad. convergence" in line:
+            match = XTB_GCONV_PATTERN.search(line)
+            if match:
+                state["gconv"] = match.group(1)
+
+
+def _xtb_rows(state):
+    """已结束的循环加上文件末尾尚未结束的循环"""
+    rows = list(state["rows"])
+    if state["block"] is not None:
+        row = _xtb_block_row(state, state["block"])
+        if row:
+            update_last_or_append(rows, row, state["keep_all"])
+    return rows
+
+
+def _xtb_head_seed(state, lines):
+    """阈值通常在文件头的参数表中, 先从文件头读取, 末尾窗口不必扩大到文件开头"""
+    for line in lines:
+        if "grad. convergence" in line:
+            match = XTB_GCONV_PATTERN.search(line)
+            if match:
+                state["gconv"] = match.group(1)
+
+
+def _xtb_tail_complete(state):
+    """窗口内 (或文件头中) 须包含优化开始前的阈值, 否则无法判断梯度是否收敛"""
+    return state["gconv"] is not None
+
+
+# Q-Chem 每个 "Optimization Cycle:   N" 之后的收敛表:
+#                       Maximum     Tolerance    Cnvgd?
+#           Gradient       0.000312      0.000300      NO
+#           Displacement   0.001155      0.001200     YES
+#           Energy change -0.000002      0.000001      NO
+QCHEM_CYCLE_PATTERN = re.compile(r"Optimization Cycle:\s+(\d+)")
+QCHEM_TABLE_PATTERN = re.compile(r"^\s*(Gradient|Displacement)\s+(\S+)\s+(\S+)\s+(YES|NO)\s*$")
+
+
+def _new_qchem_state(keep_all):
+    return {"offset": 0, "keep_all": keep_all, "block": None, "rows": []}
+
+
+def _qchem_block_row(block):
+    if not block["data"]:
+        return None
+    return [block["step"], block["data"].get("Gradient"), None, block["data"].get("Displacement"), None]
+
+
+def _feed_qchem_lines(state, lines):
+    """Q-Chem: 以 'Optimization Cycle:' 分块, 块在下一个循环开始时结束"""
+    for line in lines:
+        block = state["block"]
+        if "Optimization Cycle:" in line:
+            match = QCHEM_CYCLE_PATTERN.search(line)
+            if match:
+                if block is not None:
+                    row = _qchem_block_row(block)
+                    if row:
+                        update_last_or_append(state["rows"], row, state["keep_all"])
+                state["block"] = {"step": int(match.group(1)), "data": {}}
+        elif block is not None and ("Gradient" in line or "Displacement" in line):
+            match = QCHEM_TABLE_PATTERN.match(line)
+            if match:
+                label, value, tolerance, converged = match.groups()
+                block["data"][label] = parse_criterion(value, tolerance, converged == "YES")
+
+
+def _qchem_rows(state):
+    rows = list(state["rows"])
+    if state["block"] is not None:
+        row = _qchem_block_row(state["block"])
+        if row:
+            update_last_or_append(rows, row, state["keep_all"])
+    return rows
+
+
+# Psi4 (optking) 每一步的 "==> Convergence Check <==" 表:
+#   Step     Total Energy     Delta E     MAX Force     RMS Force      MAX Disp      RMS Disp
+#   Convergence Criteria    1.00e-06 *    3.00e-04 *             o    1.20e-03 *             o
+#       1     -76.02663273   -7.60e+01      1.09e-02      7.72e-03 o    1.61e-02      1.14e-02 o  ~
+# 判据后的标记: * 已收敛, o 未启用, 空白为未收敛
+PSI4_VALUE_PATTERN = re.compile(r"^([-+]?\d*\.\d+(?:[eE][-+]?\d+)?)([*o]?)$")
+PSI4_CRITERIA = 5
+
+
+def _psi4_columns(tokens):
+    """[数值 [标记]] x 5 -> [(数值, 标记)], 只有标记 o 的列数值为 None; 格式不符时返回 None"""
+    columns = []
+    pos = 0
+    while pos < len(tokens) and len(columns) < PSI4_CRITERIA:
+        token = tokens[pos]
+        pos += 1
+        if token == "o":
+            columns.append((None, "o"))
+            continue
+        match = PSI4_VALUE_PATTERN.match(token)
+        if match is None:
+            return None
+        value, mark = match.groups()
+        if not mark and pos < len(tokens) and tokens[pos] in ("*", "o"):
+            mark = tokens[pos]
+            pos += 1
+        columns.append((value, mark))
+    return columns if len(columns) == PSI4_CRITERIA else None
+
+
+def _new_psi4_state(keep_all):
+    return {"offset": 0, "keep_all": keep_all, "thresholds": None, "armed": False, "rows": []}
+
+
+def _feed_psi4_lines(state, lines):
+    """Psi4: 'Convergence Check' 之后先读判据阈值, 再读第一行以步数开头的数据"""
+    for line in lines:
+        if "Convergence Check" in line:
+            state["armed"] = True
+            continue
+        if not state["armed"]:
+            continue
+        tokens = line.replace("~", " ").split()
+        if len(tokens) > 2 and tokens[0] == "Convergence" and tokens[1] == "Criteria":
+            columns = _psi4_columns(tokens[2:])
+            if columns:
+                state["thresholds"] = [value for value, _ in columns]
+        elif tokens and tokens[0].isdigit() and state["thresholds"] is not None:
+            columns = _psi4_columns(tokens[2:])
+            if columns is None:
+                continue
+            items = [
+                parse_criterion(value, threshold, None if mark == "o" else mark == "*")
+                for (value, mark), threshold in zip(columns, state["thresholds"])
+            ]
+            # 列顺序: Delta E, MAX Force, RMS Force, MAX Disp, RMS Disp
+            update_last_or_append(state["rows"], [int(tokens[0])] + items[1:], state["keep_all"])
+            state["armed"] = False
+
+
+def _psi4_rows(state):
+    return list(state["rows"])
+
+
+OPT_HEADERS = [
+    "Step",
+    "Max Grad/Force",
+    "RMS Grad/Force",
+    "Max Step/Disp",
+    "RMS Step/Disp",
+]
+
+# 各程序的增量解析器: 程序名 -> (初始状态, 逐行处理, 汇总结果), 程序名与 qctools.detect 相同
+STEP_PARSERS = {}
+# keep_all=False 时从文件末尾开始解析, 判断窗口内的结果是否可信 (见 _parse_tail_first)
+TAIL_COMPLETE = {}
+# keep_all=False 时从文件头预先读取的内容 (见 _parse_tail_first)
+HEAD_SEEDS = {}
+
+
+def register_step_parser(program, new_state, feed, collect, tail_complete=None, head_seed=None):
+    """
+    登记程序的优化步骤解析器; 状态须可 JSON 序列化, 且包含 offset / keep_all / rows,
+    每一步为 [步数, Max Force, RMS Force, Max Disp, RMS Disp] (缺失的判据为 None)
+    """
+    STEP_PARSERS[program] = (new_state, feed, collect)
+    TAIL_COMPLETE[program] = tail_complete
+    HEAD_SEEDS[program] = head_seed
+
+
+register_step_parser(
+    "GAUSSIAN",
+    _new_gaussian_state,
+    _feed_gaussian_lines,
+    _gaussian_rows,
+    tail_complete=_gaussian_tail_complete,
+)
+register_step_parser("CP2K", _new_cp2k_state, _feed_cp2k_lines, _cp2k_rows)
+register_step_parser(
+    "ORCA", _new_orca_state, _feed_orca_lines, _orca_rows, tail_complete=_orca_tail_complete
+)
+register_step_parser(
+    "XTB",
+    _new_xtb_state,
+    _feed_xtb_lines,
+    _xtb_rows,
+    tail_complete=_xtb_tail_complete,
+    head_seed=_xtb_head_seed,
+)
+register_step_parser("QCHEM", _new_qchem_state, _feed_qchem_lines, _qchem_rows)
+register_step_parser("PSI4", _new_psi4_state, _feed_psi4_lines, _psi4_rows)
+
+
+def format_opt_row(row):
+    """[步数, Criterion x4] 转为表格行: 渲染时才上色, 缺失的判据显示为黄色 N/A"""
+    missing = Colored("N/A", Colors.YELLOW)
+    return [row[0]] + [format_criterion(item, missing) for item in row[1:]]
+
+
+def parse_steps(filename, file_type, keep_all=True, state=None, final=False):
+    """
+    用登记的逐行状态机解析优化步骤, state / final 的含义同 parse_gaussian_steps
+    以 1MB 块流式读取, 内存占用与文件大小无关;
+    keep_all=False 时从文件末尾开始查找最后一个有效步骤
+    """
+    new_state, feed, collect = STEP_PARSERS[file_type]
+    if state is None:
+        if not keep_all:
+            return _parse_tail_first(
+                filename,
+                new_state,
+                feed,
+                collect,
+                complete=TAIL_COMPLETE[file_type],
+                final=final,
+                head_seed=HEAD_SEEDS[file_type],
+            )
+        state = {}
+    if not parse_incremental(filename, state, keep_all, new_state, feed, final):
+        return []
+    return collect(state)
+
+
+def parse_last_step_state(filename, file_type):
+    """
+    与 parse_opt_steps(keep_all=False) 相同地从文件末尾查找最后一步, 但返回状态机的状态:
+    其中记录了读取位置, 之后可以用 parse_opt_steps(..., state=state) 只解析新增的内容;
+    读取失败时返回 None
+    """
+    new_state, feed, collect = STEP_PARSERS[file_type]
+    return _tail_state(
+        filename,
+        new_state,
+        feed,
+        collect,
+        complete=TAIL_COMPLETE[file_type],
+        head_seed=HEAD_SEEDS[file_type],
+    )
+
+
+def parse_opt_steps(filename, file_type, keep_all=True, state=None, final=False):
+    if file_type == "GAUSSIAN":
+        return parse_gaussian_steps(filename, keep_all=keep_all, state=state, final=final)
+    if file_type in STEP_PARSERS:
+        return parse_steps(filename, file_type, keep_all=keep_all, state=state, final=final)
+    return []
@@ -0,0 +1,55 @@
+"""
+批量模式的机器可读输出 (JSON Lines / CSV / TSV)
+
+每个文件一条记录, 数值保持数字类型, 不含 ANSI 颜色代码;
+每写完一批记录就刷新输出, 下游程序 (pandas、监控脚本) 可以边扫描边读取;
+下游程序提前关闭管道 (例如 | head -1) 时用 exit_on_broken_pipe 安静退出。
+"""
+
+import csv
+import json
+import os
+import sys
+
+OUTPUT_FORMATS = ("table", "jsonl", "csv", "tsv")
+
+
+class RecordWriter:
+    def __init__(self, fmt, fields, stream=None):
+        if fmt not in OUTPUT_FORMATS[1:]:
+            raise ValueError(f"不支持的输出格式: {fmt}")
+        self.fmt = fmt
+        self.fields = fields
+        self.stream = stream or sys.stdout
+        self.writer = None
+        if fmt != "jsonl":
+            delimiter = "\t" if fmt == "tsv" else ","
+            self.writer = csv.writer(self.stream, delimiter=delimiter, lineterminator="\n")
+            self.writer.writerow(fields)
+
+    def write(self, record):
+        if self.writer is None:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            # None 写为空字段, 布尔值写为 true/false 与 JSON 一致
+            self.writer.writerow(
+                [
+                    "" if value is None else str(value).lower() if isinstance(value, bool) else value
+                    for value in (record.get(field) for field in self.fields)
+                ]
+            )
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+        self.stream.flush()
+
+
+def exit_on_broken_pipe():
+    """
+    写 stdout 时遇到 BrokenPipeError 后调用: 把 stdout 指向 /dev/null,
+    以免解释器退出时刷新缓冲区再次报错, 然后不打印 traceback 退出
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.exit(1)
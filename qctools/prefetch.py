@@ -0,0 +1,197 @@
+"""
+高延迟文件系统 (NFS/Lustre) 上的并发预读 (--prefetch N)
+
+批量模式逐个文件读取文件头 (识别程序类型)、末尾 20KB (结束状态) 和末尾 256KB
+(最后一个优化步), 每次 open/read 都要等待一次网络往返, 时间几乎全部花在等待上。
+Prefetcher 用 N 个线程按处理顺序提前读取后面若干文件的开头 HEAD_BYTES 和末尾 TAIL_BYTES,
+各文件的等待相互重叠; 解析某个文件时 (Prefetcher.use), qctools.profiling.open_file
+返回的文件对象直接从预读的内容中读取, 只有超出预读范围的部分 (例如需要读取全文时)
+才打开实际的文件。
+
+文件视为预读时的大小: 之后继续写入的内容要到下次运行才会读到, 与预读时刚好读完整个文件相同。
+压缩文件不预读 (末尾内容由 qctools.compress 的索引提供)。
+"""
+
+import io
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from qctools.compress import is_compressed
+
+# 识别程序类型读取的文件开头, 与 qctools.detect.DETECT_BYTES 相同
+HEAD_BYTES = 16 * 1024
+# 与 parse_gaussian_last_step_from_tail 等从末尾开始的解析的初始窗口相同
+TAIL_BYTES = 256 * 1024
+# 每个线程最多领先的文件数
+AHEAD_PER_WORKER = 2
+
+# size: 预读时的文件大小; head: [0, len(head)) 的内容; tail: [tail_start, tail_start + len(tail)) 的内容
+Prefetched = namedtuple("Prefetched", ["size", "head", "tail_start", "tail"])
+
+# 正在解析的文件 -> Prefetched (只在解析线程中读写)
+_active = {}
+
+
+def _read_at(handle, offset, size):
+    handle.seek(offset)
+    return handle.read(size) or b""
+
+
+def fetch(filename, head_bytes=HEAD_BYTES, tail_bytes=TAIL_BYTES):
+    """读取文件的开头和末尾 (小文件一次读完), 无法读取时返回 None"""
+    try:
+        with open(filename, "rb", buffering=0) as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size <= head_bytes + tail_bytes:
+                data = _read_at(handle, 0, size)
+                return Prefetched(size, data, len(data), b"")
+            head = _read_at(handle, 0, head_bytes)
+            tail_start = size - tail_bytes
+            return Prefetched(size, head, tail_start, _read_at(handle, tail_start, tail_bytes))
+    except OSError:
+        return None
+
+
+class PrefetchedRaw(io.RawIOBase):
+    """从预读内容中读取的只读文件对象, 预读范围之外的部分从实际文件读取 (用到时才打开)"""
+
+    def __init__(self, filename, entry):
+        super().__init__()
+        self.name = filename
+        self._entry = entry
+        self._pos = 0
+        self._file = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def _real_file(self):
+        if self._file is None:
+            self._file = io.FileIO(self.name, "r")
+        return self._file
+
+    def readinto(self, buffer):
+        entry = self._entry
+        pos = self._pos
+        count = min(len(buffer), entry.size - pos)
+        if count <= 0:
+            return 0
+        tail_end = entry.tail_start + len(entry.tail)
+        if pos < len(entry.head):
+            count = min(count, len(entry.head) - pos)
+            buffer[:count] = entry.head[pos : pos + count]
+        elif entry.tail_start <= pos < tail_end:
+            count = min(count, tail_end - pos)
+            start = pos - entry.tail_start
+            buffer[:count] = entry.tail[start : start + count]
+        else:
+            real = self._real_file()
+            real.seek(pos)
+            count = real.readinto(memoryview(buffer)[:count]) or 0
+        self._pos += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._entry.size
+        if offset < 0:
+            raise OSError(22, "Invalid argument")
+        self._pos = offset
+        return offset
+
+    def tell(self):
+        return self._pos
+
+    def fileno(self):
+        return self._real_file().fileno()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+def prefetched_raw(filename):
+    """filename 正在使用预读的内容时返回 PrefetchedRaw, 否则返回 None"""
+    entry = _active.get(filename)
+    if entry is None:
+        return None
+    return PrefetchedRaw(filename, entry)
+
+
+class Prefetcher:
+    """
+    用法:
+        with Prefetcher(filenames, workers=16) as prefetcher:
+            for filename in filenames:          # 与 filenames 的顺序相同
+                with prefetcher.use(filename):
+                    parse(filename)             # open_file 读取预读的内容
+
+    最多同时预读 workers * AHEAD_PER_WORKER 个文件, 内存占用有上限
+    """
+
+    def __init__(self, filenames, workers, head_bytes=HEAD_BYTES, tail_bytes=TAIL_BYTES):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._waiting = deque(f for f in filenames if not is_compressed(f))
+        self._futures = {}
+        self._ahead = workers * AHEAD_PER_WORKER
+        self._sizes = (head_bytes, tail_bytes)
+        self._submit()
+
+    def _submit(self):
+        while self._waiting and len(self._futures) < self._ahead:
+            filename = self._waiting.popleft()
+            if filename not in self._futures:
+                self._futures[filename] = self._pool.submit(fetch, filename, *self._sizes)
+
+    @contextmanager
+    def use(self, filename):
+        """等待 filename 预读完成; with 块中 open_file(filename) 读取预读的内容"""
+        future = self._futures.pop(filename, None)
+        self._submit()
+        entry = future.result() if future is not None else None
+        if entry is not None:
+            _active[filename] = entry
+        try:
+            yield
+        finally:
+            _active.pop(filename, None)
+
+    def close(self):
+        self._waiting.clear()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._futures.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add_prefetch_arguments(parser):
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        metavar="N",
+        help="用 N 个线程提前读取各文件的开头和末尾, 用于 NFS/Lustre 等高延迟文件系统"
+        " (默认: 0, 不预读; 只用于逐个解析, 不能与 -j 大于 1 一起使用)",
+    )
+
+
+def check_prefetch_arguments(parser, args):
+    """parse_args 之后检查 --prefetch (args.jobs 须已换算为实际进程数)"""
+    if args.prefetch < 0:
+        parser.error("--prefetch 不能为负数")
+    if args.prefetch and args.jobs > 1:
+        # 多进程并行时各进程的读取已经重叠, 预读线程不会被使用
+        parser.error("--prefetch 只用于逐个解析, 不能与 -j 大于 1 一起使用")
@@ -0,0 +1,342 @@
+"""
+批量模式的性能分析 (--profile)
+
+启用后, 每个文件在 track() 中处理: 通过 open_file 打开的文件统计实际从系统读取的
+字节数和 seek 次数, phase() 记录文件类型识别、结束状态判断和解析各自的耗时,
+mark_tail() 记录只读文件末尾的快速路径是否命中。各文件的统计汇总到 Profiler,
+结束时输出热点报告, 也可以写入 JSON 跟踪文件。
+
+未启用时 open_file 对普通文件就是内置 open, phase()/mark_tail() 不做任何事。
+"""
+
+import io
+import json
+import sys
+import time
+
+from qctools.compress import is_compressed, open_decompressed
+from qctools.prefetch import prefetched_raw
+from qctools.table import render_table
+
+# 当前正在统计的文件 (None 表示未启用)
+_current = None
+# 整个运行的汇总 (None 表示未启用)
+_profiler = None
+
+FILE_PHASES = ("detect", "termination", "parse")
+
+
+class _CountingRaw(io.RawIOBase):
+    """统计实际读取字节数和 seek 次数的原始文件对象, 外面再套缓冲层"""
+
+    def __init__(self, raw, stats):
+        super().__init__()
+        self._raw = raw
+        self._stats = stats
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self._raw.readinto(buffer)
+        if count:
+            self._stats["bytes_read"] += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._stats["seeks"] += 1
+        return self._raw.seek(offset, whence)
+
+    def tell(self):
+        return self._raw.tell()
+
+    def fileno(self):
+        return self._raw.fileno()
+
+    def close(self):
+        if not self.closed:
+            self._raw.close()
+        super().close()
+
+
+def open_file(filename, mode="rb", errors=None):
+    """
+    只读打开文件, 用法与内置 open 相同
+    压缩文件 (.gz/.xz/.zst) 返回解压后的内容; 文件已被预读 (qctools.prefetch) 时
+    从预读的内容中读取; 正在统计时返回计数的文件对象
+    (压缩文件统计的是解压后的字节数)
+    """
+    compressed = is_compressed(filename)
+    prefetched = None if compressed else prefetched_raw(filename)
+    if _current is None and not compressed and prefetched is None:
+        return open(filename, mode, errors=errors)
+    if prefetched is not None:
+        raw = prefetched
+    else:
+        raw = open_decompressed(filename) if compressed else io.FileIO(filename, "r")
+    if _current is not None:
+        raw = _CountingRaw(raw, _current)
+        _current["opens"] += 1
+    buffered = io.BufferedReader(raw)
+    if "b" in mode:
+        return buffered
+    return io.TextIOWrapper(buffered, errors=errors)
+
+
+def add_read(size):
+    """不经过 open_file 读取的字节数 (例如 tar 归档中的成员)"""
+    if _current is not None:
+        _current["bytes_read"] += size
+
+
+def add_mapped(size):
+    """mmap 扫描的字节数 (不经过 read, 单独统计)"""
+    if _current is not None:
+        _current["bytes_mapped"] += size
+
+
+def mark_tail(hit):
+    """只读文件末尾的快速路径: hit=True 命中, False 回退到读取全文"""
+    if _current is not None and _current["tail"] is None:
+        _current["tail"] = "hit" if hit else "fallback"
+
+
+def set_parse_path(path):
+    """解析方式: "tail" (只读末尾) / "full" (读取全文) / "resume" (从上次位置继续)"""
+    if _current is not None:
+        _current["path"] = path
+
+
+class phase:
+    """with phase("detect"): ... 把耗时累加到当前文件的对应阶段"""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        if _current is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if _current is not None:
+            phases = _current["phases"]
+            phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+def new_file_stats(filename, cached=False):
+    return {
+        "file": filename,
+        "cached": cached,
+        "bytes_read": 0,
+        "bytes_mapped": 0,
+        "seeks": 0,
+        "opens": 0,
+        "phases": {},
+        "tail": None,
+        "path": None,
+        "total": 0.0,
+    }
+
+
+class track:
+    """
+    with track(filename) as stats: ... 统计这段代码中对该文件的读取
+    可以在工作进程中使用, stats 为可序列化的 dict
+    """
+
+    def __init__(self, filename):
+        self.stats = new_file_stats(filename)
+        self.previous = None
+
+    def __enter__(self):
+        global _current
+        self.previous = _current
+        _current = self.stats
+        self.start = time.perf_counter()
+        return self.stats
+
+    def __exit__(self, *exc):
+        global _current
+        self.stats["total"] = time.perf_counter() - self.start
+        _current = self.previous
+        return False
+
+
+class Profiler:
+    """汇总各文件的统计和整个运行中的其他阶段 (例如表格输出)"""
+
+    def __init__(self):
+        self.files = []
+        self.run_phases = {}
+        self.start = time.perf_counter()
+
+    def add_file(self, stats):
+        self.files.append(stats)
+
+    def timed(self, name):
+        return _RunPhase(self, name)
+
+    def summary(self):
+        wall = time.perf_counter() - self.start
+        phase_totals = {name: 0.0 for name in FILE_PHASES}
+        for stats in self.files:
+            for name, value in stats["phases"].items():
+                phase_totals[name] = phase_totals.get(name, 0.0) + value
+        file_total = sum(stats["total"] for stats in self.files)
+        return {
+            "wall": wall,
+            "files": len(self.files),
+            "cached": sum(stats["cached"] for stats in self.files),
+            "bytes_read": sum(stats["bytes_read"] for stats in self.files),
+            "bytes_mapped": sum(stats["bytes_mapped"] for stats in self.files),
+            "seeks": sum(stats["seeks"] for stats in self.files),
+            "opens": sum(stats["opens"] for stats in self.files),
+            "tail_hit": sum(stats["tail"] == "hit" for stats in self.files),
+            "tail_fallback": sum(stats["tail"] == "fallback" for stats in self.files),
+            "paths": {
+                path: sum(stats["path"] == path for stats in self.files)
+                for path in ("tail", "full", "resume")
+            },
+            "file_phases": phase_totals,
+            "file_total": file_total,
+            "run_phases": dict(self.run_phases),
+        }
+
+    def report(self, stream=None, top=10):
+        """热点报告: 各阶段耗时占比和最慢的 top 个文件"""
+        stream = stream or sys.stderr
+        s = self.summary()
+        mb = 1e6
+        lines = [
+            "",
+            "--- 性能分析 ---",
+            f"文件: {s['files']} (缓存命中 {s['cached']}), 总耗时 {s['wall']:.3f} s",
+            f"读取: {s['bytes_read'] / mb:.2f} MB, mmap 扫描: {s['bytes_mapped'] / mb:.2f} MB, "
+            f"打开 {s['opens']} 次, seek {s['seeks']} 次",
+            f"末尾快速路径: 命中 {s['tail_hit']}, 回退到全文 {s['tail_fallback']}; "
+            f"解析方式: 只读末尾 {s['paths']['tail']}, 全文 {s['paths']['full']}, "
+            f"增量续读 {s['paths']['resume']}",
+        ]
+        stream.write("\n".join(lines) + "\n")
+
+        # 各阶段: 文件级阶段为各文件 (可能在多个进程中) 的耗时之和, 其余为主进程耗时
+        rows = []
+        phases = [(name, value) for name, value in s["file_phases"].items()]
+        phases += [(name, value) for name, value in s["run_phases"].items()]
+        for name, value in phases:
+            share = value / s["wall"] * 100 if s["wall"] > 0 else 0.0
+            rows.append([name, f"{value:.4f}", f"{share:.1f}%"])
+        stream.write(render_table(["Phase", "Time/s", "Share of wall"], rows))
+
+        slowest = sorted(
+            (stats for stats in self.files if not stats["cached"]),
+            key=lambda stats: stats["total"],
+            reverse=True,
+        )[:top]
+        if slowest:
+            stream.write(f"最慢的 {len(slowest)} 个文件:\n")
+            rows = [
+                [
+                    stats["file"],
+                    f"{stats['total']:.4f}",
+                    *(f"{stats['phases'].get(name, 0.0):.4f}" for name in FILE_PHASES),
+                    f"{(stats['bytes_read'] + stats['bytes_mapped']) / mb:.2f}",
+                    stats["seeks"],
+                    stats["path"] or "-",
+                    stats["tail"] or "-",
+                ]
+                for stats in slowest
+            ]
+            headers = ["File", "Total/s", "Detect/s", "Term/s", "Parse/s", "MB", "Seeks", "Path", "Tail"]
+            stream.write(render_table(headers, rows))
+        stream.flush()
+
+    def write_trace(self, path):
+        with open(path, "w") as handle:
+            json.dump({"summary": self.summary(), "files": self.files}, handle, indent=1)
+            handle.write("\n")
+
+
+class _RunPhase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        phases = self.profiler.run_phases
+        phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def enable():
+    """启用性能分析, 返回 Profiler"""
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def get_profiler():
+    return _profiler
+
+
+def timed(name):
+    """with timed("render"): ... 主进程中的阶段耗时; 未启用时不做任何事"""
+    if _profiler is None:
+        return _NULL_PHASE
+    return _profiler.timed(name)
+
+
+def add_profile_arguments(parser):
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="在标准错误输出中报告每个文件的读取量、seek 次数和各阶段耗时",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        metavar="JSON",
+        help="同时把每个文件的统计写入 JSON 跟踪文件 (隐含 --profile)",
+    )
+
+
+def start_from_options(options):
+    """根据命令行参数决定是否启用, 返回 Profiler 或 None"""
+    if options.profile or options.profile_trace:
+        return enable()
+    return None
+
+
+def finish(options):
+    """输出报告并按需写入跟踪文件"""
+    if _profiler is None:
+        return
+    _profiler.report()
+    if options.profile_trace:
+        _profiler.write_trace(options.profile_trace)
+        sys.stderr.write(f"跟踪文件已写入: {options.profile_trace}\n")
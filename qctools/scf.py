@@ -0,0 +1,412 @@
+"""
+Gaussian SCF 迭代过程的解析
+
+每个 Cycle 为 [Cycle, DE, RMSDP, MaxDP, E], 中间三项为 Criterion (或 None),
+显示前用 format_scf_row 转为带颜色的字符串。
+keep_all=LAST_SCF 时只保留最后一次 SCF (Cycle 编号重新开始之后) 的全部 Cycle,
+供 qctools.scftrend 分析收敛趋势。
+每次 SCF (Cycle 编号重新开始或 SCF Done 之后) 记为一段, 按 Link1 作业 (以 Normal termination
+分隔) 和作业内的序号 (优化中即几何步) 编号, 见 scf_segments; 只有 keep_all=True 时保留全部分段,
+其他情况只保留当前一段用于编号, 状态大小与文件长度无关。
+
+parse_scf_steps 直接扫描未解码的字节块: 用 find 跳到含关键字的行 (以及 Cycle 之后
+E= / RMSDP= 开头的行), 其余的行既不切分也不解码, 结果与逐行尝试全部正则相同。
+"""
+
+import re
+from collections import namedtuple
+
+from qctools.common import (
+    Criterion,
+    as_criterion,
+    convert_d_to_float,
+    format_criterion,
+    update_last_or_append,
+)
+from qctools.incremental import iter_complete_chunks, resume_position
+from qctools.profiling import open_file
+
+THRESHOLD_PATTERNS = {
+    "rmsdp": re.compile(r"RMS density matrix=([\d.Dd\-+]+)"),
+    "maxdp": re.compile(r"MAX density matrix=([\d.Dd\-+]+)"),
+    "de": re.compile(r"energy=([\d.Dd\-+]+)"),
+}
+CYCLE_PATTERN = re.compile(r"^\s*Cycle\s+(\d+)\s+Pass")
+ENERGY_PATTERN = re.compile(r"E=\s*([-+]?\d*\.?\d+(?:[DdEe][-+]?\d+)?)")
+RMSDP_PATTERN = re.compile(r"RMSDP=\s*([\d.Dd\-+]+)")
+MAXDP_PATTERN = re.compile(r"MaxDP=\s*([\d.Dd\-+]+)")
+DELTA_E_PATTERN = re.compile(r"DE=\s*([\d.Dd\-+]+)")
+SCF_DONE_PATTERN = re.compile(
+    r"SCF Done:\s+E\([^)]+\)\s+=\s+([-+]?\d*\.?\d+(?:[DdEe][-+]?\d+)?)\s+"
+    r"A\.U\.\s+after\s+(\d+)\s+cycles?"
+)
+
+# 阈值、SCF Done、Cycle 和作业结束只可能出现在包含其中一个关键字的行
+SCF_KEYWORDS = ("Cycle", "SCF Done:", "density matrix=", "energy=", "Normal termination")
+# Cycle 之后的窗口内还需要 (去掉首尾空白后) 以 E= 或 RMSDP= 开头的行
+WINDOW_PREFIXES = ("E=", "RMSDP=")
+# str.strip 去掉的 ASCII 空白 (bytes.strip 默认不含 \x1c-\x1f)
+_ASCII_WHITESPACE = " \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f"
+_SCAN_TOKENS = {
+    str: (SCF_KEYWORDS, WINDOW_PREFIXES, "\n", None),
+    bytes: (
+        tuple(keyword.encode() for keyword in SCF_KEYWORDS),
+        tuple(prefix.encode() for prefix in WINDOW_PREFIXES),
+        b"\n",
+        _ASCII_WHITESPACE.encode(),
+    ),
+}
+
+SCF_HEADERS = ["Step", "Delta-E (DE)", "RMSDP", "MaxDP", "Total Energy (E)"]
+
+# keep_all 的第三种取值: 只保留最后一次 SCF 的各个 Cycle
+LAST_SCF = "last_scf"
+
+# 一次 SCF: job 为 Link1 作业序号, step 为作业内第几次 SCF, cycles 为 Cycle 数,
+# rows 为该次 SCF 的各个 Cycle (只有 keep_all=True 时才有), energy 为 SCF Done 的能量
+ScfSegment = namedtuple("ScfSegment", ["job", "step", "cycles", "rows", "energy"])
+
+
+def threshold_criterion(value, threshold):
+    """|value| 小于阈值即为收敛, 以科学计数法显示"""
+    if value is None:
+        return None
+    return Criterion(value, threshold, abs(value) < threshold, None)
+
+
+def get_thresholds(content):
+    rmsdp_match = re.search(r"RMS density matrix=([\d.Dd\-+]+)", content)
+    maxdp_match = re.search(r"MAX density matrix=([\d.Dd\-+]+)", content)
+    de_match = re.search(r"energy=([\d.Dd\-+]+)", content)
+
+    return {
+        "rmsdp": convert_d_to_float(rmsdp_match.group(1)) if rmsdp_match else 1.0e-8,
+        "maxdp": convert_d_to_float(maxdp_match.group(1)) if maxdp_match else 1.0e-6,
+        "de": convert_d_to_float(de_match.group(1)) if de_match else 1.0e-6,
+    }
+
+
+def detailed_records(raw_rows, thresholds):
+    """[Cycle, DE, RMSDP, MaxDP, E] 中的三个收敛判据按 (文件中最后出现的) 阈值转为 Criterion"""
+    return [
+        [
+            cycle,
+            threshold_criterion(delta_e, thresholds["de"]),
+            threshold_criterion(rmsdp, thresholds["rmsdp"]),
+            threshold_criterion(maxdp, thresholds["maxdp"]),
+            energy,
+        ]
+        for cycle, delta_e, rmsdp, maxdp, energy in raw_rows
+    ]
+
+
+def format_scf_row(row):
+    """渲染时才上色, 没有数据的判据显示为 N/A"""
+    cycle, delta_e, rmsdp, maxdp, energy = row
+    return [cycle, format_criterion(delta_e), format_criterion(rmsdp), format_criterion(maxdp), energy]
+
+
+def new_scf_state(keep_all):
+    return {
+        "offset": 0,
+        "keep_all": keep_all,
+        "thresholds": {"rmsdp": 1.0e-8, "maxdp": 1.0e-6, "de": 1.0e-6},
+        "detailed_rows": [],
+        "fallback_rows": [],
+        "pending": None,
+        "pending_remaining": 0,
+        "job": 1,
+        "segments": [],
+        "segment_open": False,
+    }
+
+
+def _open_segment(state):
+    segments = state["segments"]
+    job = state["job"]
+    step = segments[-1]["step"] + 1 if segments and segments[-1]["job"] == job else 1
+    if state["keep_all"] is not True:
+        # 没有逐个 Cycle 的数据, 之前的分段不再需要
+        segments.clear()
+    segments.append(
+        {
+            "job": job,
+            "step": step,
+            "start": len(state["detailed_rows"]),
+            "rows": 0,
+            "last_cycle": None,
+            "cycles": None,
+            "energy": None,
+        }
+    )
+    state["segment_open"] = True
+    return segments[-1]
+
+
+def _segment_cycle(state, cycle):
+    """一个 Cycle 完成: Cycle 编号没有增大时 (没有 SCF Done 就重新开始) 另起一段"""
+    segment = state["segments"][-1] if state["segment_open"] else None
+    if segment is None or (segment["rows"] and cycle <= segment["last_cycle"]):
+        segment = _open_segment(state)
+    segment["rows"] += 1
+    segment["last_cycle"] = cycle
+
+
+def _feed_scf_line(state, line, pending, pending_remaining):
+    """处理一行, 返回更新后的 (pending, pending_remaining); 只尝试行中出现了关键字的正则"""
+    if "density matrix=" in line or "energy=" in line:
+        thresholds = state["thresholds"]
+        for key, pattern in THRESHOLD_PATTERNS.items():
+            match = pattern.search(line)
+            if match:
+                value = convert_d_to_float(match.group(1))
+                if value is not None:
+                    thresholds[key] = value
+
+    if "SCF Done:" in line:
+        done_match = SCF_DONE_PATTERN.search(line)
+        if done_match:
+            energy = convert_d_to_float(done_match.group(1))
+            if energy is not None:
+                update_last_or_append(
+                    state["fallback_rows"],
+                    [int(done_match.group(2)), None, None, None, energy],
+                    state["keep_all"] is True,
+                )
+                segment = state["segments"][-1] if state["segment_open"] else _open_segment(state)
+                segment["cycles"] = int(done_match.group(2))
+                segment["energy"] = energy
+                state["segment_open"] = False
+
+    if "Normal termination" in line:
+        # 之后是下一个 Link1 作业
+        state["segment_open"] = False
+        state["job"] += 1
+
+    if pending is not None:
+        stripped = line.strip()
+        if pending["energy"] is None and stripped.startswith("E="):
+            energy_match = ENERGY_PATTERN.search(stripped)
+            if energy_match:
+                pending["energy"] = convert_d_to_float(energy_match.group(1))
+
+        if pending["rmsdp"] is None and stripped.startswith("RMSDP="):
+            rmsdp_match = RMSDP_PATTERN.search(stripped)
+            maxdp_match = MAXDP_PATTERN.search(stripped)
+            delta_e_match = DELTA_E_PATTERN.search(stripped)
+            if rmsdp_match and maxdp_match:
+                pending["rmsdp"] = convert_d_to_float(rmsdp_match.group(1))
+                pending["maxdp"] = convert_d_to_float(maxdp_match.group(1))
+                pending["delta_e"] = (
+                    convert_d_to_float(delta_e_match.group(1))
+                    if delta_e_match
+                    else None
+                )
+
+        if (
+            pending["energy"] is not None
+            and pending["rmsdp"] is not None
+            and pending["maxdp"] is not None
+        ):
+            keep_all = state["keep_all"]
+            detailed_rows = state["detailed_rows"]
+            _segment_cycle(state, pending["cycle"])
+            if (
+                keep_all == LAST_SCF
+                and detailed_rows
+                and pending["cycle"] <= detailed_rows[-1][0]
+            ):
+                # 新的一次 SCF
+                detailed_rows.clear()
+            update_last_or_append(
+                detailed_rows,
+                [
+                    pending["cycle"],
+                    pending["delta_e"],
+                    pending["rmsdp"],
+                    pending["maxdp"],
+                    pending["energy"],
+                ],
+                keep_all,
+            )
+            pending = None
+        else:
+            pending_remaining -= 1
+            if pending_remaining <= 0:
+                pending = None
+
+    if "Cycle" in line:
+        cycle_match = CYCLE_PATTERN.search(line)
+        if cycle_match:
+            pending = {
+                "cycle": int(cycle_match.group(1)),
+                "energy": None,
+                "rmsdp": None,
+                "maxdp": None,
+                "delta_e": None,
+            }
+            pending_remaining = 15
+    return pending, pending_remaining
+
+
+def _scan_scf(state, data):
+    """
+    data: 以换行符结尾的若干完整行 (str, 或只含 ASCII 的 bytes)
+    用各关键字 (以及 Cycle 之后的窗口内的 E= / RMSDP=) 的 find 直接跳到下一个候选行,
+    其余的行不切分也不解码, 跳过的行只减少窗口的剩余行数。结果与对每一行调用全部正则相同
+    """
+    if "segments" not in state:
+        # 旧版本缓存中的状态没有分段信息
+        state.update(job=1, segments=[], segment_open=False)
+    keywords, prefixes, newline, whitespace = _SCAN_TOKENS[type(data)]
+    is_bytes = isinstance(data, bytes)
+    find = data.find
+    count = data.count
+
+    def finder(tokens):
+        # 每个字符串下一次出现的位置 (-1 表示之后不再出现), 落后于 pos 时才重新查找
+        nexts = [find(token) for token in tokens]
+
+        def nearest(pos):
+            result = -1
+            for i, at in enumerate(nexts):
+                if 0 <= at < pos:
+                    nexts[i] = at = find(tokens[i], pos)
+                if at >= 0 and (result < 0 or at < result):
+                    result = at
+            return result
+
+        return nearest
+
+    next_keyword = finder(keywords)
+    next_prefix = finder(prefixes)
+    keyword_at = next_keyword(0)
+    prefix_at = next_prefix(0)
+    pending = state["pending"]
+    pending_remaining = state["pending_remaining"]
+    pos = 0
+    size = len(data)
+    while pos < size:
+        if 0 <= keyword_at < pos:
+            keyword_at = next_keyword(pos)
+        if pending is None:
+            if keyword_at < 0:
+                break
+            at = keyword_at
+        else:
+            if 0 <= prefix_at < pos:
+                prefix_at = next_prefix(pos)
+            at = keyword_at if prefix_at < 0 or 0 <= keyword_at < prefix_at else prefix_at
+            # 候选行之前的行只减少窗口的剩余行数
+            stop = size if at < 0 else data.rfind(newline, pos, at) + 1 or pos
+            skipped = count(newline, pos, stop)
+            pos = stop
+            if skipped >= pending_remaining:
+                pending, pending_remaining = None, 0
+                continue
+            pending_remaining -= skipped
+            if at < 0:
+                break
+        start = data.rfind(newline, pos, at) + 1 or pos
+        end = find(newline, at)
+        line = data[start:end]
+        if not 0 <= keyword_at < end and not line.strip(whitespace).startswith(prefixes):
+            # E= / RMSDP= 只出现在行中间, 不是候选行
+            pending_remaining -= 1
+            if pending_remaining <= 0:
+                pending = None
+            pos = end + 1
+            continue
+        if is_bytes:
+            line = line.decode("ascii")
+        pending, pending_remaining = _feed_scf_line(state, line, pending, pending_remaining)
+        pos = end + 1
+    state["pending"] = pending
+    state["pending_remaining"] = pending_remaining
+
+
+def feed_scf_lines(state, lines):
+    """逐行更新 SCF 状态: 收敛阈值、每个 Cycle 的 E/RMSDP/MaxDP/DE 以及 SCF Done 行"""
+    if not isinstance(lines, list):
+        lines = list(lines)
+    if lines:
+        _scan_scf(state, "\n".join(lines) + "\n")
+
+
+def feed_scf_chunk(state, data):
+    """与 feed_scf_lines 相同, 但输入是 iter_complete_chunks 产出的 bytes 数据块"""
+    if not data.isascii():
+        # 解码时丢弃非法字节可能拼出关键字, 此时与 decode_lines 一样先整体解码
+        data = data.decode("utf-8", errors="ignore")
+        if "\r" in data:
+            data = data.replace("\r\n", "\n").replace("\r", "\n")
+    elif b"\r" in data:
+        # 与 decode_lines 相同的换行处理
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    _scan_scf(state, data)
+
+
+def scf_result(state):
+    """返回 (表格行, 收敛阈值); 没有逐个 Cycle 的数据时退回到 SCF Done 行"""
+    thresholds = state["thresholds"]
+    if state["detailed_rows"]:
+        return detailed_records(state["detailed_rows"], thresholds), thresholds
+    return [list(row) for row in state["fallback_rows"]], thresholds
+
+
+def scf_segments(state):
+    """按 SCF 分段的 [ScfSegment]; 没有逐个 Cycle 的数据时 rows 为 SCF Done 行"""
+    thresholds = state["thresholds"]
+    detailed_rows = state["detailed_rows"] if state["keep_all"] is True else []
+    result = []
+    for segment in state.get("segments", []):
+        start, count = segment["start"], segment["rows"]
+        rows = detailed_records(detailed_rows[start:start + count], thresholds)
+        if not rows and segment["energy"] is not None:
+            rows = [[segment["cycles"], None, None, None, segment["energy"]]]
+        cycles = segment["cycles"] if segment["cycles"] is not None else count
+        result.append(ScfSegment(segment["job"], segment["step"], cycles, rows, segment["energy"]))
+    return result
+
+
+def parse_scf_steps(filename, keep_all=True, state=None, final=False):
+    """
+    keep_all: True 保留全部 Cycle, False 只保留最后一个, LAST_SCF 保留最后一次 SCF 的全部 Cycle
+    state: 可选的 dict, 记录读取位置、收敛阈值和未完成的 Cycle 记录;
+           再次传入同一个 state 时只解析上次之后新增的内容 (就地更新)
+    final: 文件不会再增长 (任务已结束), 末尾没有换行符的最后一行也参与解析
+    """
+    if state is None:
+        state = {}
+    elif state.get("keep_all") != keep_all:
+        state.clear()
+
+    try:
+        with open_file(filename, "rb") as handle:
+            if not state or not resume_position(handle, state):
+                state.clear()
+                state.update(new_scf_state(keep_all))
+                handle.seek(0)
+            for data in iter_complete_chunks(handle, state, final=final):
+                feed_scf_chunk(state, data)
+    except OSError:
+        state.clear()
+        return [], None
+
+    return scf_result(state)
+
+
+def last_scf_rows(rows):
+    """keep_all=True 得到的全部 Cycle 中, 最后一次 SCF (Cycle 编号最后一次重新开始之后) 的部分"""
+    start = len(rows) - 1
+    while start > 0 and rows[start - 1][0] < rows[start][0]:
+        start -= 1
+    return rows[max(start, 0):]
+
+
+def is_detailed_scf_converged(last_step):
+    return all(item is not None and as_criterion(item).converged for item in last_step[1:4])
+
+
+def has_density_convergence_data(last_step):
+    return bool(last_step) and all(item is not None for item in last_step[1:4])
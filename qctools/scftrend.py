@@ -0,0 +1,232 @@
+"""
+SCF 收敛趋势分析: 收敛速度、预计剩余 Cycle 数, 以及停滞或振荡的 SCF
+
+对最后一次 SCF 最近 WINDOW 个 Cycle 的 log10|DE|、log10 RMSDP、log10 MaxDP 分别做最小二乘
+直线拟合, 斜率即收敛速度 (每个 Cycle 下降的数量级)。尚未收敛的判据按斜率外推到文件中的阈值,
+其中最慢的一个决定预计剩余的 Cycle 数。判断结果:
+  CONVERGED    三个判据都已收敛
+  CONVERGING   按当前速度能在 max_cycles 之内收敛
+  TOO_SLOW     在收敛, 但预计超过 max_cycles
+  STALLED      有判据每个 Cycle 下降不到 STALL_RATE 个数量级
+  OSCILLATING  停滞, 且 RMSDP 的变化方向或 DE 的符号反复交替
+  N/A          数据点太少
+
+analyse_batch 一次分析多个任务: 安装了 NumPy 时把所有任务排成一个 (任务, 判据, Cycle) 数组,
+拟合和振荡检测都是整个数组上的运算; 未安装时逐个任务计算, 结果相同
+(见 benchmarks/bench_scf_trend.py)。
+"""
+
+import math
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖
+    np = None
+
+from qctools.common import Colored, Colors, as_criterion
+
+# 拟合使用的最近 Cycle 数与最少数据点
+WINDOW = 10
+MIN_POINTS = 4
+# 每个 Cycle 下降少于这么多个数量级视为停滞
+STALL_RATE = 0.05
+# 相邻变化方向交替的比例达到这个值视为振荡
+OSCILLATION_FRACTION = 0.5
+# Gaussian 默认的 SCF 最大 Cycle 数
+DEFAULT_MAX_CYCLES = 128
+
+CRITERIA = ("de", "rmsdp", "maxdp")
+
+# verdict: 判断结果; rate: 决定剩余 Cycle 数的判据的斜率 (数量级/Cycle, 负数表示在下降);
+# cycles_left: 预计剩余 Cycle 数 (None 表示无法收敛或无法估计); limiting: 该判据的名称
+ScfTrend = namedtuple("ScfTrend", ["verdict", "rate", "cycles_left", "limiting"])
+
+NO_TREND = ScfTrend("N/A", None, None, None)
+
+TREND_HEADERS = ["Rate", "Left", "Trend"]
+
+
+def _window(rows, window):
+    """最近 window 个三个判据都有数据的 Cycle: (cycles, [各判据的值], [阈值], [是否收敛])"""
+    picked = []
+    for row in reversed(rows):
+        if row[1] is not None and row[2] is not None and row[3] is not None:
+            picked.append(row)
+            if len(picked) == window:
+                break
+    rows = picked[::-1]
+    if not rows:
+        return None
+    items = [[as_criterion(row[i]) for i in (1, 2, 3)] for row in rows]
+    cycles = [row[0] for row in rows]
+    values = [[item[k].value for item in items] for k in range(3)]
+    thresholds = [items[-1][k].threshold for k in range(3)]
+    converged = [items[-1][k].converged for k in range(3)]
+    return cycles, values, thresholds, converged
+
+
+def _log10(value):
+    if value is None or value == 0:
+        return None
+    return math.log10(abs(value))
+
+
+def _alternation(values):
+    """相邻差值 (或 DE 本身) 的符号交替比例"""
+    signs = [(v > 0) - (v < 0) for v in values if v]
+    if len(signs) < 3:
+        return 0.0
+    flips = sum(1 for a, b in zip(signs, signs[1:]) if a != b)
+    return flips / (len(signs) - 1)
+
+
+def _verdict(converged, rates, lefts, oscillating, last_cycle, max_cycles):
+    """由各判据的斜率和外推结果得到 ScfTrend; 两种实现共用"""
+    if all(converged):
+        return ScfTrend("CONVERGED", None, 0, None)
+    pending = [k for k in range(3) if not converged[k]]
+    if any(rates[k] is None for k in pending):
+        return NO_TREND
+    # 舍去浮点误差, 两种实现在斜率相同时选出同一个判据
+    rates = [None if rate is None else round(rate, 9) for rate in rates]
+    limiting = max(pending, key=lambda k: math.inf if lefts[k] is None else lefts[k])
+    rate, left = rates[limiting], lefts[limiting]
+    if any(rates[k] > -STALL_RATE for k in pending):
+        stalled = min(pending, key=lambda k: -rates[k])
+        verdict = "OSCILLATING" if oscillating else "STALLED"
+        return ScfTrend(verdict, rates[stalled], None, CRITERIA[stalled])
+    if left is None or last_cycle + left > max_cycles:
+        return ScfTrend("TOO_SLOW", rate, left, CRITERIA[limiting])
+    return ScfTrend("CONVERGING", rate, left, CRITERIA[limiting])
+
+
+def _cycles_left(intercept, rate, last_x, log_threshold):
+    """
+    直线 y = intercept + rate * x 从 last_x 处下降到 log_threshold 还需要的 Cycle 数
+    (只用于尚未收敛的判据, 因此至少为 1)
+    """
+    if rate >= 0:
+        return None
+    return max(1, math.ceil((log_threshold - (intercept + rate * last_x)) / rate))
+
+
+def _analyse_python(rows, window, max_cycles):
+    data = _window(rows, window)
+    if data is None:
+        return NO_TREND
+    cycles, values, thresholds, converged = data
+    rates, lefts = [None] * 3, [None] * 3
+    for k in range(3):
+        points = [(x, _log10(v)) for x, v in zip(cycles, values[k]) if _log10(v) is not None]
+        if len(points) < MIN_POINTS or not thresholds[k]:
+            continue
+        n = len(points)
+        sx = sum(x for x, _ in points)
+        sy = sum(y for _, y in points)
+        sxx = sum(x * x for x, _ in points)
+        sxy = sum(x * y for x, y in points)
+        denominator = n * sxx - sx * sx
+        if denominator <= 0:
+            continue
+        rates[k] = (n * sxy - sx * sy) / denominator
+        intercept = (sy - rates[k] * sx) / n
+        lefts[k] = _cycles_left(intercept, rates[k], cycles[-1], math.log10(thresholds[k]))
+    log_rmsdp = [_log10(v) for v in values[1]]
+    steps = [b - a for a, b in zip(log_rmsdp, log_rmsdp[1:]) if a is not None and b is not None]
+    oscillating = max(_alternation(steps), _alternation(values[0])) >= OSCILLATION_FRACTION
+    return _verdict(converged, rates, lefts, oscillating, cycles[-1], max_cycles)
+
+
+def _analyse_numpy(traces, window, max_cycles):
+    windows = [_window(rows, window) for rows in traces]
+    present = [i for i, data in enumerate(windows) if data is not None]
+    results = [NO_TREND] * len(traces)
+    if not present:
+        return results
+
+    count = len(present)
+    # (任务, Cycle) 与 (任务, 判据, Cycle), 右对齐, 不足 window 的部分为 NaN
+    x = np.full((count, window), np.nan)
+    values = np.full((count, 3, window), np.nan)
+    thresholds = np.full((count, 3), np.nan)
+    for row, i in enumerate(present):
+        cycles, vals, thr, _ = windows[i]
+        width = len(cycles)
+        x[row, window - width:] = cycles
+        values[row, :, window - width:] = [[np.nan if v is None else v for v in vs] for vs in vals]
+        thresholds[row] = [t if t else np.nan for t in thr]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.log10(np.abs(values))
+        logs[~np.isfinite(logs)] = np.nan
+        mask = ~np.isnan(logs)
+        xs = np.where(mask, x[:, None, :], 0.0)
+        ys = np.where(mask, logs, 0.0)
+        n = mask.sum(axis=2)
+        sx, sy = xs.sum(axis=2), ys.sum(axis=2)
+        sxx, sxy = (xs * xs).sum(axis=2), (xs * ys).sum(axis=2)
+        denominator = n * sxx - sx * sx
+        valid = (n >= MIN_POINTS) & (denominator > 0) & ~np.isnan(thresholds)
+        rates = np.where(valid, (n * sxy - sx * sy) / denominator, np.nan)
+        intercept = (sy - rates * sx) / n
+        last_x = x[:, -1:]
+        steps = (np.log10(thresholds) - (intercept + rates * last_x)) / rates
+        lefts = np.where(valid & (rates < 0), np.maximum(1, np.ceil(steps)), np.nan)
+
+        # 振荡: RMSDP 相邻变化或 DE 本身的符号交替比例
+        def alternation(series):
+            signs = np.sign(np.nan_to_num(series))
+            nonzero = signs != 0
+            # 只比较相邻的非零符号: 按位置压紧后比较
+            order = np.argsort(~nonzero, axis=1, kind="stable")
+            packed = np.take_along_axis(signs, order, axis=1)
+            used = nonzero.sum(axis=1)
+            flips = (packed[:, 1:] != packed[:, :-1]) & (packed[:, 1:] != 0)
+            fraction = flips.sum(axis=1) / np.maximum(used - 1, 1)
+            return np.where(used >= 3, fraction, 0.0)
+
+        oscillating = (
+            np.maximum(alternation(np.diff(logs[:, 1, :], axis=1)), alternation(values[:, 0, :]))
+            >= OSCILLATION_FRACTION
+        )
+
+    for row, i in enumerate(present):
+        converged = windows[i][3]
+        results[i] = _verdict(
+            converged,
+            [None if np.isnan(r) else float(r) for r in rates[row]],
+            [None if np.isnan(v) else int(v) for v in lefts[row]],
+            bool(oscillating[row]),
+            windows[i][0][-1],
+            max_cycles,
+        )
+    return results
+
+
+def analyse_batch(traces, window=WINDOW, max_cycles=DEFAULT_MAX_CYCLES):
+    """traces: 每个任务最后一次 SCF 的 [Cycle, DE, RMSDP, MaxDP, E] 列表; 返回 [ScfTrend]"""
+    if np is not None:
+        return _analyse_numpy(traces, window, max_cycles)
+    return [_analyse_python(rows, window, max_cycles) for rows in traces]
+
+
+def analyse_trace(rows, window=WINDOW, max_cycles=DEFAULT_MAX_CYCLES):
+    return analyse_batch([rows], window, max_cycles)[0]
+
+
+TREND_COLORS = {
+    "CONVERGED": Colors.GREEN,
+    "CONVERGING": Colors.GREEN,
+    "TOO_SLOW": Colors.YELLOW,
+    "STALLED": Colors.RED,
+    "OSCILLATING": Colors.RED,
+}
+
+
+def format_trend(trend):
+    """汇总表中的三列: 斜率、预计剩余 Cycle 数、判断结果 (上色)"""
+    rate = "N/A" if trend.rate is None else f"{trend.rate:.3f}"
+    left = "N/A" if trend.cycles_left is None else str(trend.cycles_left)
+    color = TREND_COLORS.get(trend.verdict)
+    return [rate, left, Colored(trend.verdict, color) if color else trend.verdict]
@@ -0,0 +1,252 @@
+"""
+输出文件旁的偏移量索引 (job.log.idx): 不解析整个文件, 直接定位到第 N 个优化步骤
+
+索引只记录该程序的优化步骤开始的那一类行的行首字节偏移量 (压缩文件为解压后的偏移量):
+  step   CP2K "OPT| Step number" 行
+  force  Gaussian 收敛表的 "Maximum Force" 行, 判断方式与 scan_gaussian_steps_mmap 相同,
+         因此第 N 个即优化历史中的第 N 步
+  orca   ORCA "GEOMETRY OPTIMIZATION CYCLE" 行
+  qchem  Q-Chem "Optimization Cycle:" 行
+  psi4   Psi4 (optking) "Convergence Check" 行
+第一次使用时扫描整个文件 (只查找关键字, 不解析), 之后与增量解析一样从上次的位置
+继续, 只扫描新增的完整行; 文件被截断或替换时重新建立。
+索引文件为 JSON Lines: 第一行是 {"version", "kind"}, 之后每次更新追加一行
+{"offset", "sig", "pending", "add": [新增的偏移量]}, 不重写之前的内容。
+索引写在输出文件旁边, 目录不可写时写入缓存目录。
+xtb 的收敛阈值只在优化开始前输出一次, 不建立索引, 仍解析整个文件。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from qctools.cache import default_cache_dir
+from qctools.incremental import decode_lines, iter_complete_chunks, resume_position
+from qctools.opt import STEP_PARSERS, is_gaussian_convergence_block, parse_opt_steps
+from qctools.profiling import open_file
+
+INDEX_VERSION = 3
+INDEX_SUFFIX = ".idx"
+
+# 类型: 行中必须包含的关键字
+INDEX_MARKERS = {
+    "step": b"Step number",
+    "force": b"Maximum Force",
+    "orca": b"GEOMETRY OPTIMIZATION CYCLE",
+    "qchem": b"Optimization Cycle:",
+    "psi4": b"Convergence Check",
+}
+
+# 各程序的优化步骤以哪一类行开始
+OPT_MARKERS = {
+    "GAUSSIAN": "force",
+    "CP2K": "step",
+    "ORCA": "orca",
+    "QCHEM": "qchem",
+    "PSI4": "psi4",
+}
+
+
+def _decode(data):
+    return data.decode("utf-8", errors="ignore")
+
+
+def new_index_state(kind):
+    return {
+        "kind": kind,
+        "offset": 0,
+        "offsets": [],
+        # 数据块最后一行是 Maximum Force 时, 等下一块的第一行再判断: [偏移量, 行]
+        "pending": None,
+    }
+
+
+def feed_index_chunk(state, data, base):
+    """data: 从文件偏移量 base 开始、以换行符结尾的若干完整行"""
+    kind = state["kind"]
+    keyword = INDEX_MARKERS[kind]
+    offsets = state["offsets"]
+    pending = state["pending"]
+    if pending is not None:
+        state["pending"] = None
+        second = _decode(data[: data.find(b"\n")])
+        if is_gaussian_convergence_block([pending[1], second]):
+            offsets.append(pending[0])
+
+    pos = data.find(keyword)
+    while pos >= 0:
+        start = data.rfind(b"\n", 0, pos) + 1
+        end = data.find(b"\n", pos)
+        if kind == "force":
+            line = _decode(data[start:end])
+            next_end = data.find(b"\n", end + 1)
+            if next_end < 0:
+                state["pending"] = [base + start, line]
+            elif is_gaussian_convergence_block([line, _decode(data[end + 1 : next_end])]):
+                offsets.append(base + start)
+        else:
+            offsets.append(base + start)
+        # 同一行只记录一次
+        pos = data.find(keyword, end + 1)
+
+
+def _index_paths(filename):
+    """输出文件旁的 .idx, 以及目录不可写时使用的缓存目录中的文件"""
+    digest = hashlib.sha1(os.path.abspath(filename).encode("utf-8", "surrogateescape"))
+    return [
+        filename + INDEX_SUFFIX,
+        os.path.join(default_cache_dir(), "step-index", digest.hexdigest()[:24] + ".json"),
+    ]
+
+
+def _record(state, start=0):
+    return json.dumps(
+        {
+            "offset": state["offset"],
+            "sig": state.get("sig"),
+            "pending": state["pending"],
+            "add": state["offsets"][start:],
+        },
+        separators=(",", ":"),
+    )
+
+
+def _load_index(filename, kind):
+    """
+    返回 (索引文件路径, 状态, 能否追加); 没有可用的索引时返回 (None, None, False)
+    最后一行不完整 (写入时中断) 时使用之前的记录, 但下次保存时整个重写
+    """
+    for path in _index_paths(filename):
+        try:
+            with open(path, "r") as handle:
+                lines = handle.read().split("\n")
+            header = json.loads(lines[0])
+        except (OSError, ValueError):
+            continue
+        if not isinstance(header, dict) or header.get("version") != INDEX_VERSION:
+            continue
+        if header.get("kind") != kind:
+            return path, None, False
+        state = new_index_state(kind)
+        clean = True
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                state["offsets"].extend(record["add"])
+                state.update(offset=record["offset"], sig=record["sig"], pending=record["pending"])
+            except (ValueError, KeyError, TypeError):
+                clean = False
+                break
+        return path, state, clean and lines[-1] == ""
+    return None, None, False
+
+
+def _save_index(filename, state):
+    """原子替换写入整个索引; 两个位置都不可写时忽略"""
+    header = json.dumps({"version": INDEX_VERSION, "kind": state["kind"]}, separators=(",", ":"))
+    for path in _index_paths(filename):
+        directory = os.path.dirname(path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        except OSError:
+            continue
+        try:
+            with os.fdopen(fd, "w") as handle:
+                handle.write(header + "\n" + _record(state) + "\n")
+            os.replace(tmp_path, path)
+            return path
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return None
+
+
+def _append_index(filename, path, state, saved):
+    """在索引文件末尾追加 saved 之后新增的偏移量; 失败时整个重写"""
+    try:
+        with open(path, "a") as handle:
+            handle.write(_record(state, saved) + "\n")
+        return path
+    except OSError:
+        return _save_index(filename, state)
+
+
+def update_index(filename, kind):
+    """
+    读取 kind 类行的索引并扫描文件新增的部分, 有变化时写回; 返回行首偏移量列表
+    无法读取文件时返回 None
+    """
+    path, state, clean = _load_index(filename, kind)
+    if state is None:
+        state, clean = new_index_state(kind), False
+    saved = len(state["offsets"])
+    previous = state["offset"]
+    try:
+        with open_file(filename, "rb") as handle:
+            if not resume_position(handle, state):
+                state, clean, previous = new_index_state(kind), False, None
+                handle.seek(0)
+            base = handle.tell()
+            for data in iter_complete_chunks(handle, state):
+                feed_index_chunk(state, data, base)
+                base += len(data)
+    except OSError:
+        return None
+    if state["offset"] != previous:
+        if clean:
+            _append_index(filename, path, state, saved)
+        else:
+            _save_index(filename, state)
+    return state["offsets"]
+
+
+def read_lines(filename, start, end=None):
+    """文件中 [start, end) 的完整行 (end 为 None 时到文件末尾, 末尾未写完的行不计)"""
+    with open_file(filename, "rb") as handle:
+        handle.seek(start)
+        data = handle.read() if end is None else handle.read(end - start)
+    return decode_lines(data[: data.rfind(b"\n") + 1])
+
+
+def _sliced_opt_steps(filename, file_type, first, last):
+    """没有索引的程序: 完整解析后取第 first 到第 last 步"""
+    rows = parse_opt_steps(filename, file_type)
+    total = len(rows)
+    if first < 0:
+        first += total + 1
+    first = max(first, 1)
+    return rows[first - 1 : last], total
+
+
+def indexed_opt_steps(filename, file_type, first, last):
+    """
+    优化历史中的第 first 到第 last 步 (从 1 开始, 包含 last, 超出范围的部分忽略);
+    first 为负数时表示最后 -first 步。只读取这些步骤所在的部分,
+    交给与完整解析相同的逐行状态机; 返回 (行, 总步数)
+    """
+    if file_type not in OPT_MARKERS:
+        return _sliced_opt_steps(filename, file_type, first, last)
+    offsets = update_index(filename, OPT_MARKERS[file_type])
+    if offsets is None:
+        return [], 0
+    total = len(offsets)
+    if first < 0:
+        first += total + 1
+    first, last = max(first, 1), min(last, total)
+    if first > last:
+        return [], total
+
+    new_state, feed, collect = STEP_PARSERS[file_type]
+    state = new_state(True)
+    if file_type == "GAUSSIAN":
+        # Gaussian 的步数是收敛表的序号
+        state["step_counter"] = first - 1
+    end = offsets[last] if last < total else None
+    feed(state, read_lines(filename, offsets[first - 1], end))
+    return collect(state), total
@@ -0,0 +1,181 @@
+"""
+带颜色单元格的方框表格
+
+每个单元格只转换一次 (可见长度与输出文本分开保存), 列宽由这些长度直接得到;
+整个表格拼成一个字符串后一次写入标准输出。
+"""
+
+import sys
+
+from qctools.common import Colored, center_string, get_visible_len
+
+# 边框字符
+V, H = "│", "─"
+TL, TR, BL, BR = "┌", "┐", "└", "┘"
+ML, MR, TM, BM, MM = "├", "┤", "┬", "┴", "┼"
+
+
+def make_border(left, mid, right, widths):
+    segments = [H * (w + 2) for w in widths]
+    return left + mid.join(segments) + right
+
+
+def make_row(cells, widths):
+    return V + "".join(f" {center_string(cell, widths[i])} {V}" for i, cell in enumerate(cells))
+
+
+def align_decimal(value_float, total_width, max_int_width, precision=10):
+    """按小数点对齐浮点数, 再在列宽内居中"""
+    value_str = f"{value_float:.{precision}f}"
+    try:
+        int_part, frac_part = value_str.split(".")
+    except ValueError:
+        int_part = value_str
+        frac_part = " " * precision
+
+    aligned = " " * (max_int_width - len(int_part)) + f"{int_part}.{frac_part}"
+    return center_string(aligned, total_width)
+
+
+def prepare_rows(headers, rows, float_columns=(), precision=10):
+    """
+    每个单元格只处理一次: 转为 (可见长度, 输出文本), 浮点列转为 (None, 整数部分, 小数部分)
+    返回 (处理后的行, 列宽, 各浮点列整数部分的最大宽度)
+    """
+    col_widths = [len(h) for h in headers]
+    ncols = len(col_widths)
+    max_int_width = dict.fromkeys(float_columns, 0)
+    float_seen = set()
+    prepared = []
+    for row in rows:
+        cells = []
+        for idx, cell in enumerate(row):
+            if idx in float_columns and isinstance(cell, float):
+                value_str = f"{cell:.{precision}f}"
+                int_part, dot, frac_part = value_str.partition(".")
+                if not dot:
+                    frac_part = " " * precision
+                if len(int_part) > max_int_width[idx]:
+                    max_int_width[idx] = len(int_part)
+                float_seen.add(idx)
+                cells.append((None, int_part, frac_part))
+                continue
+            if isinstance(cell, Colored):
+                visible = len(str(cell.text))
+                text = str(cell)
+            else:
+                text = str(cell)
+                visible = get_visible_len(text)
+            if idx < ncols and visible > col_widths[idx]:
+                col_widths[idx] = visible
+            cells.append((visible, text))
+        prepared.append(cells)
+
+    for idx in float_seen:
+        col_widths[idx] = max(col_widths[idx], max_int_width[idx] + 1 + precision)
+    return prepared, col_widths, max_int_width
+
+
+def _center(text, visible, width):
+    padding = width - visible
+    if padding <= 0:
+        return text
+    r_padding = padding // 2
+    return " " * (padding - r_padding) + text + " " * r_padding
+
+
+def format_prepared_row(cells, col_widths, max_int_width, precision=10):
+    parts = [V]
+    for idx, cell in enumerate(cells):
+        if cell[0] is None:
+            _, int_part, frac_part = cell
+            aligned = " " * (max_int_width[idx] - len(int_part)) + f"{int_part}.{frac_part}"
+            text = _center(aligned, max_int_width[idx] + 1 + precision, col_widths[idx])
+        else:
+            text = _center(cell[1], cell[0], col_widths[idx])
+        parts.append(f" {text} {V}")
+    return "".join(parts)
+
+
+def render_table(headers, rows, float_columns=None, precision=10, row_separators=False):
+    """
+    生成整个表格的文本 (以换行结尾), 没有数据时返回空字符串
+    float_columns: 这些列中的 float 按小数点对齐 (保留 precision 位小数)
+    row_separators: 数据行之间也画分隔线
+    """
+    if not rows:
+        return ""
+
+    float_columns = set(float_columns or [])
+    prepared, col_widths, max_int_width = prepare_rows(headers, rows, float_columns, precision)
+
+    mid_border = make_border(ML, MM, MR, col_widths)
+    lines = [make_border(TL, TM, TR, col_widths), make_row(headers, col_widths), mid_border]
+    for cells in prepared:
+        lines.append(format_prepared_row(cells, col_widths, max_int_width, precision))
+        if row_separators:
+            lines.append(mid_border)
+    if row_separators:
+        lines.pop()
+    lines.append(make_border(BL, BM, BR, col_widths))
+    lines.append("")
+    return "\n".join(lines)
+
+
+def draw_table(headers, rows, float_columns=None, precision=10, row_separators=False):
+    """通用的表格绘制函数: 整个表格一次写入标准输出, 参数见 render_table"""
+    text = render_table(headers, rows, float_columns, precision, row_separators)
+    if text:
+        sys.stdout.write(text)
+
+
+class StreamTable:
+    """
+    逐批打印的表格, 用于结果陆续产生的场合 (例如递归遍历目录时)
+    列宽只增不减; 新的一批行需要更宽的列时, 先按新列宽重新打印一次表头
+    """
+
+    def __init__(self, headers, float_columns=None, precision=10):
+        self.headers = headers
+        self.float_columns = set(float_columns or [])
+        self.precision = precision
+        self.col_widths = None
+        self.max_int_width = None
+        self.count = 0
+
+    def add_rows(self, rows):
+        if not rows:
+            return
+        prepared, widths, int_widths = prepare_rows(
+            self.headers, rows, self.float_columns, self.precision
+        )
+        lines = []
+        if self.col_widths is None:
+            self.col_widths, self.max_int_width = widths, int_widths
+            lines.append(make_border(TL, TM, TR, self.col_widths))
+            lines.append(make_row(self.headers, self.col_widths))
+            lines.append(make_border(ML, MM, MR, self.col_widths))
+        else:
+            grown = [max(a, b) for a, b in zip(self.col_widths, widths)]
+            for idx, width in int_widths.items():
+                if width > self.max_int_width[idx]:
+                    # 整数部分变宽, 浮点列也要加宽以保持小数点对齐
+                    grown[idx] = max(grown[idx], width + 1 + self.precision)
+                    self.max_int_width[idx] = width
+            if grown != self.col_widths:
+                self.col_widths = grown
+                lines.append(make_border(ML, MM, MR, self.col_widths))
+                lines.append(make_row(self.headers, self.col_widths))
+                lines.append(make_border(ML, MM, MR, self.col_widths))
+        for cells in prepared:
+            lines.append(
+                format_prepared_row(cells, self.col_widths, self.max_int_width, self.precision)
+            )
+        lines.append("")
+        sys.stdout.write("\n".join(lines))
+        self.count += len(rows)
+        sys.stdout.flush()
+
+    def close(self):
+        if self.col_widths is not None:
+            print(make_border(BL, BM, BR, self.col_widths), flush=True)
@@ -0,0 +1,177 @@
+"""
+等待文件发生变化
+
+Linux 上通过 ctypes 调用 inotify, 不可用时 (非 Linux、inotify 实例数用尽等)
+退回到定时 stat 轮询。注意 NFS/Lustre 上其他节点的写入不会触发 inotify,
+所以 wait() 总是带超时, 调用者在超时后也应检查文件是否变化。
+
+TreeWatcher 监视整棵目录树 (每个目录一个 watch), 供常驻解析服务 (qctools.daemon) 使用。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_DELETE_SELF = 0x00000400
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+FILE_EVENTS = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF
+TREE_EVENTS = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+)
+# struct inotify_event 的固定部分: wd, mask, cookie, len
+_EVENT_HEADER = struct.Struct("iIII")
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    return _libc
+
+
+class InotifyWatcher:
+    def __init__(self, path, mask=FILE_EVENTS):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify 仅在 Linux 上可用")
+        libc = _load_libc()
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, os.strerror(errno), path)
+
+    def wait(self, timeout):
+        """等待事件或超时, 有事件返回 True"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class TreeWatcher:
+    """
+    监视多个目录中文件的创建、修改、删除和移入移出 (不递归, 子目录需要调用者自己添加)
+    read_events() 返回 [(路径, mask)], mask & IN_ISDIR 表示该路径是目录;
+    事件队列溢出时返回的列表中有 (None, IN_Q_OVERFLOW), 调用者应重新扫描整棵树
+    """
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify 仅在 Linux 上可用")
+        self._libc = _load_libc()
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        # wd -> 目录
+        self.directories = {}
+
+    def add_directory(self, path):
+        """添加一个目录, 成功返回 True; 超出 max_user_watches 等失败时返回 False"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), TREE_EVENTS | IN_ONLYDIR)
+        if wd < 0:
+            return False
+        self.directories[wd] = path
+        return True
+
+    def read_events(self, timeout):
+        """等待最多 timeout 秒, 返回这段时间内的全部事件 (超时返回空列表)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        events = []
+        try:
+            while True:
+                data = os.read(self.fd, 65536)
+                if not data:
+                    break
+                pos = 0
+                while pos < len(data):
+                    wd, mask, _, length = _EVENT_HEADER.unpack_from(data, pos)
+                    pos += _EVENT_HEADER.size
+                    name = data[pos : pos + length].rstrip(b"\0")
+                    pos += length
+                    if mask & IN_Q_OVERFLOW:
+                        events.append((None, mask))
+                    elif mask & IN_IGNORED:
+                        self.directories.pop(wd, None)
+                    elif wd in self.directories and name:
+                        events.append((os.path.join(self.directories[wd], os.fsdecode(name)), mask))
+        except BlockingIOError:
+            pass
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.directories.clear()
+
+
+class PollWatcher:
+    def __init__(self, path, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self.last = self._stat()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def wait(self, timeout):
+        """每 interval 秒检查一次文件状态, 变化返回 True, 超时返回 False"""
+        deadline = time.monotonic() + timeout
+        while True:
+            current = self._stat()
+            if current != self.last:
+                self.last = current
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+def make_watcher(path, interval=1.0):
+    """优先使用 inotify, 失败时返回轮询实现"""
+    try:
+        return InotifyWatcher(path)
+    except (OSError, AttributeError):
+        return PollWatcher(path, interval)